@@ -1,35 +1,166 @@
-from flask_openapi3 import OpenAPI, Info, Tag
+from flask_openapi3 import Info, Tag
 from typing import Union
-from flask import redirect
+from flask import redirect, request, Response, stream_with_context, send_file, current_app
+from flask.cli import click, with_appcontext
 from urllib.parse import unquote
-from sqlalchemy.orm import joinedload
 
+from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
 
-from model import Session, Coordinate, GeoCatalog
-from logger import logger
+from model import Session, Coordinate, GeoCatalog, writer, data_generation, location_changes, \
+                  change_log, engine, maintenance, init_db, schema_error
+from model.spatial import spatial_filter, spatial_distance, nearest_ids, parse_bbox
+from model.memory_index import CoordinateIndex, rows_by_id, np
+from model.tiles import tiles_covering, tile_count
+from model.clusters import cluster_tile
+from model.vector_tiles import tile_features, encode_mvt, encode_geojson, MVT_MIMETYPE, GEOJSON_MIMETYPE
+from model.search import full_text_filter, full_text_rank, geo_catalogs_fts, coordinates_fts
+from model.pagination import keyset_paginate, KeysetPage
+from model.blob_store import blob_store
+from model.thumbnails import thumbnails
+from model.bulk import ingest_coordinates, ingest_geo_catalogs, coordinate_upsert, \
+                       delete_geo_catalogs, release_images, retain_images
+from model.stats import hashtag_stats, region_stats
+from model.timeline import time_window_filter, timeline
+from model.dictionary import Hashtag, Region, matching_terms, assign_term_ids
+from logger import logger, request_logger, configure_logging
+from cache import GenerationCache, TileCache, DiskTileCache, TileInvalidation
+from metrics import RequestInstrumentation, registry, record_rows
+from openapi_spec import LazyOpenAPI, LazyAPIBlueprint
+from serialization import dumps, json_response
+from export import EXPORTERS, EXPORT_FORMATS, ARROW_FORMATS, GEOMETRY_FORMATS, pyarrow
+from config import Config
 from schemas import *
+from schemas.bulk import read_rows, BULK_MIMETYPES
+from schemas.coordinate import DEFAULT_COORDINATE_FIELDS
+from schemas.geo_catalog import DEFAULT_GEO_CATALOG_FIELDS
 from flask_cors import CORS
 
 info = Info(title="GeoVisio API", version="1.0.0")
-app = OpenAPI(__name__, info=info)
-CORS(app)
+# rotas da api, registradas na aplicação por create_app; a documentação de cada
+# rota só é montada quando a especificação é pedida (ver openapi_spec.py)
+api = LazyAPIBlueprint("geovisio", __name__)
+
+def remove_session(exception=None):
+    """ Encerra a sessão da requisição, devolvendo a conexão ao pool.
+    """
+    Session.remove()
+
+# cache das listagens, invalidado a cada escrita (ver model/generation.py)
+listing_cache = GenerationCache(data_generation, Config.CACHE_MAX_ENTRIES)
+# caches por tile (ex.: /clusters): uma escrita invalida apenas os tiles que contêm
+# as posições alteradas (ver model/locations.py)
+tile_invalidation = TileInvalidation(data_generation, location_changes, Config.TILE_CACHE_MAX_CHANGES)
+cluster_cache = tile_invalidation.register(TileCache(Config.CLUSTER_CACHE_MAX_TILES))
+tile_cache = tile_invalidation.register(DiskTileCache(Config.TILE_CACHE_PATH, Config.TILE_CACHE_MAX_BYTES))
+# índice em memória das buscas espaciais de /coordinates, mantido em dia pelo mesmo
+# registro de posições alteradas
+coordinate_index = None
+if Config.MEMORY_INDEX and np is not None:
+    coordinate_index = tile_invalidation.register(CoordinateIndex(engine))
+
+# esquema da base verificado neste processo (ver prepare_worker)
+schema_checked = False
+
+@api.before_app_request
+def prepare_worker():
+    """ Na primeira requisição do processo (após o fork dos workers): verifica se a
+        base foi inicializada (flask init-db) com a configuração atual e inicia a
+        manutenção da base. Enquanto não, as requisições são respondidas com 503.
+    """
+    global schema_checked
+    if not schema_checked:
+        error = schema_error()
+        if error:
+            logger.error(f"A base não pode ser usada: {error}")
+            return {"message": error}, 503
+        schema_checked = True
+    maintenance.start()
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+# quantidade de linhas lidas da base por vez nas respostas em streaming
+STREAM_BATCH_SIZE = 500
+# quantidade de linhas por lote na exportação (/export)
+EXPORT_BATCH_SIZE = 5000
 
 home_tag = Tag(name="Documentação", description="Seleção de documentação: Swagger, Redoc ou RapiDoc")
+sync_tag = Tag(name="Sincronização", description="Alterações de coordenadas e catálogos, para a sincronização incremental dos clientes.")
+metrics_tag = Tag(name="Métricas", description="Métricas de desempenho da API, no formato do Prometheus.")
 coordinate_tag = Tag(name="Coordenada", description="Adição e visualização de coordenadas na base de dados sqlite.")
 geo_catalog_tag = Tag(name="Catálogo geográfico", description="Adição e visualização de catálogos geográficos e informações relacionadas à eles na base de dados sqlite.")
 
-@app.get('/', tags=[home_tag])
+
+def order_keys(id_column, fts_table, query):
+    """ Retorna as chaves de ordenação de uma listagem: a distância ao ponto de
+        referência (quando há filtro espacial) ou a relevância (quando há busca
+        textual), e o id, que desempata e garante cursores estáveis.
+    """
+    distance = spatial_distance(query.within, query.near)
+    if distance is not None:
+        return [distance, id_column]
+    rank = full_text_rank(fts_table, query.q)
+    if rank is not None:
+        return [rank, id_column]
+    return [id_column]
+
+def cached_json(key, compute):
+    """ Responde com o JSON de compute(), guardado em cache até a próxima escrita.
+
+    A resposta tem ETag (hash do corpo); um If-None-Match com o mesmo valor é
+    respondido com 304, sem consulta à base nem corpo.
+    """
+    etag, body = listing_cache.get(key, lambda: dumps(compute()))
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+def wants_ndjson():
+    """ Indica se o cliente pediu a listagem em NDJSON (uma linha JSON por item).
+    """
+    return request.accept_mimetypes.best_match(
+        ["application/json", NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+def stream_ndjson(session, page: KeysetPage, serialize):
+    """ Transmite as linhas da página em NDJSON, à medida que são lidas da base.
+
+    Quando a listagem é paginada e há mais linhas, a última linha enviada é
+    {"next": cursor}.
+    """
+    def generate():
+        try:
+            for row in page:
+                yield dumps(serialize(row)) + b"\n"
+            if page.next:
+                yield dumps({"next": page.next}) + b"\n"
+        finally:
+            session.close()
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+@api.get('/', tags=[home_tag])
 def home():
     """Redireciona para /openapi, tela que permite a escolha do estilo de documentação.
     """
     return redirect('/openapi')
 
-@app.post('/coordinate', tags=[coordinate_tag],
+@api.get('/metrics', tags=[metrics_tag])
+def get_metrics():
+    """Retorna as métricas do processo no formato texto do Prometheus.
+
+    Latência por rota, comandos SQL (quantidade e tempo), entidades carregadas,
+    tempo de serialização, bytes enviados e requisições lentas.
+    """
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+@api.post('/coordinate', tags=[coordinate_tag],
           responses={"200": CoordinateViewSchema, "409": ErrorSchema, "400": ErrorSchema})
-def add_coordinate(form: CoordinateSchema):
+def add_coordinate(form: CoordinateSchema, query: CoordinateUpsertSchema):
     """Adiciona uma nova coordenada à base de dados.
 
+    Uma coordenada é identificada pela posição (GEOVISIO_COORDINATE_PRECISION casas
+    decimais): se já há uma na mesma posição, responde 409, ou, com upsert=true,
+    atualiza os dados dela (INSERT ... ON CONFLICT).
+
     Retorna uma representação das coordenadas persistidas.
     """
     coordinate = Coordinate(
@@ -41,14 +172,24 @@ def add_coordinate(form: CoordinateSchema):
         name=form.name,
         contact=form.contact)
     logger.debug(f"Adicionando coordenada: '{coordinate.latitude, coordinate.longitude}'")
-    try:
-        session = Session()
+
+    def insert(session):
         session.add(coordinate)
-        session.commit()
-        logger.debug(f"Adicionando coordenada: '{coordinate.latitude, coordinate.longitude}'")
-        
+        session.flush()
         # retorna informação de inserção conforme especificado no schema.
-        return view_coordinate(coordinate), 200
+        return view_coordinate(coordinate)
+
+    def upsert(session):
+        row = form.model_dump()
+        assign_term_ids(session, "coordinates", [row])
+        coordinate_id = session.execute(coordinate_upsert().returning(Coordinate.id), [row]).scalar_one()
+        return view_coordinate(session.get(Coordinate, coordinate_id, populate_existing=True))
+
+    try:
+        # a gravação é feita pelo escritor único, em commit conjunto com outras escritas
+        result = writer.submit(upsert if query.upsert else insert)
+        logger.debug(f"Adicionando coordenada: '{coordinate.latitude, coordinate.longitude}'")
+        return result, 200
 
     except IntegrityError as e:
         # inicialmente uma mesma coordenada não deve ser cadastrada mais de uma vez
@@ -62,181 +203,695 @@ def add_coordinate(form: CoordinateSchema):
         logger.warning(f"Erro ao adicionar coordenada '{coordinate.latitude, coordinate.longitude}', {error_msg}")
         return {"mesage": error_msg}, 400
 
-@app.get('/coordinates', tags=[coordinate_tag],
-         responses={"200": ViewCoordinatesSchema, "404": ErrorSchema})
+@api.post('/coordinates/bulk', tags=[coordinate_tag],
+          responses={"200": BulkReportSchema, "415": ErrorSchema})
+def add_coordinates_bulk(query: BulkQuerySchema):
+    """Adiciona coordenadas em lote.
+
+    O corpo pode ser um CSV (text/csv), NDJSON (application/x-ndjson) ou uma
+    FeatureCollection GeoJSON (application/geo+json) de pontos, e é lido aos poucos.
+    As linhas são gravadas em transações de chunk_size linhas.
+
+    Retorna o total de linhas aceitas, duplicadas e inválidas, com o detalhe
+    das linhas não aceitas.
+    """
+    return ingest(query, ingest_coordinates, CoordinateRowSchema)
+
+@api.get('/coordinates', tags=[coordinate_tag],
+         responses={"200": ViewCoordinatesSchema, "400": ErrorSchema, "404": ErrorSchema})
 def get_coordinates(query: SearchCoordinateSchema):
     """Faz a busca por todas as coordenadas cadastradas.
 
     Retorna uma representação da listagem de coordenadas (sem relação com outras entidades) encontradas na base.
     É uma representação simples de lista de latitudes e longitudes.
+
+    Com q, busca as palavras (por prefixo) no nome, cidade e região, ordenando
+    pela relevância (bm25).
+    Com within (bbox) ou near + radius_m (raio em metros), apenas as coordenadas da
+    área são retornadas, ordenadas pela distância ao ponto de referência. Com
+    near + nearest, apenas as nearest coordenadas mais próximas do ponto.
+    Com region e hashtag, filtra pela região e pela hashtag dos catálogos.
+
+    Com fields (ex.: fields=latitude,longitude), apenas os campos informados são
+    lidos e retornados.
+
+    Com limit, o resultado é paginado e next traz o cursor a ser enviado em after
+    para buscar a próxima página. Com o cabeçalho Accept: application/x-ndjson,
+    as coordenadas são transmitidas uma por linha, sem montar a lista em memória.
     """
-    logger.debug(f"Coletando coordenadas ")
+    request_logger.debug(f"Coletando coordenadas ")
     # criando conexão com a base
     session = Session()
     # fazendo a busca
 
+    # lê da base apenas as colunas dos campos pedidos, como tuplas (sem montar
+    # entidades do ORM)
+    fields = query.selected_fields()
+    if coordinate_index is not None and (query.within or query.near) and \
+       not (query.q or query.name or query.since or query.until):
+        return search_coordinate_index(session, query, fields)
+
+    coordinates = filter_coordinates(select(*coordinate_columns(fields)).select_from(Coordinate), query)
+    if query.nearest:
+        # as nearest mais próximas entre as que atendem aos filtros
+        coordinates = coordinates.filter(Coordinate.id.in_(
+            nearest_ids(session, filter_coordinates(select(Coordinate.id), query), query.near,
+                        query.nearest, query.radius_m)))
+    keys = order_keys(Coordinate.id, coordinates_fts, query)
+    try:
+        coordinates = keyset_paginate(coordinates, keys, query.after, query.limit)
+    except ValueError as e:
+        return {"message": str(e)}, 400
+
+    if wants_ndjson():
+        rows = session.execute(coordinates.execution_options(yield_per=STREAM_BATCH_SIZE))
+        page = KeysetPage(rows, len(keys), query.limit)
+        return stream_ndjson(session, page, coordinate_serializer(fields))
+
+    page = KeysetPage(session.execute(coordinates), len(keys), query.limit)
+    # retorna a representação de coordenadas.
+    result = view_coordinates(page, fields)
+    request_logger.debug(f"%d coordenadas encontradas" % len(result["coordinates"]))
+    if query.limit:
+        result["next"] = page.next
+    return json_response(result)
+
+def filter_coordinates(coordinates, query: SearchCoordinateSchema):
+    """ Aplica à consulta sobre Coordinate os filtros da busca de coordenadas.
+    """
     if(query.name):
-        coordinates = session.query(Coordinate).filter(
-            Coordinate.name.contains(query.name)).all()
-    else: 
-        coordinates = session.query(Coordinate).all()
-
-    if not coordinates:
-        # se não há coordenadas cadastradas
-        return {"coordinates": []}, 200
-    else:
-        logger.debug(f"%d coordenadas encontradas" % len(coordinates))
-        # retorna a representação de coordenadas.
-        return view_coordinates(coordinates), 200
-
-@app.post('/geo_catalog', tags=[geo_catalog_tag],
+        coordinates = coordinates.filter(Coordinate.name.contains(query.name))
+    # região e hashtag: busca pela chave normalizada nos dicionários (indexada)
+    prefix = query.match == "prefix"
+    if query.region:
+        coordinates = coordinates.filter(Coordinate.region_id.in_(
+            matching_terms(Region, query.region, prefix)))
+    if query.hashtag:
+        coordinates = coordinates.filter(Coordinate.id.in_(select(GeoCatalog.coordinate_id).where(
+            GeoCatalog.hashtag_id.in_(matching_terms(Hashtag, query.hashtag, prefix)))))
+    # data de criação (indexada)
+    coordinates = time_window_filter(coordinates, Coordinate.created_at, query.since, query.until)
+    # busca textual (FTS5), ordenada pela relevância
+    coordinates = full_text_filter(coordinates, coordinates_fts, Coordinate.id, query.q)
+    # filtro espacial (bbox ou raio), ordenado pela distância
+    return spatial_filter(coordinates, query.within, query.near, query.radius_m)
+
+def search_coordinate_index(session, query: SearchCoordinateSchema, fields):
+    """ Faz a busca espacial de get_coordinates no índice em memória: apenas as
+        coordenadas encontradas são lidas da base, com as mesmas ordem e cursores.
+    """
+    tile_invalidation.refresh()
+    try:
+        prefix = query.match == "prefix"
+        region_ids = session.execute(matching_terms(Region, query.region, prefix)).scalars().all() \
+            if query.region else None
+        hashtag_ids = session.execute(matching_terms(Hashtag, query.hashtag, prefix)).scalars().all() \
+            if query.hashtag else None
+        results = coordinate_index.search(query.within, query.near, query.radius_m, query.nearest,
+                                          region_ids, hashtag_ids, query.after, query.limit)
+    except ValueError as e:
+        return {"message": str(e)}, 400
+    page = KeysetPage(rows_by_id(session, coordinate_columns(fields), results), 2, query.limit)
+    if wants_ndjson():
+        return stream_ndjson(session, page, coordinate_serializer(fields))
+    result = view_coordinates(page, fields)
+    if query.limit:
+        result["next"] = page.next
+    return json_response(result)
+
+@api.post('/geo_catalog', tags=[geo_catalog_tag],
           responses={"200": GeoCatalogViewSchema, "409": ErrorSchema, "400": ErrorSchema})
 def add_geo_catalog(form: GeoCatalogSchema):
     """Adiciona um novo catálogo geográfico à base de dados.
 
     Retorna uma representação do catálogo geográfico que é persistido, 
-    embutido na relação com a coordenada relacionada.
+    embutido na relação com a coordenada relacionada. A coordenada é buscada
+    pela posição (índice único) e, se ainda não existe, é criada com os dados
+    enviados.
     """
+    # a imagem é gravada no blob store; envios idênticos compartilham o mesmo arquivo
+    img_hash, img_size = blob_store.put(form.img_source) if form.img_source else (None, None)
     geo_catalog = GeoCatalog(
         title=form.title,
         description=form.description,
-        img_source=form.img_source,
+        img_hash=img_hash,
+        img_size=img_size,
         hashtag=form.hashtag
         )
     
     logger.debug(f"Adicionando catálogo geográfico: '{geo_catalog.title, geo_catalog.description}'")
-    try:
-        session = Session()
 
-        coordinate = session.query(Coordinate).filter(Coordinate.latitude == form.latitude 
-                                                      and Coordinate.longitude == form.longitude).first()
+    def insert(session):
+        coordinate = session.query(Coordinate).filter(*Coordinate.at(form.latitude, form.longitude)).first()
+        if coordinate is None:
+            coordinate = Coordinate(latitude=form.latitude, longitude=form.longitude, name=form.name,
+                                    contact=form.contact, city=form.city, region=form.region,
+                                    country=form.country)
+            session.add(coordinate)
+            session.flush()
         coordinate.add_geo_catalog(geo_catalog)
-        session.commit()
+        session.add(geo_catalog)
+        session.flush()
+        # a imagem pode ter sido liberada por uma remoção após blob_store.put
+        if img_hash is not None:
+            retain_images(session, {img_hash: form.img_source})
+        # catalog_count foi atualizado na base pelo trigger
+        session.expire(coordinate, ["catalog_count"])
+        return view_coordinate(coordinate, [geo_catalog])
+
+    try:
+        # a gravação é feita pelo escritor único, em commit conjunto com outras escritas
+        result = writer.submit(insert)
         logger.debug(f"Adicionando catálogo geográfico: '{geo_catalog.title, geo_catalog.description}'")
-        return view_coordinate(coordinate), 200
+        # as miniaturas são geradas em segundo plano, sem atrasar a resposta
+        thumbnails.submit(img_hash)
+        return result, 200
 
     except Exception as e:
         # caso um erro fora do previsto
-        error_msg = e
+        error_msg = str(e)
         logger.warning(f"Erro ao adicionar catálogo geográfico '{geo_catalog.title, geo_catalog.description}', {error_msg}")
         return {"mesage": error_msg}, 400
 
-@app.get('/geo_catalogs', tags=[geo_catalog_tag],
-         responses={"200": ViewGeoCatalogsSchema, "404": ErrorSchema})
+@api.post('/geo_catalogs/bulk', tags=[geo_catalog_tag],
+          responses={"200": BulkReportSchema, "415": ErrorSchema})
+def add_geo_catalogs_bulk(query: BulkQuerySchema):
+    """Adiciona catálogos geográficos em lote.
+
+    O corpo pode ser um CSV (text/csv), NDJSON (application/x-ndjson) ou uma
+    FeatureCollection GeoJSON (application/geo+json) de pontos, e é lido aos poucos.
+    Cada linha referencia uma coordenada já cadastrada por latitude e longitude.
+    As linhas são gravadas em transações de chunk_size linhas.
+
+    Retorna o total de linhas aceitas, duplicadas e inválidas, com o detalhe
+    das linhas não aceitas.
+    """
+    return ingest(query, ingest_geo_catalogs, GeoCatalogRowSchema)
+
+def ingest(query: BulkQuerySchema, ingest_rows, row_schema):
+    """ Executa uma carga em lote a partir do corpo da requisição.
+    """
+    if request.mimetype not in BULK_MIMETYPES:
+        return {"message": "formato não suportado: use %s." % ", ".join(BULK_MIMETYPES)}, 415
+
+    logger.debug(f"Carga em lote ({request.mimetype}), {query.chunk_size} linhas por transação")
+    session = Session()
+    try:
+        report = ingest_rows(session, read_rows(request.stream, request.mimetype),
+                             row_schema, query.chunk_size, query.upsert)
+    finally:
+        session.close()
+    logger.debug(f"Carga em lote: {report.accepted} aceitas, {report.duplicates} duplicadas, "
+                 f"{report.invalid} inválidas")
+    return report.as_dict(), 200
+
+@api.get('/geo_catalogs', tags=[geo_catalog_tag],
+         responses={"200": ViewGeoCatalogsSchema, "400": ErrorSchema, "404": ErrorSchema})
 def get_geo_catalogs(query: SearchGeoCatalogSchema):
     """Faz a busca pelos catálogos cadastrados.
 
     Retorna uma representação da listagem de catálogos geográficos. 
     
-    Caso haja parâmetro de busca, fará um filtro com a hashtag apresentada.
+    Caso haja parâmetro de busca, fará um filtro com a hashtag e/ou região apresentada.
     Caso não haja parâmetro, todos os catálogos serão retornados.
+    Com q, busca as palavras (por prefixo) no título, descrição, hashtag e nos dados
+    da coordenada (nome, cidade e região), ordenando pela relevância (bm25).
+    Com within (bbox) ou near + radius_m, apenas os catálogos de coordenadas da
+    área são retornados, ordenados pela distância ao ponto de referência.
+
+    Com fields (ex.: fields=id,latitude,longitude), apenas os campos informados são
+    lidos e retornados; com include_images=false, a URL da imagem é omitida.
+
+    Com limit, o resultado é paginado e next traz o cursor a ser enviado em after
+    para buscar a próxima página. Com o cabeçalho Accept: application/x-ndjson,
+    os catálogos são transmitidos um por linha, sem montar a lista em memória.
+
+    A listagem sem filtros é mantida em cache até a próxima escrita e tem ETag
+    (If-None-Match é respondido com 304).
 
     O retorno é completo, contemplando a relação entre coordenada e catálogo.
     """
-    logger.debug(f"Coletando geo_catalogs ")
+    request_logger.debug(f"Coletando geo_catalogs ")
 
     session = Session()
 
     # fazendo a busca utilizando join entre Coordinate e Geocatalog
-    if query.hashtag:
-        geo_catalogs = session.query(Coordinate).join(
-            GeoCatalog, Coordinate.geo_catalogs).filter(
-            GeoCatalog.hashtag.contains(query.hashtag)).all()
-    elif query.region:
-        geo_catalogs = session.query(Coordinate).join(
-            GeoCatalog, Coordinate.geo_catalogs).filter(
-            Coordinate.region.contains(query.region)).all()
-    else:
-        geo_catalogs = session.query(Coordinate).options(joinedload(Coordinate.geo_catalogs)).all()
+    # lê da base apenas as colunas dos campos pedidos (ex.: sem descrição e imagem
+    # em uma listagem que só desenha os pontos no mapa)
+    fields = query.selected_fields()
+    geo_catalogs = filter_geo_catalogs(select(*geo_catalog_columns(fields)), query)
+
+    # busca textual (FTS5), ordenada pela relevância
+    geo_catalogs = full_text_filter(geo_catalogs, geo_catalogs_fts, GeoCatalog.id, query.q)
+    # filtro por raio, ordenado pela distância
+    geo_catalogs = spatial_filter(geo_catalogs, near=query.near, radius_m=query.radius_m)
+    keys = order_keys(GeoCatalog.id, geo_catalogs_fts, query)
+    try:
+        geo_catalogs = keyset_paginate(geo_catalogs, keys, query.after, query.limit)
+    except ValueError as e:
+        return {"message": str(e)}, 400
 
-    if not geo_catalogs:
-        # se não há informação para retorno
-        return {"geo_catalogs": []}, 200
-    else:
-        logger.debug(f"%d geo_catalogs encontrados" % len(geo_catalogs))
+    if wants_ndjson():
+        rows = session.execute(geo_catalogs.execution_options(yield_per=STREAM_BATCH_SIZE))
+        page = KeysetPage(rows, len(keys), query.limit)
+        return stream_ndjson(session, page, geo_catalog_serializer(fields, query.size))
+
+    def listing():
+        page = KeysetPage(session.execute(geo_catalogs), len(keys), query.limit)
         # retorna a representação dos catálogos
-        return show_geo_catalogs(geo_catalogs), 200
+        result = show_geo_catalogs(page, fields, query.size)
+        request_logger.debug(f"%d geo_catalogs encontrados" % len(result["geo_catalogs"]))
+        if query.limit:
+            result["next"] = page.next
+        return result
+
+    if not (query.hashtag or query.region or query.q or query.within or query.near or
+            query.since or query.until):
+        # a listagem sem filtros fica em cache até a próxima escrita
+        return cached_json(("geo_catalogs", tuple(fields), query.size, query.limit, query.after), listing)
+    return json_response(listing())
+
+def filter_geo_catalogs(geo_catalogs, query: Union[SearchGeoCatalogSchema, ExportQuerySchema,
+                                                   DeleteGeoCatalogsQuerySchema]):
+    """ Junta a coordenada à consulta sobre GeoCatalog e aplica os filtros comuns à
+        listagem, à exportação e à remoção em lote: hashtag, região, data de criação
+        e bbox (within).
+    """
+    geo_catalogs = geo_catalogs.select_from(GeoCatalog).join(Coordinate, GeoCatalog.coordinate_id == Coordinate.id)
+    # hashtag e região: busca pela chave normalizada nos dicionários (indexada)
+    prefix = query.match == "prefix"
+    if query.hashtag:
+        geo_catalogs = geo_catalogs.filter(GeoCatalog.hashtag_id.in_(
+            matching_terms(Hashtag, query.hashtag, prefix)))
+    if query.region:
+        geo_catalogs = geo_catalogs.filter(Coordinate.region_id.in_(
+            matching_terms(Region, query.region, prefix)))
+    # data de criação (indexada), ex.: catálogos das últimas 24 horas
+    geo_catalogs = time_window_filter(geo_catalogs, GeoCatalog.created_at, query.since, query.until)
+    return spatial_filter(geo_catalogs, within=query.within)
+
+@api.get('/export', tags=[geo_catalog_tag],
+         responses={"400": ErrorSchema, "501": ErrorSchema})
+def export_geo_catalogs(query: ExportQuerySchema):
+    """Exporta os catálogos, com os dados das suas coordenadas, em GeoJSON, CSV,
+    NDJSON, Arrow (stream IPC) ou GeoParquet.
+
+    As linhas são lidas da base em lotes e transmitidas à medida que são convertidas,
+    em ordem de id: a memória usada não depende do tamanho da exportação. Os filtros
+    (within, hashtag, region, since e until) são opcionais; com include_images=false,
+    a URL da imagem é omitida (as imagens nunca são incluídas, apenas a URL).
+    """
+    if query.format in ARROW_FORMATS and pyarrow is None:
+        return {"message": "o formato %s exige o pyarrow instalado no servidor." % query.format}, 501
+
+    fields = query.selected_fields(geometry=query.format in GEOMETRY_FORMATS)
+    names = fields + ["coordinate_id"]
+    geo_catalogs = filter_geo_catalogs(select(*geo_catalog_columns(fields), GeoCatalog.coordinate_id),
+                                       query).order_by(GeoCatalog.id)
+
+    session = Session()
+    serialize = geo_catalog_serializer(fields)
+
+    def batches():
+        rows = session.execute(geo_catalogs.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for partition in rows.partitions():
+            record_rows(len(partition))
+            yield [{**serialize(row[:-1]), "coordinate_id": row[-1]} for row in partition]
+
+    def generate():
+        try:
+            yield from EXPORTERS[query.format](names, batches())
+        finally:
+            session.close()
 
-@app.delete('/geo_catalog', tags=[geo_catalog_tag],
+    extension, mimetype = EXPORT_FORMATS[query.format]
+    logger.debug(f"Exportando geo_catalogs em {query.format}")
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers={
+        "Content-Disposition": "attachment; filename=geo_catalogs.%s" % extension})
+
+@api.delete('/geo_catalog', tags=[geo_catalog_tag],
          responses={"200": ViewGeoCatalogsSchema, "404": ErrorSchema})
 def del_geo_catalogs(query: DeleteGeoCatalogSchema):
-    """Faz a busca pelos catálogos cadastrados.
-
-    Retorna uma representação da listagem de catálogos geográficos. 
-    
-    Caso haja parâmetro de busca, fará um filtro com a hashtag apresentada.
-    Caso não haja parâmetro, todos os catálogos serão retornados.
+    """Remove o catálogo geográfico com o id informado.
 
-    O retorno é completo, contemplando a relação entre coordenada e catálogo.
+    A imagem do catálogo é removida do disco se nenhum outro catálogo a referencia.
+    Retorna 404 se não há catálogo com esse id.
     """
-    logger.debug(f"Coletando geo_catalogs ")
-
-    session = Session()
+    logger.debug(f"Removendo geo_catalog {query.id}")
 
-    # fazendo a busca utilizando join entre Coordinate e Geocatalog
-    if query.id:
+    def delete(session):
         geo_catalog = session.query(GeoCatalog).filter(
             GeoCatalog.id == query.id).first()
-        
+        if not geo_catalog:
+            raise LookupError(query.id)
+        session.delete(geo_catalog)
+        session.flush()
+        # a imagem é removida do disco se nenhum outro catálogo a referencia
+        release_images(session, [geo_catalog.img_hash])
 
-    if not geo_catalog:
+    try:
+        # a remoção é feita pelo escritor único, em commit conjunto com outras escritas
+        writer.submit(delete)
+    except LookupError:
         # se não há informação para retorno
-        return {"erro": f"não há catálogos com esse identificador (id: %)." % query.id}, 404
-    else:
-        try:
-            session.delete(geo_catalog)
-            session.commit()
-            logger.debug(" geo_catalog %d removido" %  query.id)
-            # retorna a representação dos catálogos
-            return {"success": "Removido com sucesso."}, 200
-        except Exception as e:
-            # caso um erro fora do previsto
-            error_msg = e
-            logger.warning(f"Erro ao remover catálogo geográfico '{geo_catalog.title, geo_catalog.description}', {error_msg}")
-            return {"mesage": error_msg}, 400
-    
-@app.get('/hashtags', tags=[geo_catalog_tag],
+        return {"erro": "não há catálogos com esse identificador (id: %s)." % query.id}, 404
+    except Exception as e:
+        # caso um erro fora do previsto
+        error_msg = str(e)
+        logger.warning(f"Erro ao remover catálogo geográfico '{query.id}', {error_msg}")
+        return {"mesage": error_msg}, 400
+
+    logger.debug(" geo_catalog %d removido" %  query.id)
+    # retorna a representação dos catálogos
+    return {"success": "Removido com sucesso."}, 200
+
+@api.delete('/geo_catalogs', tags=[geo_catalog_tag],
+            responses={"200": DeleteGeoCatalogsReportSchema, "400": ErrorSchema})
+def del_geo_catalogs_by_filter(query: DeleteGeoCatalogsQuerySchema):
+    """Remove em lote os catálogos que atendem aos filtros.
+
+    Os filtros são os das listagens: hashtag e região (exatas ou, com match=prefix,
+    pelo início do nome), bbox (within=min_lon,min_lat,max_lon,max_lat) e data de
+    criação (since/until; until remove os criados antes da data). Ao menos um filtro
+    é obrigatório.
+
+    Os catálogos são removidos em transações de batch_size linhas, e as imagens que
+    deixam de ser referenciadas são removidas do disco. O retorno traz as quantidades
+    removidas. O espaço liberado na base é devolvido ao sistema pela manutenção em
+    segundo plano, que é antecipada ao fim da remoção.
+    """
+    logger.debug(f"Removendo geo_catalogs em lote")
+
+    candidates = filter_geo_catalogs(select(GeoCatalog.id, GeoCatalog.img_hash), query)
+
+    try:
+        report = delete_geo_catalogs(candidates, query.batch_size)
+    except Exception as e:
+        # os lotes confirmados antes do erro permanecem removidos
+        logger.warning(f"Erro na remoção em lote de catálogos geográficos: {e}")
+        return {"message": str(e)}, 400
+
+    logger.debug(f"%d geo_catalogs removidos em %d lotes" % (report["deleted"], report["batches"]))
+    if report["deleted"]:
+        maintenance.wake(analyze=True)
+    return report, 200
+
+@api.get('/geo_catalog/<int:id>/image', tags=[geo_catalog_tag],
+         responses={"404": ErrorSchema})
+def get_geo_catalog_image(path: GeoCatalogPathSchema, query: GeoCatalogImageQuerySchema):
+    """Retorna a imagem de um catálogo geográfico.
+
+    O arquivo é transmitido diretamente do disco, com ETag (o hash SHA-256 da imagem),
+    respondendo 304 a If-None-Match e aceitando requisições parciais (Range).
+
+    Com size=thumb|medium, retorna a imagem reduzida (WebP ou JPEG, sem EXIF),
+    gerada em segundo plano após o envio; enquanto ela não existe, a original é
+    retornada.
+    """
+    session = Session()
+    img_hash = session.query(GeoCatalog.img_hash).filter(GeoCatalog.id == path.id).scalar()
+    session.close()
+
+    if img_hash is None or not blob_store.exists(img_hash):
+        return {"message": "não há imagem para o catálogo (id: %d)." % path.id}, 404
+
+    if query.size:
+        if blob_store.exists(img_hash, query.size):
+            response = send_file(blob_store.derivative_path(img_hash, query.size),
+                                 mimetype=blob_store.mimetype(img_hash, query.size),
+                                 etag="%s.%s" % (img_hash, query.size), conditional=True)
+            response.cache_control.no_cache = True
+            return response
+        # imagens enviadas antes do pool (ou com o processamento interrompido)
+        thumbnails.submit(img_hash)
+
+    response = send_file(blob_store.path(img_hash), mimetype=blob_store.mimetype(img_hash),
+                         etag=img_hash, conditional=True)
+    # o conteúdo de um hash nunca muda, mas o catálogo pode ser removido
+    response.cache_control.no_cache = True
+    return response
+
+@api.get('/hashtags', tags=[geo_catalog_tag],
          responses={"200": ViewHashtagsSchema, "404": ErrorSchema})
-def get_hashtags():
+def get_hashtags(query: StatsQuerySchema):
     """Faz a busca por todas as hashtags cadastradas.
 
-    Retorna uma representação da listagem de hashtags (sem duplicação) encontradas na base.
+    Retorna uma representação da listagem de hashtags (sem duplicação) encontradas na base,
+    das mais frequentes para as menos. Com with_counts=true, cada hashtag traz a
+    quantidade de catálogos; com top, apenas as top mais frequentes são retornadas.
+    As quantidades são lidas da tabela de estatísticas (ver model/stats.py).
+    A listagem é mantida em cache até a próxima escrita e tem ETag (If-None-Match
+    é respondido com 304).
     """
-    logger.debug(f"Coletando hashtags")
-    
-    session = Session()
+    def listing():
+        request_logger.debug(f"Coletando hashtags")
 
-    hashtags = []
-    for geo_catalog in session.query(GeoCatalog.hashtag).distinct():
-        hashtags.append(geo_catalog.hashtag)
+        session = Session()
 
-    if not hashtags:
-        # se não há hashtags cadastradas
-        return {"hashtags": []}, 200
-    else:
-        logger.debug(f"%d hashtags encontrados" % len(hashtags))
+        hashtags = []
+        for hashtag, catalogs in hashtag_stats(session, query.top):
+            hashtags.append({"hashtag": hashtag, "catalogs": catalogs} if query.with_counts else hashtag)
+
+        request_logger.debug(f"%d hashtags encontrados" % len(hashtags))
         # retorna a representação de hashtags
-        return {"hashtags": hashtags}, 200
+        return {"hashtags": hashtags}
+
+    return cached_json(("hashtags", query.with_counts, query.top), listing)
     
-@app.get('/regions', tags=[geo_catalog_tag],
-         responses={"200": ViewHashtagsSchema, "404": ErrorSchema})
-def get_regions():
-    """Faz a busca por todas as hashtags cadastradas.
+@api.get('/regions', tags=[geo_catalog_tag],
+         responses={"200": ViewRegionsSchema, "404": ErrorSchema})
+def get_regions(query: StatsQuerySchema):
+    """Faz a busca por todas as regiões cadastradas.
+
+    Retorna uma representação da listagem de regiões (sem duplicação) encontradas na base,
+    das com mais coordenadas para as com menos. Com with_counts=true, cada região traz
+    a quantidade de coordenadas e de catálogos; com top, apenas as top maiores.
+    As quantidades são lidas da tabela de estatísticas (ver model/stats.py).
+    A listagem é mantida em cache até a próxima escrita e tem ETag (If-None-Match
+    é respondido com 304).
+    """
+    def listing():
+        request_logger.debug(f"Coletando regiões")
+
+        session = Session()
+
+        regions = []
+        for region, coordinates, catalogs in region_stats(session, query.top):
+            regions.append({"region": region, "coordinates": coordinates, "catalogs": catalogs}
+                           if query.with_counts else region)
 
-    Retorna uma representação da listagem de hashtags (sem duplicação) encontradas na base.
+        request_logger.debug(f"%d regiões encontradas" % len(regions))
+        # retorna a representação de regiões
+        return {"regions": regions}
+
+    return cached_json(("regions", query.with_counts, query.top), listing)
+
+@api.get('/stats/timeline', tags=[geo_catalog_tag],
+         responses={"200": ViewTimelineSchema})
+def get_timeline(query: TimelineQuerySchema):
+    """Retorna a quantidade de catálogos (ou coordenadas, com entity=coordinate)
+    criados por hora ou por dia (bucket=hour|day).
+
+    A contagem é feita pelo sqlite, com um GROUP BY sobre o índice de created_at,
+    limitado ao período since/until; hashtag e região são opcionais. O resultado
+    fica em cache até a próxima escrita.
+    """
+    request_logger.debug(f"Histograma de criação por {query.bucket}")
+    prefix = query.match == "prefix"
+    hashtags = matching_terms(Hashtag, query.hashtag, prefix) if query.hashtag else None
+    regions = matching_terms(Region, query.region, prefix) if query.region else None
+    if query.entity == "geo_catalog":
+        column = GeoCatalog.created_at
+        where = [GeoCatalog.hashtag_id.in_(hashtags)] if hashtags is not None else []
+        if regions is not None:
+            where.append(GeoCatalog.coordinate_id.in_(select(Coordinate.id).where(Coordinate.region_id.in_(regions))))
+    else:
+        column = Coordinate.created_at
+        where = [Coordinate.region_id.in_(regions)] if regions is not None else []
+        if hashtags is not None:
+            where.append(Coordinate.id.in_(select(GeoCatalog.coordinate_id).where(GeoCatalog.hashtag_id.in_(hashtags))))
+
+    def listing():
+        counts = timeline(Session(), column, query.bucket, query.since, query.until, where)
+        return {"bucket": query.bucket, "entity": query.entity,
+                "timeline": [{"start": start, "count": count} for start, count in counts]}
+
+    return cached_json(("timeline", query.bucket, query.entity, query.since, query.until,
+                        query.hashtag, query.region, query.match), listing)
+
+@api.get('/changes', tags=[sync_tag],
+         responses={"200": ViewChangesSchema, "410": ExpiredChangesSchema})
+def get_changes(query: ChangesQuerySchema):
+    """Retorna as coordenadas e os catálogos alterados desde o cursor since.
+
+    Cada entidade alterada aparece uma única vez, com a sua última alteração: upsert
+    traz os dados atuais (como nas listagens, com a URL da imagem) e delete apenas o
+    id. A resposta traz em next o cursor da próxima sincronização; com has_more,
+    ainda há alterações a buscar. Se o cursor é anterior às alterações mantidas no
+    registro (GEOVISIO_CHANGES_RETENTION), retorna 410: o cliente deve refazer a
+    sincronização completa e continuar a partir do next informado.
     """
-    logger.debug(f"Coletando regiões")
-    
     session = Session()
+    if change_log.expired(session, query.since):
+        # next é lido antes da sincronização completa: as alterações feitas
+        # durante ela serão entregues de novo, sem perdas
+        logger.debug("cursor %d anterior ao registro de alterações" % query.since)
+        return {"message": "Cursor anterior às alterações mantidas: refaça a sincronização completa.",
+                "next": change_log.last_id(session)}, 410
+    changes = change_log.since(session, query.since, query.limit + 1)
+    has_more = len(changes) > query.limit
+    changes = changes[:query.limit]
+
+    # dados atuais das entidades com upsert
+    upserts = {"coordinate": [], "geo_catalog": []}
+    for _, entity, entity_id, op in changes:
+        if op == "upsert":
+            upserts[entity].append(entity_id)
+    data = {}
+    coordinates = select(Coordinate.id, *coordinate_columns(DEFAULT_COORDINATE_FIELDS)).where(
+        Coordinate.id.in_(upserts["coordinate"]))
+    serialize = coordinate_serializer()
+    for row in session.execute(coordinates):
+        data["coordinate", row[0]] = {"id": row[0], **serialize(row[1:])}
+    geo_catalogs = select(GeoCatalog.coordinate_id, *geo_catalog_columns(DEFAULT_GEO_CATALOG_FIELDS)).select_from(
+        GeoCatalog).join(Coordinate, GeoCatalog.coordinate_id == Coordinate.id).where(
+        GeoCatalog.id.in_(upserts["geo_catalog"]))
+    serialize = geo_catalog_serializer()
+    for row in session.execute(geo_catalogs):
+        item = serialize(row[1:])
+        data["geo_catalog", item["id"]] = {**item, "coordinate_id": row[0]}
+
+    events = []
+    for _, entity, entity_id, op in changes:
+        item = data.get((entity, entity_id))
+        if op == "upsert" and item is not None:
+            events.append({"entity": entity, "id": entity_id, "op": "upsert", "data": item})
+        else:
+            # removida depois da leitura do registro: o delete também estará no registro
+            events.append({"entity": entity, "id": entity_id, "op": "delete"})
+    request_logger.debug(f"%d alterações desde %d" % (len(events), query.since))
+    return json_response({"changes": events, "next": changes[-1][0] if changes else query.since,
+                          "has_more": has_more})
+
+@api.get('/clusters', tags=[coordinate_tag],
+         responses={"200": ViewClustersSchema, "400": ErrorSchema})
+def get_clusters(query: ClusterQuerySchema):
+    """Agrupa as coordenadas da área visível do mapa em clusters.
+
+    A área (bbox) é dividida em uma grade que acompanha o zoom (cada tile do mapa tem
+    8 x 8 células). Para cada célula com coordenadas, retorna a quantidade de
+    coordenadas, o centróide, a quantidade de catálogos e as hashtags mais frequentes.
+
+    Os clusters são calculados por tile e mantidos em cache; uma escrita invalida
+    apenas os tiles que contêm as coordenadas alteradas.
+    """
+    bbox = parse_bbox(query.bbox)
+    if tile_count(bbox, query.zoom) > Config.CLUSTER_MAX_TILES:
+        return {"message": "área grande demais para o zoom %d: aproxime o mapa ou reduza o zoom."
+                           % query.zoom}, 400
 
-    regions = []
-    for coordinate in session.query(Coordinate.region).distinct():
-        regions.append(coordinate.region)
+    tile_invalidation.refresh()
+    session = Session()
+    min_lon, min_lat, max_lon, max_lat = bbox
+    clusters = []
+    for x, y in tiles_covering(bbox, query.zoom):
+        cells = cluster_cache.get(query.zoom, x, y, lambda: cluster_tile(session, query.zoom, x, y))
+        # apenas as células que intersectam a área pedida
+        for cell in cells:
+            cell_min_lon, cell_min_lat, cell_max_lon, cell_max_lat = cell["bbox"]
+            if cell_max_lon >= min_lon and cell_min_lon <= max_lon and \
+               cell_max_lat >= min_lat and cell_min_lat <= max_lat:
+                clusters.append(cell)
+    request_logger.debug(f"%d clusters no zoom %d" % (len(clusters), query.zoom))
+    return json_response({"zoom": query.zoom, "clusters": clusters})
+
+@api.get('/tiles/<int:z>/<int:x>/<int:y>.<format>', tags=[coordinate_tag],
+         responses={"404": ErrorSchema})
+def get_tile(path: TilePathSchema):
+    """Retorna as coordenadas de um tile do mapa (esquema XYZ, Web Mercator).
+
+    Com .mvt, o tile é um Mapbox Vector Tile com a camada coordinates; com .geojson,
+    uma FeatureCollection de pontos. Cada ponto traz os dados da coordenada, a
+    quantidade de catálogos e as hashtags mais frequentes.
+
+    Os tiles ficam em cache em disco; uma escrita invalida apenas os tiles que
+    contêm as coordenadas alteradas.
+    """
+    if path.x >= 2 ** path.z or path.y >= 2 ** path.z:
+        return {"message": "tile inexistente: %d/%d/%d." % (path.z, path.x, path.y)}, 404
 
-    if not regions:
-        # se não há hashtags cadastradas
-        return {"regions": []}, 200
-    else:
-        logger.debug(f"%d regiões encontradas" % len(regions))
-        # retorna a representação de hashtags
-        return {"regions": regions}, 200
\ No newline at end of file
+    def encode():
+        session = Session()
+        features = tile_features(session, path.z, path.x, path.y, Config.TILE_MAX_FEATURES)
+        request_logger.debug(f"tile %d/%d/%d: %d coordenadas" % (path.z, path.x, path.y, len(features)))
+        if path.format == "mvt":
+            return encode_mvt(features, path.z, path.x, path.y)
+        return dumps(encode_geojson(features))
+
+    tile_invalidation.refresh()
+    tile = tile_cache.get(path.z, path.x, path.y, path.format, encode)
+    mimetype = MVT_MIMETYPE if path.format == "mvt" else GEOJSON_MIMETYPE
+    if isinstance(tile, bytes):
+        return Response(tile, mimetype=mimetype)
+    response = send_file(tile, mimetype=mimetype, conditional=True)
+    # o conteúdo do tile muda a cada escrita na sua área
+    response.cache_control.no_cache = True
+    return response
+
+
+@click.command("init-db")
+@click.option("--rekey", is_flag=True,
+              help="Recalcula as posições das coordenadas com a nova GEOVISIO_COORDINATE_PRECISION, "
+                   "unindo as que passarem a ocupar a mesma posição.")
+@with_appcontext
+def init_db_command(rekey):
+    """Cria a base ou atualiza o esquema existente e grava a especificação OpenAPI.
+
+    Executado uma vez a cada implantação, antes de iniciar os workers.
+    """
+    try:
+        init_db(rekey=rekey)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo("Base de dados inicializada.")
+    if not maintenance.incremental():
+        click.echo("A base não tem auto_vacuum incremental: o espaço das remoções não será devolvido "
+                   "ao sistema (GEOVISIO_MAINTENANCE_FULL_VACUUM=1 converte a base no init-db).")
+    current_app.api_doc
+    click.echo("Especificação OpenAPI gravada em %s." % current_app.spec_path)
+
+
+def create_app():
+    """ Cria a aplicação: configura os logs, a instrumentação e registra as rotas.
+
+    Não cria nem altera a base (ver o comando init-db) e não monta a especificação
+    OpenAPI (montada no primeiro pedido e gravada em disco). Com o gunicorn, a
+    aplicação pode ser criada uma única vez antes do fork dos workers
+    (gunicorn --preload "app:create_app()"): conexões, threads do escritor e da
+    manutenção e filas de log são recriadas em cada worker.
+
+    A configuração vem apenas das variáveis de ambiente GEOVISIO_* (ver config.py):
+    a base, o pool de conexões, o escritor e os caches são criados na importação
+    dos módulos, antes de create_app, e não podem ser trocados por aplicação.
+    """
+    configure_logging()
+    app = LazyOpenAPI(__name__, info=info, spec_path=Config.OPENAPI_SPEC_PATH)
+    app.config.from_object(Config)
+    CORS(app)
+
+    # métricas das requisições, expostas em /metrics
+    instrumentation = RequestInstrumentation(engine, [Coordinate, GeoCatalog],
+                                             slow_request_ms=Config.SLOW_REQUEST_MS,
+                                             slow_sample_rate=Config.SLOW_REQUEST_SAMPLE_RATE,
+                                             server_timing=Config.SERVER_TIMING,
+                                             access_log=Config.ACCESS_LOG)
+    instrumentation.init_app(app)
+    app.teardown_appcontext(remove_session)
+    app.register_api(api)
+    app.cli.add_command(init_db_command)
+
+    if Config.MEMORY_INDEX and np is None:
+        logger.warning("GEOVISIO_MEMORY_INDEX exige o numpy: as buscas espaciais serão feitas pelo sqlite")
+    if not thumbnails.available:
+        logger.warning("As imagens derivadas exigem o Pillow: size=thumb|medium retornará a imagem original")
+    return app
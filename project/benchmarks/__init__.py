@@ -0,0 +1,3 @@
+""" Benchmarks da API: gerador de dados sintéticos (benchmarks.dataset) e
+    medição das rotas (benchmarks.harness). Ver "Benchmarks" no README.
+"""
@@ -0,0 +1,199 @@
+""" Gerador de dados sintéticos, reprodutível (mesma semente, mesmos dados).
+
+Preenche a base configurada (GEOVISIO_DATABASE_PATH / GEOVISIO_BLOB_PATH) com
+coordenadas agrupadas em torno de cidades, catálogos por coordenada com cauda
+longa (muitas coordenadas sem catálogo ou com poucos, algumas com centenas),
+hashtags e regiões com frequência de Zipf e imagens com tamanho log-normal.
+
+Uso (a partir do diretório project/):
+
+    python -m benchmarks.dataset --coordinates 100000 --seed 42 --database benchmarks/data/100k/
+"""
+from argparse import ArgumentParser
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+from itertools import accumulate
+import os
+import random
+import time
+
+
+# vocabulário dos textos gerados (nomes, títulos e descrições), para que a busca
+# textual encontre termos com frequências variadas
+WORDS = ("praia mata serra rio lagoa cachoeira trilha mirante parque museu igreja "
+         "mercado feira porto farol ponte estação fazenda vila centro bairro "
+         "histórico antigo novo grande pequeno alto baixo norte sul leste oeste "
+         "azul verde branco dourado colonial ecológico cultural natural urbano").split()
+
+# área (lat, lon) em que as cidades são sorteadas
+LATITUDE_RANGE = (-33.0, 5.0)
+LONGITUDE_RANGE = (-73.0, -35.0)
+
+# data de referência dos created_at gerados (fixa, para a reprodutibilidade)
+EPOCH = datetime(2024, 1, 1)
+
+# linhas gravadas por comando de inserção
+INSERT_CHUNK_SIZE = 5000
+
+
+@dataclass
+class DatasetSpec:
+    """ Parâmetros do conjunto de dados gerado.
+    """
+    coordinates: int = 10000
+    seed: int = 42
+    # fração das coordenadas sem catálogos e expoente da cauda (Pareto) das demais
+    empty_ratio: float = 0.3
+    catalogs_alpha: float = 1.5
+    max_catalogs: int = 200
+    # cardinalidades
+    hashtags: int = 2000
+    regions: int = 27
+    cities: int = 500
+    # imagens distintas (compartilhadas pelos catálogos), fração dos catálogos com
+    # imagem e mediana do tamanho, em bytes
+    images: int = 200
+    image_ratio: float = 0.7
+    image_median_bytes: int = 80 * 1024
+
+
+def zipf_weights(count: int, exponent: float = 1.1):
+    """ Retorna os pesos cumulativos de uma distribuição de Zipf com count valores.
+    """
+    return list(accumulate(1.0 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def image_bytes(rng: random.Random, median: int) -> bytes:
+    """ Gera o conteúdo de uma imagem (cabeçalho PNG seguido de bytes aleatórios).
+    """
+    size = int(min(5 * 1024 * 1024, max(2048, rng.lognormvariate(0, 0.8) * median)))
+    return b"\x89PNG\r\n\x1a\n" + rng.randbytes(size - 8)
+
+
+def generate(spec: DatasetSpec, log=print) -> dict:
+    """ Insere na base o conjunto de dados descrito em spec e retorna um resumo.
+
+    A base deve estar vazia: os identificadores são atribuídos pelo gerador.
+    """
+    # importado aqui: o model lê a configuração da base na importação, a partir das
+    # variáveis de ambiente, que quem chama pode ter acabado de definir
+    from sqlalchemy import insert, select, func
+    from model import engine, init_db, Coordinate, GeoCatalog
+    from model.blob_store import blob_store
+
+    init_db()
+
+    with engine.connect() as connection:
+        if connection.execute(select(func.count()).select_from(Coordinate.__table__)).scalar():
+            raise RuntimeError("a base de %s já tem coordenadas" % engine.url)
+
+    rng = random.Random(spec.seed)
+    started = time.perf_counter()
+
+    regions = ["Região %s %d" % (rng.choice(WORDS).title(), i) for i in range(spec.regions)]
+    cities = [("Cidade %s %d" % (rng.choice(WORDS).title(), i), rng.choice(regions),
+               rng.uniform(*LATITUDE_RANGE), rng.uniform(*LONGITUDE_RANGE))
+              for i in range(spec.cities)]
+    hashtags = ["#%s%d" % (rng.choice(WORDS), i) for i in range(spec.hashtags)]
+    city_weights = zipf_weights(len(cities))
+    hashtag_weights = zipf_weights(len(hashtags))
+
+    images = []
+    for _ in range(spec.images):
+        images.append(blob_store.put(image_bytes(rng, spec.image_median_bytes)))
+
+    coordinates, catalogs = [], []
+    totals = {"coordinates": 0, "geo_catalogs": 0}
+    catalog_id = 0
+
+    def flush(connection, force=False):
+        if coordinates and (force or len(coordinates) >= INSERT_CHUNK_SIZE):
+            connection.execute(insert(Coordinate.__table__), coordinates)
+            totals["coordinates"] += len(coordinates)
+            coordinates.clear()
+        if catalogs and (force or len(catalogs) >= INSERT_CHUNK_SIZE):
+            connection.execute(insert(GeoCatalog.__table__), catalogs)
+            totals["geo_catalogs"] += len(catalogs)
+            catalogs.clear()
+
+    with engine.begin() as connection:
+        for coordinate_id in range(1, spec.coordinates + 1):
+            city, region, city_lat, city_lon = rng.choices(cities, cum_weights=city_weights)[0]
+            created_at = EPOCH + timedelta(seconds=rng.randrange(2 * 365 * 24 * 3600))
+            # as coordenadas de uma cidade ficam a poucos quilômetros do centro
+            coordinates.append({
+                "id_coordinate": coordinate_id,
+                "latitude": round(max(-90.0, min(90.0, rng.gauss(city_lat, 0.05))), 6),
+                "longitude": round(max(-180.0, min(180.0, rng.gauss(city_lon, 0.05))), 6),
+                "city": city,
+                "region": region,
+                "country": "Brasil",
+                "name": sentence(rng, 2).title(),
+                "contact": "contato%d@example.com" % coordinate_id,
+                "created_at": created_at,
+            })
+
+            count = 0
+            if rng.random() >= spec.empty_ratio:
+                count = min(spec.max_catalogs, int(rng.paretovariate(spec.catalogs_alpha)))
+            for _ in range(count):
+                catalog_id += 1
+                img_hash, img_size = (rng.choice(images) if images and rng.random() < spec.image_ratio
+                                      else (None, None))
+                catalogs.append({
+                    "id_geo_catalog": catalog_id,
+                    "coordinate_id": coordinate_id,
+                    "title": sentence(rng, 3).capitalize(),
+                    "description": sentence(rng, rng.randint(5, 60)).capitalize() + ".",
+                    "img_hash": img_hash,
+                    "img_size": img_size,
+                    "hashtag": rng.choices(hashtags, cum_weights=hashtag_weights)[0],
+                    "created_at": created_at + timedelta(seconds=rng.randrange(90 * 24 * 3600)),
+                })
+            flush(connection)
+            if coordinate_id % 100000 == 0:
+                log("%d coordenadas, %d catálogos" % (coordinate_id, catalog_id))
+        flush(connection, force=True)
+
+    # incorpora o WAL ao arquivo da base, que pode então ser copiado
+    with engine.connect() as connection:
+        connection.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    engine.dispose()
+
+    summary = dict(asdict(spec), **{"inserted_" + name: total for name, total in totals.items()})
+    summary["seconds"] = round(time.perf_counter() - started, 2)
+    log("gerados %(inserted_coordinates)d coordenadas e %(inserted_geo_catalogs)d catálogos "
+        "em %(seconds).1f s" % summary)
+    return summary
+
+
+def spec_arguments(parser: ArgumentParser):
+    """ Adiciona ao parser as opções de DatasetSpec.
+    """
+    for name, default in asdict(DatasetSpec()).items():
+        parser.add_argument("--" + name.replace("_", "-"), dest=name, type=type(default),
+                            default=default)
+
+
+def spec_from_arguments(args) -> DatasetSpec:
+    return DatasetSpec(**{name: getattr(args, name) for name in asdict(DatasetSpec())})
+
+
+def main():
+    parser = ArgumentParser(description="Gera dados sintéticos para os benchmarks.")
+    parser.add_argument("--database", required=True,
+                        help="diretório da base (e das imagens) a ser preenchida")
+    spec_arguments(parser)
+    args = parser.parse_args()
+
+    os.environ["GEOVISIO_DATABASE_PATH"] = args.database
+    os.environ["GEOVISIO_BLOB_PATH"] = os.path.join(args.database, "blobs")
+    generate(spec_from_arguments(args))
+
+
+if __name__ == "__main__":
+    main()
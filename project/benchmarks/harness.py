@@ -0,0 +1,460 @@
+""" Mede a latência (p50/p95/p99), a vazão e o pico de memória (RSS) de cada rota
+    da API, pelo test client do Flask e por um servidor WSGI real (werkzeug, com
+    threads, acessado por HTTP), e compara com um baseline em JSON.
+
+Os dados são gerados uma vez (benchmarks.dataset) em --datasets e copiados para um
+diretório temporário a cada execução, já que os cenários de escrita alteram a base.
+
+Uso (a partir do diretório project/):
+
+    python -m benchmarks.harness --coordinates 10000 --requests 200
+    python -m benchmarks.harness --baseline benchmarks/baseline.json --save-baseline
+
+Os resultados são comparados ao baseline (benchmarks/baseline.json ou --baseline),
+quando gerado com os mesmos parâmetros: termina com código 1 se algum cenário
+ficar mais lento (p95) ou com menos vazão que o baseline além de --tolerance.
+"""
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Callable, Optional
+from urllib.parse import urlencode
+import base64
+import http.client
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.dataset import DatasetSpec, spec_arguments, spec_from_arguments
+
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_DATASETS = os.path.join(os.path.dirname(__file__), "data")
+
+
+@dataclass
+class Call:
+    """ Uma requisição de um cenário.
+    """
+    method: str
+    path: str
+    body: Optional[bytes] = None
+    headers: Optional[dict] = None
+    # título do catálogo inserido, para localizá-lo na resposta
+    title: Optional[str] = None
+
+
+@dataclass
+class Scenario:
+    """ Um cenário: nome e função que monta cada requisição (a partir de um
+        gerador aleatório e do contexto dos dados).
+    """
+    name: str
+    build: Callable[[random.Random, "Context"], Call]
+    # os cenários de escrita não são executados em paralelo no servidor
+    write: bool = False
+
+
+class Context:
+    """ Valores sorteados nas requisições: identificadores, hashtags, regiões e
+        pontos existentes na base.
+    """
+
+    def __init__(self, session_factory):
+        from model import Coordinate, GeoCatalog
+
+        session = session_factory()
+        try:
+            self.points = [(float(lat), float(lon)) for lat, lon in session.query(
+                Coordinate.latitude, Coordinate.longitude).order_by(Coordinate.id).limit(5000)]
+            self.catalog_ids = [id for id, in session.query(GeoCatalog.id).filter(
+                GeoCatalog.img_hash.isnot(None)).order_by(GeoCatalog.id).limit(5000)]
+            self.hashtags = [h for h, in session.query(GeoCatalog.hashtag).distinct().limit(200)]
+            self.regions = [r for r, in session.query(Coordinate.region).distinct()]
+        finally:
+            session.close()
+        # catálogos criados pelo cenário de inserção, removidos pelo de remoção
+        self.created = []
+        self.lock = threading.Lock()
+        self.sequence = 0
+
+    def next_sequence(self) -> int:
+        with self.lock:
+            self.sequence += 1
+            return self.sequence
+
+
+NDJSON = {"Accept": "application/x-ndjson"}
+
+
+def get(path: str, headers: Optional[dict] = None, **params) -> Call:
+    return Call("GET", path + ("?" + urlencode(params) if params else ""), headers=headers)
+
+
+def form(values: dict) -> tuple:
+    return urlencode(values).encode(), {"Content-Type": "application/x-www-form-urlencoded"}
+
+
+def add_coordinate(rng, context):
+    lat, lon = rng.choice(context.points)
+    body, headers = form({"latitude": lat + rng.uniform(-0.01, 0.01),
+                          "longitude": lon + rng.uniform(-0.01, 0.01),
+                          "name": "bench %d" % context.next_sequence(), "contact": "bench",
+                          "city": "bench", "region": "bench", "country": "bench"})
+    return Call("POST", "/coordinate", body, headers)
+
+
+def add_coordinates_bulk(rng, context):
+    lines = []
+    for _ in range(100):
+        lat, lon = rng.choice(context.points)
+        lines.append(json.dumps({"latitude": lat + rng.uniform(-0.01, 0.01),
+                                 "longitude": lon + rng.uniform(-0.01, 0.01),
+                                 "name": "bulk %d" % context.next_sequence()}))
+    return Call("POST", "/coordinates/bulk", "\n".join(lines).encode(),
+                {"Content-Type": "application/x-ndjson"})
+
+
+def add_geo_catalog(rng, context):
+    lat, lon = rng.choice(context.points)
+    image = b"\x89PNG\r\n\x1a\n" + rng.randbytes(2048)
+    title = "bench %d" % context.next_sequence()
+    body, headers = form({"title": title,
+                          "description": "benchmark", "hashtag": "#bench",
+                          "img_source": base64.urlsafe_b64encode(image).decode(),
+                          "latitude": lat, "longitude": lon,
+                          "name": "bench", "contact": "bench", "city": "bench",
+                          "region": "bench", "country": "bench"})
+    return Call("POST", "/geo_catalog", body, headers, title)
+
+
+def add_geo_catalogs_bulk(rng, context):
+    lines = []
+    for _ in range(100):
+        lat, lon = rng.choice(context.points)
+        lines.append(json.dumps({"latitude": lat, "longitude": lon,
+                                 "title": "bulk %d" % context.next_sequence(),
+                                 "hashtag": "#bench"}))
+    return Call("POST", "/geo_catalogs/bulk", "\n".join(lines).encode(),
+                {"Content-Type": "application/x-ndjson"})
+
+
+def delete_geo_catalog(rng, context):
+    with context.lock:
+        id = context.created.pop() if context.created else 0
+    return Call("DELETE", "/geo_catalog?" + urlencode({"id": id}))
+
+
+def bbox(rng, context, size=0.5):
+    lat, lon = rng.choice(context.points)
+    return "%f,%f,%f,%f" % (lon - size / 2, lat - size / 2, lon + size / 2, lat + size / 2)
+
+
+def near(rng, context):
+    return "%f,%f" % rng.choice(context.points)
+
+
+SCENARIOS = [
+    Scenario("home", lambda rng, c: get("/")),
+    Scenario("metrics", lambda rng, c: get("/metrics")),
+    Scenario("coordinates", lambda rng, c: get("/coordinates")),
+    Scenario("coordinates_page", lambda rng, c: get("/coordinates", limit=100)),
+    Scenario("coordinates_fields", lambda rng, c: get(
+        "/coordinates", fields="latitude,longitude", limit=1000)),
+    Scenario("coordinates_within", lambda rng, c: get("/coordinates", within=bbox(rng, c))),
+    Scenario("coordinates_near", lambda rng, c: get(
+        "/coordinates", near=near(rng, c), radius_m=5000)),
+    Scenario("coordinates_q", lambda rng, c: get(
+        "/coordinates", q=rng.choice(("praia", "cid", "serra mata", "reg")), limit=100)),
+    Scenario("coordinates_ndjson", lambda rng, c: get(
+        "/coordinates", NDJSON, limit=1000)),
+    Scenario("geo_catalogs", lambda rng, c: get("/geo_catalogs")),
+    Scenario("geo_catalogs_page", lambda rng, c: get("/geo_catalogs", limit=100)),
+    Scenario("geo_catalogs_hashtag", lambda rng, c: get(
+        "/geo_catalogs", hashtag=rng.choice(c.hashtags), limit=100)),
+    Scenario("geo_catalogs_region", lambda rng, c: get(
+        "/geo_catalogs", region=rng.choice(c.regions), limit=100)),
+    Scenario("geo_catalogs_within", lambda rng, c: get(
+        "/geo_catalogs", within=bbox(rng, c), limit=100)),
+    Scenario("geo_catalogs_q", lambda rng, c: get(
+        "/geo_catalogs", q=rng.choice(("praia", "museu", "trilha rio", "hist")), limit=100)),
+    Scenario("geo_catalogs_fields", lambda rng, c: get(
+        "/geo_catalogs", fields="id,latitude,longitude", limit=1000)),
+    Scenario("geo_catalogs_ndjson", lambda rng, c: get("/geo_catalogs", NDJSON, limit=1000)),
+    Scenario("geo_catalog_image", lambda rng, c: get(
+        "/geo_catalog/%d/image" % rng.choice(c.catalog_ids))),
+    Scenario("hashtags", lambda rng, c: get("/hashtags")),
+    Scenario("regions", lambda rng, c: get("/regions")),
+    Scenario("add_coordinate", add_coordinate, write=True),
+    Scenario("add_coordinates_bulk", add_coordinates_bulk, write=True),
+    Scenario("add_geo_catalog", add_geo_catalog, write=True),
+    Scenario("add_geo_catalogs_bulk", add_geo_catalogs_bulk, write=True),
+    Scenario("delete_geo_catalog", delete_geo_catalog, write=True),
+]
+
+
+def peak_rss_mb() -> float:
+    """ Pico de memória residente do processo, em MiB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é em bytes no macOS e em KiB no Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(latencies, errors: int, elapsed: float) -> dict:
+    return {
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "errors": errors,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+class TestClientDriver:
+    """ Executa as requisições pelo test client do Flask, em sequência.
+    """
+    name = "test_client"
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def __call__(self, call: Call):
+        response = self.client.open(call.path, method=call.method, data=call.body,
+                                    headers=call.headers or {})
+        body = response.get_data()
+        return response.status_code, body
+
+    def close(self):
+        pass
+
+
+class ServerDriver:
+    """ Executa as requisições por HTTP, em um servidor WSGI (werkzeug, com uma
+        thread por requisição) iniciado em segundo plano.
+    """
+    name = "server"
+
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+
+        self.server = make_server("127.0.0.1", 0, app, threaded=True)
+        self.port = self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def __call__(self, call: Call):
+        connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+        try:
+            connection.request(call.method, call.path, body=call.body, headers=call.headers or {})
+            response = connection.getresponse()
+            return response.status, response.read()
+        finally:
+            connection.close()
+
+    def close(self):
+        self.server.shutdown()
+
+
+def run_scenario(driver, scenario: Scenario, context: Context, requests: int,
+                 concurrency: int, seed: int) -> dict:
+    rng = random.Random("%d-%s" % (seed, scenario.name))
+    calls = [scenario.build(rng, context) for _ in range(requests)] if not scenario.write else None
+    lock = threading.Lock()
+    latencies, errors = [], [0]
+
+    def execute(call: Call):
+        started = time.perf_counter()
+        status, body = driver(call)
+        elapsed = time.perf_counter() - started
+        if call.title and status == 200:
+            # guarda o catálogo criado (o id vem na URL da imagem), para o cenário de remoção
+            for catalog in json.loads(body).get("geo_catalogs", []):
+                if catalog["title"] == call.title and catalog["img_url"]:
+                    with context.lock:
+                        context.created.append(int(catalog["img_url"].split("/")[2]))
+        with lock:
+            latencies.append(elapsed)
+            if status >= 400:
+                errors[0] += 1
+
+    # aquecimento: cache de consultas, conexões do pool, páginas da base
+    for _ in range(min(3, requests)):
+        if not scenario.write:
+            driver(calls[0])
+
+    started = time.perf_counter()
+    if scenario.write or concurrency == 1 or driver.name == "test_client":
+        # escritas dependem umas das outras (ex.: remoção dos catálogos criados)
+        for index in range(requests):
+            execute(calls[index] if calls else scenario.build(rng, context))
+    else:
+        with ThreadPoolExecutor(concurrency) as executor:
+            list(executor.map(execute, calls))
+    return summarize(latencies, errors[0], time.perf_counter() - started)
+
+
+def compare(results: dict, baseline: dict, tolerance: float):
+    """ Compara os resultados ao baseline e retorna as regressões encontradas.
+    """
+    regressions = []
+    for driver, scenarios in results.items():
+        for name, result in scenarios.items():
+            reference = baseline.get(driver, {}).get(name)
+            if not reference:
+                continue
+            if result["p95_ms"] > reference["p95_ms"] * (1 + tolerance):
+                regressions.append("%s/%s: p95 %.2f ms (baseline %.2f ms)" %
+                                   (driver, name, result["p95_ms"], reference["p95_ms"]))
+            if result["throughput_rps"] < reference["throughput_rps"] * (1 - tolerance):
+                regressions.append("%s/%s: %.1f req/s (baseline %.1f req/s)" %
+                                   (driver, name, result["throughput_rps"],
+                                    reference["throughput_rps"]))
+    return regressions
+
+
+def print_table(driver: str, scenarios: dict, baseline: dict):
+    print("\n[%s]" % driver)
+    print("%-24s %10s %10s %10s %10s %8s %9s %9s" % (
+        "cenário", "p50 ms", "p95 ms", "p99 ms", "req/s", "erros", "RSS MiB", "Δp95"))
+    for name, result in scenarios.items():
+        reference = baseline.get(driver, {}).get(name)
+        delta = ("%+.0f%%" % ((result["p95_ms"] / reference["p95_ms"] - 1) * 100)
+                 if reference and reference["p95_ms"] else "")
+        print("%-24s %10.2f %10.2f %10.2f %10.1f %8d %9.1f %9s" % (
+            name, result["p50_ms"], result["p95_ms"], result["p99_ms"],
+            result["throughput_rps"], result["errors"], result["peak_rss_mb"], delta))
+
+
+def prepare_database(spec: DatasetSpec, datasets: str) -> str:
+    """ Gera (caso ainda não exista) os dados de spec e retorna uma cópia
+        temporária, que pode ser alterada pelos cenários de escrita.
+    """
+    source = os.path.join(datasets, "%d-%d" % (spec.coordinates, spec.seed))
+    if not os.path.exists(os.path.join(source, "dataset.json")):
+        shutil.rmtree(source, ignore_errors=True)
+        # gerado em outro processo: o model lê a configuração da base na importação
+        import subprocess
+        command = [sys.executable, "-m", "benchmarks.dataset", "--database", source]
+        for name, value in asdict(spec).items():
+            command += ["--" + name.replace("_", "-"), str(value)]
+        subprocess.run(command, check=True, cwd=os.path.dirname(os.path.dirname(__file__)))
+        with open(os.path.join(source, "dataset.json"), "w") as spec_file:
+            json.dump(asdict(spec), spec_file, indent=2)
+
+    target = tempfile.mkdtemp(prefix="geovisio-bench-")
+    shutil.copytree(source, target, dirs_exist_ok=True)
+    return target
+
+
+def main():
+    parser = ArgumentParser(description="Mede a latência e a vazão das rotas da API.")
+    parser.add_argument("--datasets", default=DEFAULT_DATASETS,
+                        help="diretório em que os dados gerados são guardados")
+    parser.add_argument("--requests", type=int, default=100, help="requisições por cenário")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="requisições simultâneas no servidor (leituras)")
+    parser.add_argument("--driver", choices=("test_client", "server", "both"), default="both")
+    parser.add_argument("--scenarios", help="cenários a executar, separados por vírgula")
+    parser.add_argument("--baseline", help="arquivo JSON com os resultados de referência "
+                                           "(padrão: benchmarks/baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="grava os resultados como baseline, em vez de comparar")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="variação aceita em relação ao baseline (0.2 = 20%%)")
+    parser.add_argument("--output", help="grava os resultados em um arquivo JSON")
+    spec_arguments(parser)
+    args = parser.parse_args()
+
+    spec = spec_from_arguments(args)
+    database = prepare_database(spec, args.datasets)
+    os.environ["GEOVISIO_DATABASE_PATH"] = database
+    os.environ["GEOVISIO_BLOB_PATH"] = os.path.join(database, "blobs")
+    # o log de cada requisição distorceria as medidas
+    import logging
+    logging.disable(logging.WARNING)
+
+    from app import create_app
+    from model import Session, init_db
+
+    # a cópia da base pode ter sido gerada por uma versão anterior do esquema
+    init_db()
+    app = create_app()
+
+    scenarios = SCENARIOS
+    if args.scenarios:
+        names = args.scenarios.split(",")
+        scenarios = [scenario for scenario in SCENARIOS if scenario.name in names]
+    drivers = [TestClientDriver, ServerDriver]
+    if args.driver != "both":
+        drivers = [driver for driver in drivers if driver.name == args.driver]
+
+    baseline_path = args.baseline or DEFAULT_BASELINE
+    baseline = {}
+    if baseline_path and os.path.exists(baseline_path):
+        with open(baseline_path) as baseline_file:
+            reference = json.load(baseline_file)
+        if (reference.get("dataset") == asdict(spec) and reference.get("requests") == args.requests
+                and reference.get("concurrency") == args.concurrency):
+            baseline = reference.get("results", {})
+        elif not args.save_baseline:
+            print("baseline gerado com outros parâmetros (dados, requisições ou concorrência): "
+                  "sem comparação")
+
+    results = {}
+    try:
+        for driver_class in drivers:
+            driver = driver_class(app)
+            context = Context(Session)
+            Session.remove()
+            try:
+                results[driver.name] = {
+                    scenario.name: run_scenario(driver, scenario, context, args.requests,
+                                                args.concurrency, spec.seed)
+                    for scenario in scenarios}
+            finally:
+                driver.close()
+            print_table(driver.name, results[driver.name], baseline)
+    finally:
+        shutil.rmtree(database, ignore_errors=True)
+
+    report = {
+        "dataset": asdict(spec),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+    if args.save_baseline:
+        with open(baseline_path, "w") as baseline_file:
+            json.dump(report, baseline_file, indent=2)
+        print("\nbaseline gravado em %s" % baseline_path)
+        return
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\nregressões em relação ao baseline:")
+        for regression in regressions:
+            print("  " + regression)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+from collections import Counter, OrderedDict
+from hashlib import blake2b
+from typing import Callable, Iterable, Tuple, Union
+import atexit
+import fcntl
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+from model.tiles import tile_of
+
+
+# prefixo dos diretórios de cada processo no cache de tiles em disco
+TILE_DIRECTORY_PREFIX = "tiles-"
+# arquivo, em cada diretório de tiles, bloqueado (flock) pelo processo dono enquanto ele vive
+OWNER_LOCK_FILE = ".owner.lock"
+
+
+class GenerationCache:
+    """ Cache em memória de respostas já serializadas, válidas enquanto a geração
+        dos dados (model/generation.py) não muda.
+
+    Cada entrada guarda o corpo da resposta e seu ETag (hash do corpo). As
+    entradas menos usadas são descartadas quando max_entries é atingido.
+    """
+
+    def __init__(self, generation, max_entries: int):
+        self.generation = generation
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, compute: Callable[[], bytes]) -> Tuple[str, bytes]:
+        """ Retorna (etag, corpo) da chave, calculando o corpo com compute caso
+            não esteja em cache ou a geração tenha mudado.
+        """
+        generation = self.generation.current()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == generation:
+                self.entries.move_to_end(key)
+                return entry[1], entry[2]
+
+        body = compute()
+        etag = blake2b(body, digest_size=16).hexdigest()
+        with self.lock:
+            self.entries[key] = (generation, etag, body)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return etag, body
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class TileCache:
+    """ Cache em memória de valores calculados por tile (zoom, x, y).
+
+    Diferente de GenerationCache, uma escrita não descarta o cache inteiro:
+    TileInvalidation remove apenas os tiles que contêm as posições alteradas.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.zooms = Counter()
+        # incrementado a cada invalidação: um valor calculado durante uma
+        # invalidação pode estar desatualizado e não é guardado
+        self.version = 0
+        self.lock = threading.Lock()
+
+    def get(self, zoom: int, x: int, y: int, compute: Callable[[], object]):
+        key = (zoom, x, y)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            version = self.version
+
+        value = compute()
+        with self.lock:
+            if version != self.version:
+                return value
+            if key not in self.entries:
+                self.zooms[zoom] += 1
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                (old_zoom, _, _), _ = self.entries.popitem(last=False)
+                self.zooms[old_zoom] -= 1
+        return value
+
+    def invalidate(self, points: Iterable[Tuple[float, float]]):
+        """ Remove os tiles, de todos os zooms em cache, que contêm as posições.
+        """
+        with self.lock:
+            self.version += 1
+            for zoom in [zoom for zoom, count in self.zooms.items() if count]:
+                for lat, lon in points:
+                    x, y = tile_of(lat, lon, zoom)
+                    if self.entries.pop((zoom, x, y), None) is not None:
+                        self.zooms[zoom] -= 1
+
+    def clear(self):
+        with self.lock:
+            self.version += 1
+            self.entries.clear()
+            self.zooms.clear()
+
+
+class TileInvalidation:
+    """ Acompanha o registro de posições alteradas (model/locations.py) e invalida,
+        nos caches registrados, os tiles que as contêm.
+
+    O registro só é lido quando a geração dos dados muda. Com mais de max_changes
+    posições pendentes (ex.: após uma carga em lote), os caches são esvaziados.
+    """
+
+    def __init__(self, generation, changes, max_changes: int):
+        self.generation = generation
+        self.changes = changes
+        self.max_changes = max_changes
+        self.caches = []
+        self.cursor = None
+        self.seen_generation = None
+        self.lock = threading.Lock()
+
+    def register(self, cache):
+        self.caches.append(cache)
+        return cache
+
+    def refresh(self):
+        """ Aplica aos caches as alterações gravadas desde a última verificação.
+        """
+        generation = self.generation.current()
+        if generation == self.seen_generation:
+            return
+        with self.lock:
+            if generation == self.seen_generation:
+                return
+            if self.cursor is None:
+                # nada em cache ainda: basta acompanhar a partir da última posição
+                self.cursor = self.changes.last_id()
+            else:
+                oldest, rows = self.changes.since(self.cursor, self.max_changes + 1)
+                if len(rows) > self.max_changes or (oldest is not None and oldest > self.cursor + 1):
+                    # muitas alterações, ou o registro já descartou parte delas
+                    for cache in self.caches:
+                        cache.clear()
+                    self.cursor = self.changes.last_id()
+                elif rows:
+                    points = {(lat, lon) for _, lat, lon in rows}
+                    for cache in self.caches:
+                        cache.invalidate(points)
+                    self.cursor = rows[-1][0]
+            self.seen_generation = generation
+
+
+class DiskTileCache:
+    """ Cache em disco de tiles já codificados, com orçamento de max_bytes: os
+        tiles menos usados são removidos primeiro.
+
+    Um tile em cache custa apenas a leitura do arquivo. Como TileCache, é
+    invalidado por TileInvalidation apenas nos tiles com posições alteradas.
+
+    O índice de uso fica em memória, por processo: cada processo (ex.: cada worker
+    do gunicorn) grava os seus tiles em um diretório próprio, criado em root no
+    primeiro uso (<root>/tiles-<pid>-<sufixo>/<zoom>/<x>/<y>.<formato>), com o seu
+    próprio orçamento. Apenas esses diretórios são removidos: o deste processo na
+    saída e os de processos que já terminaram; root nunca é apagado.
+
+    O processo dono mantém um flock em <diretório>/.owner.lock: o sistema o libera
+    quando o processo termina, de qualquer forma, e um pid reutilizado por outro
+    processo não mantém vivo um diretório abandonado.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        # caminho absoluto: o arquivo é enviado com send_file (ver app.py)
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.zooms = Counter()
+        self.version = 0
+        self.lock = threading.Lock()
+        # diretório dos tiles deste processo, pid que o criou e o arquivo bloqueado
+        self.directory = None
+        self.pid = None
+        self.owner_lock = None
+        atexit.register(self.close)
+
+    def prepare(self):
+        """ Cria o diretório dos tiles deste processo, descartando o índice herdado
+            do processo pai após um fork (com o lock adquirido).
+        """
+        os.makedirs(self.root, exist_ok=True)
+        remove_stale_directories(self.root)
+        if self.owner_lock is not None:
+            # a cópia herdada do pai: fechá-la não libera o lock, que continua com ele
+            os.close(self.owner_lock)
+            self.owner_lock = None
+        self.pid = os.getpid()
+        # o diretório é criado com um nome oculto (ignorado por remove_stale_directories)
+        # e só recebe o nome definitivo depois de bloqueado
+        staging = tempfile.mkdtemp(prefix=".%s%d-" % (TILE_DIRECTORY_PREFIX, self.pid), dir=self.root)
+        self.owner_lock = lock_owner(staging)
+        self.directory = os.path.join(self.root, os.path.basename(staging)[1:])
+        os.rename(staging, self.directory)
+        self.entries.clear()
+        self.zooms.clear()
+        self.size = 0
+
+    def close(self):
+        """ Remove o diretório dos tiles deste processo (na saída do processo) e
+            libera o lock.
+        """
+        with self.lock:
+            if self.directory is not None and self.pid == os.getpid():
+                shutil.rmtree(self.directory, ignore_errors=True)
+                self.directory = None
+                os.close(self.owner_lock)
+                self.owner_lock = None
+
+    def path(self, zoom: int, x: int, y: int, fmt: str) -> str:
+        return os.path.join(self.directory, str(zoom), str(x), "%d.%s" % (y, fmt))
+
+    def get(self, zoom: int, x: int, y: int, fmt: str, compute: Callable[[], bytes]) -> Union[str, bytes]:
+        """ Retorna o caminho do arquivo do tile, gravando-o com compute se não
+            estiver em cache. Se o tile for invalidado durante o cálculo, retorna
+            o conteúdo calculado, que não é guardado.
+        """
+        key = (zoom, x, y, fmt)
+        with self.lock:
+            if self.directory is None or self.pid != os.getpid():
+                self.prepare()
+            path = self.path(*key)
+            if key in self.entries and os.path.exists(path):
+                self.entries.move_to_end(key)
+                return path
+            version = self.version
+
+        data = compute()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # grava em um arquivo temporário e renomeia, para que um leitor
+        # concorrente nunca veja um tile incompleto
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(data)
+        with self.lock:
+            if version != self.version:
+                os.unlink(tmp_path)
+                return data
+            os.replace(tmp_path, path)
+            if key in self.entries:
+                self.size -= self.entries[key]
+            else:
+                self.zooms[zoom] += 1
+            self.entries[key] = len(data)
+            self.size += len(data)
+            while self.size > self.max_bytes and len(self.entries) > 1:
+                self.remove(next(iter(self.entries)))
+        return path
+
+    def remove(self, key):
+        """ Remove o tile do cache e do disco (com o lock adquirido).
+        """
+        self.size -= self.entries.pop(key)
+        self.zooms[key[0]] -= 1
+        try:
+            os.unlink(self.path(*key))
+        except FileNotFoundError:
+            pass
+
+    def invalidate(self, points: Iterable[Tuple[float, float]]):
+        """ Remove os tiles, de todos os zooms e formatos em cache, que contêm as posições.
+        """
+        with self.lock:
+            self.version += 1
+            keys = {}
+            for key in self.entries:
+                keys.setdefault(key[:3], []).append(key)
+            for zoom in [zoom for zoom, count in self.zooms.items() if count]:
+                for lat, lon in points:
+                    x, y = tile_of(lat, lon, zoom)
+                    for key in keys.pop((zoom, x, y), ()):
+                        self.remove(key)
+
+    def clear(self):
+        with self.lock:
+            self.version += 1
+            for key in list(self.entries):
+                self.remove(key)
+
+
+def remove_stale_directories(root: str):
+    """ Remove os diretórios de tiles (ver DiskTileCache) de processos que já
+        terminaram, ex.: workers interrompidos antes de remover o seu. Um diretório
+        só é abandonado se o lock do seu dono pode ser adquirido (ou se não tem
+        arquivo de lock, criado por uma versão anterior).
+    """
+    for name in os.listdir(root):
+        if not re.fullmatch(re.escape(TILE_DIRECTORY_PREFIX) + r"\d+-\w+", name):
+            continue
+        directory = os.path.join(root, name)
+        try:
+            fd = os.open(os.path.join(directory, OWNER_LOCK_FILE), os.O_RDWR)
+        except FileNotFoundError:
+            shutil.rmtree(directory, ignore_errors=True)
+            continue
+        except OSError:
+            continue
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            # o dono está vivo
+            os.close(fd)
+            continue
+        try:
+            shutil.rmtree(directory, ignore_errors=True)
+        finally:
+            os.close(fd)
+
+
+def lock_owner(directory: str) -> int:
+    """ Cria e bloqueia o arquivo de lock do dono do diretório. Retorna o descritor,
+        que deve ficar aberto enquanto o processo usa o diretório.
+    """
+    fd = os.open(os.path.join(directory, OWNER_LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o600)
+    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    return fd
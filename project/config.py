@@ -0,0 +1,137 @@
+import os
+
+
+def env_int(name: str, default: int) -> int:
+    """ Lê uma variável de ambiente inteira, com valor padrão.
+    """
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+def env_float(name: str, default: float) -> float:
+    """ Lê uma variável de ambiente decimal, com valor padrão.
+    """
+    value = os.environ.get(name)
+    return float(value) if value not in (None, "") else default
+
+
+def env_bool(name: str, default: bool) -> bool:
+    """ Lê uma variável de ambiente booleana (1, true, yes, on), com valor padrão.
+    """
+    value = os.environ.get(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_str(name: str, default: str) -> str:
+    """ Lê uma variável de ambiente de texto, com valor padrão (se ausente ou vazia).
+    """
+    value = os.environ.get(name)
+    return value if value not in (None, "") else default
+
+
+class Config:
+    """ Configurações da API, lidas das variáveis de ambiente GEOVISIO_*.
+    """
+    # diretório da base sqlite
+    DATABASE_PATH = env_str("GEOVISIO_DATABASE_PATH", "database/")
+    # diretório das imagens dos catálogos (blob store)
+    BLOB_PATH = env_str("GEOVISIO_BLOB_PATH", "database/blobs/")
+    # casas decimais da posição (latitude, longitude) que identifica uma coordenada
+    COORDINATE_PRECISION = env_int("GEOVISIO_COORDINATE_PRECISION", 6)
+
+    # pool de conexões: conexões mantidas abertas, conexões extras permitidas
+    # em picos e segundos de espera por uma conexão livre
+    DB_POOL_SIZE = env_int("GEOVISIO_DB_POOL_SIZE", 5)
+    DB_MAX_OVERFLOW = env_int("GEOVISIO_DB_MAX_OVERFLOW", 10)
+    DB_POOL_TIMEOUT = env_int("GEOVISIO_DB_POOL_TIMEOUT", 30)
+
+    # PRAGMAs aplicados a cada conexão sqlite. Com WAL, leitores não bloqueiam
+    # (nem são bloqueados) pelo escritor; NORMAL só sincroniza o disco nos checkpoints.
+    SQLITE_JOURNAL_MODE = env_str("GEOVISIO_SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = env_str("GEOVISIO_SQLITE_SYNCHRONOUS", "NORMAL")
+    # bytes da base lidos via mmap (256 MiB)
+    SQLITE_MMAP_SIZE = env_int("GEOVISIO_SQLITE_MMAP_SIZE", 256 * 1024 * 1024)
+    # cache de páginas por conexão; valores negativos são em KiB (64 MiB)
+    SQLITE_CACHE_SIZE = env_int("GEOVISIO_SQLITE_CACHE_SIZE", -64 * 1024)
+    # milissegundos de espera por um lock antes de 'database is locked'
+    SQLITE_BUSY_TIMEOUT = env_int("GEOVISIO_SQLITE_BUSY_TIMEOUT", 5000)
+    # com INCREMENTAL, as páginas liberadas pelas remoções podem ser devolvidas ao
+    # sistema aos poucos (ver model/maintenance.py); vale apenas para bases novas
+    SQLITE_AUTO_VACUUM = env_str("GEOVISIO_SQLITE_AUTO_VACUUM", "INCREMENTAL")
+
+    # escritor único (model/writer.py): operações confirmadas por transação e
+    # milissegundos de espera por novas operações antes do commit
+    WRITER_MAX_BATCH = env_int("GEOVISIO_WRITER_MAX_BATCH", 64)
+    WRITER_MAX_DELAY_MS = env_int("GEOVISIO_WRITER_MAX_DELAY_MS", 2)
+
+    # cache das listagens (cache.py): intervalo, em milissegundos, entre as
+    # verificações de escritas feitas por outros processos, e máximo de entradas
+    CACHE_CHECK_INTERVAL_MS = env_int("GEOVISIO_CACHE_CHECK_INTERVAL_MS", 1000)
+    CACHE_MAX_ENTRIES = env_int("GEOVISIO_CACHE_MAX_ENTRIES", 256)
+
+    # instrumentação (metrics.py): limite, em milissegundos, a partir do qual uma
+    # requisição é registrada no log como lenta (com o plano do SQL mais lento),
+    # fração das requisições lentas registradas e envio do cabeçalho Server-Timing
+    SLOW_REQUEST_MS = env_int("GEOVISIO_SLOW_REQUEST_MS", 500)
+    SLOW_REQUEST_SAMPLE_RATE = env_float("GEOVISIO_SLOW_REQUEST_SAMPLE_RATE", 1.0)
+    SERVER_TIMING = env_bool("GEOVISIO_SERVER_TIMING", False)
+
+    # logs (logger.py): diretório, nível, tamanho (em bytes) a partir do qual cada
+    # arquivo é rotacionado e quantidade de arquivos antigos mantidos, fração das
+    # mensagens de debug das leituras registradas e log de acesso (uma linha JSON
+    # por requisição)
+    LOG_PATH = env_str("GEOVISIO_LOG_PATH", "log/")
+    LOG_LEVEL = env_str("GEOVISIO_LOG_LEVEL", "INFO").upper()
+    LOG_MAX_BYTES = env_int("GEOVISIO_LOG_MAX_BYTES", 10 * 1024 * 1024)
+    LOG_BACKUP_COUNT = env_int("GEOVISIO_LOG_BACKUP_COUNT", 5)
+    LOG_DEBUG_SAMPLE_RATE = env_float("GEOVISIO_LOG_DEBUG_SAMPLE_RATE", 0.01)
+    ACCESS_LOG = env_bool("GEOVISIO_ACCESS_LOG", False)
+
+    # clusters e tiles: posições alteradas mantidas no registro (model/locations.py),
+    # posições pendentes acima das quais os caches por tile são esvaziados, tiles
+    # mantidos no cache de /clusters e tiles calculados por requisição
+    LOCATION_CHANGES_RETENTION = env_int("GEOVISIO_LOCATION_CHANGES_RETENTION", 100000)
+    # sincronização (/changes): alterações mantidas no registro (model/changes.py)
+    CHANGES_RETENTION = env_int("GEOVISIO_CHANGES_RETENTION", 1000000)
+    TILE_CACHE_MAX_CHANGES = env_int("GEOVISIO_TILE_CACHE_MAX_CHANGES", 2000)
+    CLUSTER_CACHE_MAX_TILES = env_int("GEOVISIO_CLUSTER_CACHE_MAX_TILES", 4096)
+    CLUSTER_MAX_TILES = env_int("GEOVISIO_CLUSTER_MAX_TILES", 64)
+
+    # tiles (/tiles/{z}/{x}/{y}.mvt|.geojson): diretório (cada processo grava os
+    # seus tiles em um subdiretório próprio) e orçamento, em bytes, de cada
+    # processo no cache em disco e máximo de coordenadas por tile
+    TILE_CACHE_PATH = env_str("GEOVISIO_TILE_CACHE_PATH", "database/tiles/")
+    TILE_CACHE_MAX_BYTES = env_int("GEOVISIO_TILE_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+    TILE_MAX_FEATURES = env_int("GEOVISIO_TILE_MAX_FEATURES", 20000)
+
+    # índice em memória das coordenadas (model/memory_index.py), usado nas buscas
+    # espaciais de /coordinates quando habilitado (exige numpy)
+    MEMORY_INDEX = env_bool("GEOVISIO_MEMORY_INDEX", False)
+
+    # imagens derivadas (model/thumbnails.py): maior lado, em pixels, de cada
+    # tamanho, formato (webp ou jpeg), qualidade e processos que as geram (exige Pillow)
+    THUMB_SIZE = env_int("GEOVISIO_THUMB_SIZE", 128)
+    MEDIUM_SIZE = env_int("GEOVISIO_MEDIUM_SIZE", 512)
+    THUMBNAIL_FORMAT = env_str("GEOVISIO_THUMBNAIL_FORMAT", "webp").lower()
+    THUMBNAIL_QUALITY = env_int("GEOVISIO_THUMBNAIL_QUALITY", 80)
+    THUMBNAIL_WORKERS = env_int("GEOVISIO_THUMBNAIL_WORKERS", 2)
+
+    # especificação OpenAPI, montada no primeiro pedido (ou pelo init-db) e
+    # reutilizada pelos workers enquanto o código das rotas não mudar
+    OPENAPI_SPEC_PATH = env_str("GEOVISIO_OPENAPI_SPEC_PATH", "database/openapi.json")
+
+    # manutenção da base (model/maintenance.py): segundos entre as execuções (0
+    # desabilita), bytes livres na base a partir dos quais as páginas são devolvidas
+    # ao sistema, páginas devolvidas por passo e milissegundos de pausa entre os
+    # passos, segundos entre as atualizações das estatísticas do planejador (ANALYZE),
+    # linhas lidas por índice em cada ANALYZE e conversão das bases existentes
+    # para auto_vacuum incremental (VACUUM completo no init-db)
+    MAINTENANCE_INTERVAL_S = env_int("GEOVISIO_MAINTENANCE_INTERVAL_S", 300)
+    MAINTENANCE_VACUUM_BYTES = env_int("GEOVISIO_MAINTENANCE_VACUUM_BYTES", 8 * 1024 * 1024)
+    MAINTENANCE_VACUUM_STEP_PAGES = env_int("GEOVISIO_MAINTENANCE_VACUUM_STEP_PAGES", 256)
+    MAINTENANCE_VACUUM_PAUSE_MS = env_int("GEOVISIO_MAINTENANCE_VACUUM_PAUSE_MS", 50)
+    MAINTENANCE_ANALYZE_INTERVAL_S = env_int("GEOVISIO_MAINTENANCE_ANALYZE_INTERVAL_S", 3600)
+    MAINTENANCE_ANALYSIS_LIMIT = env_int("GEOVISIO_MAINTENANCE_ANALYSIS_LIMIT", 1000)
+    MAINTENANCE_FULL_VACUUM = env_bool("GEOVISIO_MAINTENANCE_FULL_VACUUM", False)
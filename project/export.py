@@ -0,0 +1,186 @@
+import csv
+import io
+import json
+from datetime import datetime
+from struct import pack
+from typing import Iterable, Iterator, List
+
+from serialization import dumps
+
+# pyarrow é opcional: sem ele, os formatos arrow e parquet não estão disponíveis
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+# formatos da exportação: extensão do arquivo e tipo do conteúdo
+EXPORT_FORMATS = {
+    "geojson": ("geojson", "application/geo+json"),
+    "csv": ("csv", "text/csv"),
+    "ndjson": ("ndjson", "application/x-ndjson"),
+    "arrow": ("arrow", "application/vnd.apache.arrow.stream"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+# formatos que exigem o pyarrow
+ARROW_FORMATS = {"arrow", "parquet"}
+# formatos que exigem a posição (latitude e longitude) de cada linha
+GEOMETRY_FORMATS = {"geojson", "parquet"}
+
+# Cada exportação recebe os nomes das colunas e percorre os lotes de linhas (listas
+# de dicts, na ordem das colunas), gerando os bytes da resposta lote a lote: a
+# memória usada depende do tamanho do lote, não da quantidade de linhas exportadas.
+
+
+def export_ndjson(names: List[str], batches: Iterable[List[dict]]) -> Iterator[bytes]:
+    """ Gera uma linha JSON por catálogo, um bloco por lote.
+    """
+    for batch in batches:
+        yield b"".join(dumps(row) + b"\n" for row in batch)
+
+
+def export_csv(names: List[str], batches: Iterable[List[dict]]) -> Iterator[bytes]:
+    """ Gera um CSV com o cabeçalho names (uma única vez) e uma linha por catálogo.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for batch in batches:
+        writer.writerows([row[name] for name in names] for row in batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def export_geojson(names: List[str], batches: Iterable[List[dict]]) -> Iterator[bytes]:
+    """ Gera uma FeatureCollection de pontos; os demais campos são as propriedades.
+    """
+    properties = [name for name in names if name not in ("latitude", "longitude")]
+    yield b'{"type":"FeatureCollection","features":['
+    separator = b""
+    for batch in batches:
+        features = []
+        for row in batch:
+            geometry = None
+            if row["latitude"] is not None and row["longitude"] is not None:
+                geometry = {"type": "Point", "coordinates": [row["longitude"], row["latitude"]]}
+            features.append(dumps({"type": "Feature", "geometry": geometry,
+                                   "properties": {name: row[name] for name in properties}}))
+        if features:
+            yield separator + b",".join(features)
+            separator = b","
+    yield b"]}"
+
+
+# tipos das colunas nos formatos colunares (as demais são texto)
+ARROW_TYPES = {
+    "id": "int64",
+    "coordinate_id": "int64",
+    "latitude": "float64",
+    "longitude": "float64",
+    "created_at": "timestamp",
+}
+
+
+def arrow_schema(names: List[str], metadata: dict = None):
+    """ Retorna o schema Arrow dos campos (ver ARROW_TYPES; texto por padrão).
+    """
+    types = {"int64": pyarrow.int64(), "float64": pyarrow.float64(), "timestamp": pyarrow.timestamp("us")}
+    return pyarrow.schema([(name, types.get(ARROW_TYPES.get(name), pyarrow.string())) for name in names],
+                          metadata=metadata)
+
+
+def arrow_batch(names: List[str], batch: List[dict], schema):
+    """ Converte um lote de catálogos em um RecordBatch do schema.
+    """
+    columns = []
+    for name in names:
+        values = [row[name] for row in batch]
+        if ARROW_TYPES.get(name) == "timestamp":
+            values = [None if value is None else datetime.fromisoformat(value) for value in values]
+        columns.append(values)
+    return pyarrow.RecordBatch.from_arrays(
+        [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema)
+
+
+class ChunkSink(io.RawIOBase):
+    """ Destino de escrita do pyarrow que guarda os bytes até serem consumidos por
+        drain. A posição é a soma de tudo o que já foi escrito (o parquet a usa para
+        os offsets do rodapé).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def export_arrow(names: List[str], batches: Iterable[List[dict]]) -> Iterator[bytes]:
+    """ Gera um stream Arrow IPC, com um record batch por lote.
+    """
+    schema = arrow_schema(names)
+    sink = ChunkSink()
+    with pyarrow.ipc.new_stream(sink, schema) as writer:
+        for batch in batches:
+            if batch:
+                writer.write_batch(arrow_batch(names, batch, schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def point_wkb(latitude, longitude):
+    """ Ponto em WKB (little endian), a codificação de geometria do GeoParquet.
+    """
+    if latitude is None or longitude is None:
+        return None
+    return pack("<BIdd", 1, 1, longitude, latitude)
+
+
+def export_parquet(names: List[str], batches: Iterable[List[dict]]) -> Iterator[bytes]:
+    """ Gera um arquivo GeoParquet, com um row group por lote e a posição de cada
+        linha também na coluna geometry (ponto em WKB, WGS 84).
+    """
+    geo = {"version": "1.0.0", "primary_column": "geometry",
+           "columns": {"geometry": {"encoding": "WKB", "geometry_types": ["Point"]}}}
+    schema = arrow_schema(names, metadata={"geo": json.dumps(geo)})
+    schema = schema.append(pyarrow.field("geometry", pyarrow.binary()))
+    sink = ChunkSink()
+    with pyarrow.parquet.ParquetWriter(sink, schema) as writer:
+        for batch in batches:
+            if batch:
+                record_batch = arrow_batch(names, batch, schema.remove(len(names)))
+                geometry = pyarrow.array([point_wkb(row["latitude"], row["longitude"]) for row in batch],
+                                         type=pyarrow.binary())
+                writer.write_batch(pyarrow.RecordBatch.from_arrays(record_batch.columns + [geometry],
+                                                                   schema=schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+EXPORTERS = {
+    "geojson": export_geojson,
+    "csv": export_csv,
+    "ndjson": export_ndjson,
+    "arrow": export_arrow,
+    "parquet": export_parquet,
+}
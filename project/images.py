@@ -0,0 +1,49 @@
+import os
+import tempfile
+import time
+
+# Pillow é opcional: sem ele, as imagens derivadas não são geradas e ?size=
+# retorna a imagem original
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:
+    Image = None
+
+
+# Funções executadas nos processos do pool (ver model/thumbnails.py): não importam
+# nada da api, para que cada processo carregue apenas o Pillow.
+
+
+def encoder_format(preferred: str) -> str:
+    """ Retorna o formato de gravação das imagens derivadas: webp, se o Pillow
+        tiver suporte a ele, ou jpeg.
+    """
+    if preferred == "webp" and features.check("webp"):
+        return "WEBP"
+    return "JPEG"
+
+
+def make_derivative(source: str, target: str, max_size: int, format: str, quality: int) -> float:
+    """ Gera a imagem derivada de source em target: decodifica, reduz para que o
+        maior lado tenha no máximo max_size pixels (sem ampliar), aplica a rotação
+        indicada no EXIF e grava sem os metadados. Retorna o tempo gasto, em segundos.
+    """
+    started = time.perf_counter()
+    with Image.open(source) as image:
+        # o JPEG pode ser decodificado já reduzido (1/2, 1/4 ou 1/8), bem mais rápido
+        image.draft("RGB", (max_size, max_size))
+        image = ImageOps.exif_transpose(image)
+        alpha = format == "WEBP" and (image.mode in ("RGBA", "LA") or "transparency" in image.info)
+        image = image.convert("RGBA" if alpha else "RGB")
+        image.thumbnail((max_size, max_size), Image.LANCZOS)
+
+        # grava em um arquivo temporário e renomeia, como o blob store
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                image.save(tmp_file, format=format, quality=quality, exif=b"")
+            os.replace(tmp_path, target)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    return time.perf_counter() - started
@@ -1,71 +1,165 @@
 from logging.config import dictConfig
+from logging.handlers import QueueHandler, QueueListener
+import atexit
+import json
 import logging
 import os
+import queue
+import random
 
+from config import Config
 
-log_path = "log/"
-# Verifica se o diretorio para armexanar os logs não existe
-if not os.path.exists(log_path):
-   # então cria o diretorio
-   os.makedirs(log_path)
 
+class AccessFormatter(logging.Formatter):
+    """ Formata o log de acesso como uma linha JSON: data e os campos da
+        requisição passados em extra={"access": {...}} (ver metrics.py).
+    """
 
-dictConfig({
-    "version": 1,
-    "disable_existing_loggers": True,
-    "formatters": {
-        "default": {
-            "format": "[%(asctime)s] %(levelname)-4s %(funcName)s() L%(lineno)-4d %(message)s",
+    def format(self, record):
+        return json.dumps({"time": self.formatTime(record), **getattr(record, "access", {})},
+                          ensure_ascii=False, separators=(",", ":"))
+
+
+class SampleFilter(logging.Filter):
+    """ Deixa passar apenas uma fração (rate) das mensagens de debug; as demais
+        mensagens passam sempre. Usado apenas em request_logger (ver abaixo).
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+def rotating_file(config, filename: str, formatter: str) -> dict:
+    return {
+        "class": "logging.handlers.RotatingFileHandler",
+        "formatter": formatter,
+        "filename": os.path.join(config.LOG_PATH, filename),
+        "maxBytes": config.LOG_MAX_BYTES,
+        "backupCount": config.LOG_BACKUP_COUNT,
+        "delay": "True",
+        "encoding": "utf-8",
+    }
+
+
+def use_queue(name=None) -> QueueHandler:
+    """ Troca os handlers do logger por uma fila: a requisição apenas enfileira a
+        mensagem e a escrita (console e arquivos, com a rotação) é feita por uma
+        thread em segundo plano.
+    """
+    target = logging.getLogger(name)
+    handlers = list(target.handlers)
+    for handler in handlers:
+        target.removeHandler(handler)
+    queue_handler = QueueHandler(queue.SimpleQueue())
+    target.addHandler(queue_handler)
+    listen(queue_handler, handlers)
+    return queue_handler
+
+
+def listen(queue_handler: QueueHandler, handlers):
+    """ Inicia a thread que grava nos handlers as mensagens da fila.
+    """
+    listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+    # as mensagens ainda na fila são gravadas antes do fim do processo
+    atexit.register(listener.stop)
+    listeners[queue_handler] = listener
+
+
+def restart_listeners():
+    """ Recria as filas e as suas threads em um processo criado por fork (ex.:
+        workers do gunicorn com --preload): a thread do processo pai não existe no
+        filho, e as mensagens que estavam na fila são gravadas pelo pai.
+    """
+    for queue_handler, listener in list(listeners.items()):
+        queue_handler.queue = queue.SimpleQueue()
+        listen(queue_handler, listener.handlers)
+
+
+def configure_logging(config=Config):
+    """ Configura os logs do processo: console e arquivos em config.LOG_PATH (com
+        rotação), escritos em segundo plano (ver use_queue).
+
+    Chamado uma vez por create_app (ver app.py), e não na importação: importar os
+    módulos não cria diretórios nem arquivos.
+    """
+    if listeners:
+        return
+    os.makedirs(config.LOG_PATH, exist_ok=True)
+    dictConfig({
+        "version": 1,
+        "disable_existing_loggers": True,
+        "formatters": {
+            "default": {
+                "format": "[%(asctime)s] %(levelname)-4s %(funcName)s() L%(lineno)-4d %(message)s",
+            },
+            "detailed": {
+                "format": "[%(asctime)s] %(levelname)-4s %(funcName)s() L%(lineno)-4d %(message)s - call_trace=%(pathname)s L%(lineno)-4d",
+            },
+            "access": {
+                "()": AccessFormatter,
+            }
         },
-        "detailed": {
-            "format": "[%(asctime)s] %(levelname)-4s %(funcName)s() L%(lineno)-4d %(message)s - call_trace=%(pathname)s L%(lineno)-4d",
-        }
-    },
-    "handlers": {
-        "console": {
-            "class": "logging.StreamHandler",
-            "formatter": "default",
-            "stream": "ext://sys.stdout",
+        "handlers": {
+            "console": {
+                "class": "logging.StreamHandler",
+                "formatter": "default",
+                "stream": "ext://sys.stdout",
+            },
+            # "email": {
+            #     "class": "logging.handlers.SMTPHandler",
+            #     "formatter": "default",
+            #     "level": "ERROR",
+            #     "mailhost": ("smtp.example.com", 587),
+            #     "fromaddr": "devops@example.com",
+            #     "toaddrs": ["receiver@example.com", "receiver2@example.com"],
+            #     "subject": "Error Logs",
+            #     "credentials": ("username", "password"),
+            # },
+            "error_file": rotating_file(config, "gunicorn.error.log", "detailed"),
+            "detailed_file": rotating_file(config, "gunicorn.detailed.log", "detailed"),
+            "access_file": rotating_file(config, "access.log", "access"),
         },
-        # "email": {
-        #     "class": "logging.handlers.SMTPHandler",
-        #     "formatter": "default",
-        #     "level": "ERROR",
-        #     "mailhost": ("smtp.example.com", 587),
-        #     "fromaddr": "devops@example.com",
-        #     "toaddrs": ["receiver@example.com", "receiver2@example.com"],
-        #     "subject": "Error Logs",
-        #     "credentials": ("username", "password"),
-        # },
-        "error_file": {
-            "class": "logging.handlers.RotatingFileHandler",
-            "formatter": "detailed",
-            "filename": "log/gunicorn.error.log",
-            "maxBytes": 10000,
-            "backupCount": 10,
-            "delay": "True",
+        "loggers": {
+            "gunicorn.error": {
+                "handlers": ["console", "error_file"],  #, email],
+                "level": "INFO",
+                "propagate": False,
+            },
+            # log de acesso (GEOVISIO_ACCESS_LOG): apenas no seu arquivo
+            "access": {
+                "handlers": ["access_file"],
+                "level": "INFO",
+                "propagate": False,
+            },
+            # logger da api (ver abaixo): criado antes da configuração, seria desabilitado
+            "logger": {},
         },
-        "detailed_file": {
-            "class": "logging.handlers.RotatingFileHandler",
-            "formatter": "detailed",
-            "filename": "log/gunicorn.detailed.log",
-            "maxBytes": 10000,
-            "backupCount": 10,
-            "delay": "True",
+        "root": {
+            "handlers": ["console", "detailed_file"],
+            "level": config.LOG_LEVEL,
         }
-    },
-    "loggers": {
-        "gunicorn.error": {
-            "handlers": ["console", "error_file"],  #, email],
-            "level": "INFO",
-            "propagate": False,
-        }
-    },
-    "root": {
-        "handlers": ["console", "detailed_file"],
-        "level": "INFO",
-    }
-})
+    })
+
+    for name in (None, "gunicorn.error", "access"):
+        use_queue(name)
+    sample_filter.rate = config.LOG_DEBUG_SAMPLE_RATE
 
 
+# fila de cada logger -> thread que grava as suas mensagens
+listeners = {}
+os.register_at_fork(after_in_child=restart_listeners)
+
 logger = logging.getLogger(__name__)
+# mensagens de debug emitidas a cada requisição de leitura (listagens, tiles e
+# clusters): apenas uma amostra é registrada. As mensagens de logger (escritas,
+# escritor, manutenção) passam sempre.
+request_logger = logger.getChild("request")
+sample_filter = SampleFilter(Config.LOG_DEBUG_SAMPLE_RATE)
+request_logger.addFilter(sample_filter)
+
+access_logger = logging.getLogger("access")
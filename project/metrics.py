@@ -0,0 +1,368 @@
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from flask import g, request, has_request_context
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+import random
+import threading
+import time
+
+from logger import access_logger, logger
+
+
+# limites (em segundos) dos buckets do histograma de latência
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join('%s="%s"' % (name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+                     for name, value in zip(names, values))
+    return "{%s}" % pairs
+
+
+class Counter:
+    """ Contador monotônico, por combinação de rótulos.
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels=(), value: float = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + value
+
+    def samples(self):
+        with self.lock:
+            return [(self.name + format_labels(self.labels, labels), value)
+                    for labels, value in sorted(self.values.items())]
+
+
+class Gauge:
+    """ Valor instantâneo, lido da função read a cada exportação.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, read):
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def samples(self):
+        return [(self.name, self.read())]
+
+
+class Histogram:
+    """ Histograma cumulativo (no formato do Prometheus), por combinação de rótulos.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value: float):
+        with self.lock:
+            counts, total = self.values.get(labels, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self.values[labels] = (counts, total + value)
+
+    def samples(self):
+        result = []
+        with self.lock:
+            for labels, (counts, total) in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    result.append((self.name + "_bucket" +
+                                   format_labels(self.labels + ("le",), labels + (le,)), cumulative))
+                result.append((self.name + "_sum" + format_labels(self.labels, labels), total))
+                result.append((self.name + "_count" + format_labels(self.labels, labels), cumulative))
+        return result
+
+
+class Registry:
+    """ Conjunto das métricas do processo, exportadas no formato texto do Prometheus.
+    """
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append("# HELP %s %s" % (metric.name, metric.help))
+            lines.append("# TYPE %s %s" % (metric.name, metric.kind))
+            for name, value in metric.samples():
+                lines.append("%s %s" % (name, repr(float(value)) if isinstance(value, float) else value))
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+ROUTE_LABELS = ("route", "method")
+
+request_duration = registry.register(Histogram(
+    "geovisio_request_duration_seconds", "Latência das requisições.", ROUTE_LABELS))
+requests_total = registry.register(Counter(
+    "geovisio_requests_total", "Requisições respondidas.", ROUTE_LABELS + ("status",)))
+sql_statements = registry.register(Counter(
+    "geovisio_sql_statements_total", "Comandos SQL executados pelas requisições.", ROUTE_LABELS))
+sql_duration = registry.register(Counter(
+    "geovisio_sql_duration_seconds_total", "Tempo gasto em comandos SQL pelas requisições.", ROUTE_LABELS))
+serialize_duration = registry.register(Counter(
+    "geovisio_serialize_duration_seconds_total", "Tempo gasto na serialização JSON das respostas.",
+    ROUTE_LABELS))
+rows_hydrated = registry.register(Counter(
+    "geovisio_rows_hydrated_total", "Entidades do ORM carregadas da base pelas requisições.", ROUTE_LABELS))
+rows_returned = registry.register(Counter(
+    "geovisio_rows_returned_total", "Linhas retornadas pelas listagens e exportações (consultas Core).",
+    ROUTE_LABELS))
+response_bytes = registry.register(Counter(
+    "geovisio_response_bytes_total", "Bytes enviados no corpo das respostas.", ROUTE_LABELS))
+slow_requests = registry.register(Counter(
+    "geovisio_slow_requests_total", "Requisições acima do limite de lentidão.", ROUTE_LABELS))
+
+
+class RequestStats:
+    """ Estatísticas da requisição corrente (guardadas em flask.g).
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.serialize_time = 0.0
+        self.rows = 0
+        # linhas retornadas pela rota (páginas e lotes da exportação), ver record_rows
+        self.result_rows = 0
+        # comando SQL mais lento, para o plano de execução das requisições lentas
+        self.slowest = (0.0, None, None)
+
+
+# estatísticas nas quais são contabilizados os comandos SQL executados, na thread
+# corrente, fora do contexto de uma requisição (ver attributed_to)
+attribution = threading.local()
+
+
+def current_stats():
+    if has_request_context():
+        return g.get("request_stats")
+    return None
+
+
+def sql_stats():
+    """ Retorna as estatísticas nas quais os comandos SQL da thread corrente são
+        contabilizados: as da requisição corrente ou, fora dela, as de attributed_to.
+    """
+    stats = current_stats()
+    if stats is not None:
+        return (stats,)
+    return getattr(attribution, "stats", ())
+
+
+@contextmanager
+def attributed_to(stats):
+    """ Contabiliza os comandos SQL do bloco, executado fora do contexto da
+        requisição (ex.: pelo escritor, ver model/writer.py), nas estatísticas
+        informadas (None é ignorado).
+    """
+    previous = getattr(attribution, "stats", ())
+    attribution.stats = tuple(item for item in stats if item is not None)
+    try:
+        yield
+    finally:
+        attribution.stats = previous
+
+
+def record_rows(count: int):
+    """ Contabiliza linhas retornadas pela requisição corrente (para o log de acesso).
+    """
+    stats = current_stats()
+    if stats is not None:
+        stats.result_rows += count
+
+
+@contextmanager
+def timed_serialization():
+    """ Contabiliza o tempo do bloco como serialização da requisição corrente.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = current_stats()
+        if stats is not None:
+            stats.serialize_time += time.perf_counter() - started
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """ Serializador JSON do Flask que contabiliza o tempo de serialização
+        na requisição corrente.
+    """
+
+    def dumps(self, obj, **kwargs):
+        with timed_serialization():
+            return super().dumps(obj, **kwargs)
+
+
+class RequestInstrumentation:
+    """ Instrumenta as requisições: latência por rota, comandos SQL (quantidade e
+        tempo), entidades carregadas, bytes enviados e tempo de serialização.
+
+    Requisições acima de slow_request_ms são registradas no log (com amostragem
+    slow_sample_rate), junto ao plano de execução do comando SQL mais lento,
+    obtido em uma thread à parte, fora do tempo da requisição. Com server_timing,
+    a resposta traz o cabeçalho Server-Timing. Com access_log, cada requisição é
+    registrada no log de acesso (uma linha JSON, ver logger.py).
+
+    Os comandos SQL das operações enviadas ao escritor contam na requisição que
+    as enviou (ver attributed_to). Nas respostas transmitidas aos poucos (ex.:
+    /export, NDJSON), a latência, os comandos SQL e o log de acesso são
+    registrados ao fim do envio, já que o corpo ainda é gerado depois de
+    after_request; o Server-Timing dessas respostas cobre apenas o que foi feito
+    até o envio dos cabeçalhos.
+
+    As métricas são por processo: com vários workers, cada um expõe as suas.
+    """
+
+    def __init__(self, engine, mapped_classes, slow_request_ms: int,
+                 slow_sample_rate: float, server_timing: bool, access_log: bool = False):
+        self.engine = engine
+        self.mapped_classes = mapped_classes
+        self.slow_request = slow_request_ms / 1000
+        self.slow_sample_rate = slow_sample_rate
+        self.server_timing = server_timing
+        self.access_log = access_log
+        self.explain = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-request")
+
+    def init_app(self, app):
+        app.json = TimedJSONProvider(app)
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        event.listen(self.engine, "before_cursor_execute", self.before_cursor_execute)
+        event.listen(self.engine, "after_cursor_execute", self.after_cursor_execute)
+        for mapped_class in self.mapped_classes:
+            event.listen(mapped_class, "load", self.on_load)
+
+    def before_request(self):
+        g.request_stats = RequestStats()
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        for stats in sql_stats():
+            stats.sql_count += 1
+            stats.sql_time += elapsed
+            if elapsed > stats.slowest[0] and not executemany:
+                stats.slowest = (elapsed, statement, parameters)
+
+    def on_load(self, target, context):
+        stats = current_stats()
+        if stats is not None:
+            stats.rows += 1
+
+    def after_request(self, response):
+        stats = current_stats()
+        if stats is None:
+            return response
+        elapsed = time.perf_counter() - stats.started
+        labels = (request.url_rule.rule if request.url_rule else "<unmatched>", request.method)
+
+        requests_total.inc(labels + (response.status_code,))
+        if self.server_timing:
+            response.headers["Server-Timing"] = (
+                'sql;dur=%.2f;desc="%d statements", serialize;dur=%.2f, total;dur=%.2f' %
+                (stats.sql_time * 1000, stats.sql_count, stats.serialize_time * 1000, elapsed * 1000))
+
+        if response.is_streamed:
+            # corpo transmitido aos poucos: os bytes são contados à medida que são
+            # enviados e a requisição é contabilizada ao fim do envio
+            response.response = self.count_bytes(response.response, labels, response.status_code, stats)
+        else:
+            response_bytes.inc(labels, response.content_length or 0)
+            self.finish(labels, response.status_code, stats, response.content_length or 0)
+        return response
+
+    def count_bytes(self, chunks, labels, status, stats):
+        sent = 0
+        try:
+            for chunk in chunks:
+                response_bytes.inc(labels, len(chunk))
+                sent += len(chunk)
+                yield chunk
+        finally:
+            if hasattr(chunks, "close"):
+                chunks.close()
+            self.finish(labels, status, stats, sent)
+
+    def finish(self, labels, status, stats, sent: int):
+        """ Contabiliza a requisição respondida: latência, comandos SQL, serialização,
+            entidades e linhas retornadas, log de acesso e requisições lentas.
+        """
+        elapsed = time.perf_counter() - stats.started
+        request_duration.observe(labels, elapsed)
+        sql_statements.inc(labels, stats.sql_count)
+        sql_duration.inc(labels, stats.sql_time)
+        serialize_duration.inc(labels, stats.serialize_time)
+        rows_hydrated.inc(labels, stats.rows)
+        rows_returned.inc(labels, stats.result_rows)
+        if self.access_log:
+            self.log_access(labels, status, stats, sent)
+
+        if elapsed >= self.slow_request:
+            slow_requests.inc(labels)
+            if random.random() < self.slow_sample_rate:
+                self.explain.submit(self.log_slow_request, labels, elapsed, stats)
+
+    def log_access(self, labels, status, stats, sent: int):
+        """ Enfileira a linha do log de acesso; a formatação em JSON e a escrita
+            ficam com a thread do log.
+        """
+        access_logger.info("access", extra={"access": {
+            "method": labels[1],
+            "route": labels[0],
+            "status": status,
+            "latency_ms": round((time.perf_counter() - stats.started) * 1000, 2),
+            "sql": stats.sql_count,
+            "sql_ms": round(stats.sql_time * 1000, 2),
+            "rows": stats.result_rows,
+            "entities": stats.rows,
+            "bytes": sent,
+        }})
+
+    def log_slow_request(self, labels, elapsed, stats):
+        """ Registra no log uma requisição lenta, com o plano do comando SQL mais lento.
+        """
+        plan = ""
+        _, statement, parameters = stats.slowest
+        if statement and statement.lstrip().upper().startswith("SELECT"):
+            try:
+                with self.engine.connect() as connection:
+                    rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement,
+                                                      parameters or ()).fetchall()
+                plan = " | ".join(row[-1] for row in rows)
+            except Exception as e:
+                plan = "plano indisponível: %s" % e
+        logger.warning(f"Requisição lenta {labels[1]} {labels[0]}: {elapsed * 1000:.1f} ms, "
+                       f"{stats.sql_count} comandos SQL ({stats.sql_time * 1000:.1f} ms), "
+                       f"{stats.rows} entidades, serialização {stats.serialize_time * 1000:.1f} ms; "
+                       f"SQL mais lento ({stats.slowest[0] * 1000:.1f} ms): {statement}; plano: {plan}")
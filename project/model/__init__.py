@@ -1,6 +1,8 @@
 from sqlalchemy_utils import database_exists, create_database
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy import create_engine, event
+from functools import partial
+from typing import Optional
 import os
 
 # importando os elementos definidos no modelo
@@ -8,25 +10,155 @@ from model.base import Base
 
 from model.geo_catalog import GeoCatalog
 from model.coordinate import Coordinate
+from model.dictionary import Hashtag, Region, City, Country, register_term_events
+from model.spatial import create_spatial_index, register_functions
+from model.search import create_full_text_index
+from model.migrations import migrate, schema_version, set_schema_version, position_precision, SCHEMA_VERSION
+from model.connection import apply_pragmas, begin_transaction
+from model.writer import WriteCoordinator
+from model.generation import DataGeneration
+from model.locations import LocationChanges
+from model.changes import ChangeLog
+from model.stats import create_stats
+from model.maintenance import StorageMaintenance
+from model.blob_store import pending_deletes
+from config import Config
 
-db_path = "database/"
-# Verifica se o diretorio não existe
-if not os.path.exists(db_path):
-   # então cria o diretorio
-   os.makedirs(db_path)
+db_path = Config.DATABASE_PATH
 
 # url de acesso ao banco (essa é uma url de acesso ao sqlite local)
 db_url = 'sqlite:///%s/db.sqlite3' % db_path
 
-# cria a engine de conexão com o banco
-engine = create_engine(db_url, echo=False)
+# cria a engine de conexão com o banco, com o pool de conexões configurado
+engine = create_engine(db_url, echo=False,
+                       pool_size=Config.DB_POOL_SIZE,
+                       max_overflow=Config.DB_MAX_OVERFLOW,
+                       pool_timeout=Config.DB_POOL_TIMEOUT,
+                       # o driver também espera pelo lock (em segundos) antes de falhar
+                       connect_args={"timeout": Config.SQLITE_BUSY_TIMEOUT / 1000})
 
-# Instancia um criador de seção com o banco
-Session = sessionmaker(bind=engine)
+# um processo criado por fork (ex.: workers do gunicorn com --preload) não reutiliza
+# as conexões abertas pelo processo pai
+os.register_at_fork(after_in_child=partial(engine.dispose, close=False))
 
-# cria o banco se ele não existir 
-if not database_exists(engine.url):
-    create_database(engine.url) 
+# aplica os PRAGMAs (WAL, synchronous, mmap, cache, busy_timeout) em cada nova conexão
+event.listen(engine, "connect", apply_pragmas)
+# registra as funções geográficas (ex.: haversine) em cada nova conexão
+event.listen(engine, "connect", register_functions)
+# BEGIN explícito em cada transação, para que os SAVEPOINTs do escritor funcionem
+event.listen(engine, "begin", begin_transaction)
 
-# cria as tabelas do banco, caso não existam
-Base.metadata.create_all(engine)
+# Instancia um criador de seção com o banco. A sessão é única por thread (e,
+# portanto, por requisição) e é encerrada ao fim de cada requisição (ver app.py).
+Session = scoped_session(sessionmaker(bind=engine))
+
+# escritor único: todas as escritas das requisições passam por ele (ver model/writer.py)
+# (BEGIN IMMEDIATE: o lote obtém o lock de escrita antes da primeira leitura)
+writer = WriteCoordinator(sessionmaker(bind=engine.execution_options(begin_immediate=True),
+                                       expire_on_commit=False),
+                          max_batch=Config.WRITER_MAX_BATCH,
+                          max_delay=Config.WRITER_MAX_DELAY_MS / 1000)
+
+# geração dos dados, incrementada a cada transação do escritor (invalida os caches)
+data_generation = DataGeneration(engine, check_interval=Config.CACHE_CHECK_INTERVAL_MS / 1000)
+writer.before_commit_hooks.append(data_generation.bump)
+writer.after_commit_hooks.append(data_generation.commit)
+
+# posições alteradas, para a invalidação dos caches por tile (ex.: /clusters)
+location_changes = LocationChanges(engine, retention=Config.LOCATION_CHANGES_RETENTION)
+writer.before_commit_hooks.append(location_changes.prune)
+
+# imagens que deixaram de ser referenciadas, removidas do disco ao fim da transação
+# (o último hook antes do commit, ver PendingDeletes)
+writer.before_commit_hooks.append(pending_deletes.before_commit)
+
+# registro de alterações das entidades, para a sincronização incremental (GET /changes)
+change_log = ChangeLog(engine, retention=Config.CHANGES_RETENTION)
+writer.before_commit_hooks.append(change_log.prune)
+
+# manutenção da base em segundo plano: vacuum incremental, ANALYZE e checkpoints
+# (ver model/maintenance.py); a thread é iniciada na primeira requisição
+maintenance = StorageMaintenance(engine, interval=Config.MAINTENANCE_INTERVAL_S,
+                                 vacuum_bytes=Config.MAINTENANCE_VACUUM_BYTES,
+                                 step_pages=Config.MAINTENANCE_VACUUM_STEP_PAGES,
+                                 pause=Config.MAINTENANCE_VACUUM_PAUSE_MS / 1000,
+                                 analyze_interval=Config.MAINTENANCE_ANALYZE_INTERVAL_S,
+                                 analysis_limit=Config.MAINTENANCE_ANALYSIS_LIMIT)
+
+# mantém os ids dos dicionários de hashtags, regiões, cidades e países nas escritas do ORM
+register_term_events(Coordinate)
+register_term_events(GeoCatalog)
+
+def init_db(rekey: bool = False):
+    """ Cria a base, caso não exista, e atualiza o esquema em bases existentes
+        (tabelas, migrações, índices, triggers e estatísticas).
+
+    Executado uma única vez a cada implantação, pelo comando init-db (ver app.py),
+    e não na importação: os workers apenas verificam a versão do esquema.
+
+    Se a base foi criada com outra GEOVISIO_COORDINATE_PRECISION, as chaves de
+    posição só são recalculadas com rekey: com menos casas decimais, coordenadas
+    próximas passam a ser a mesma e são unidas (ver add_position_key). Sem rekey,
+    levanta ValueError sem alterar a base.
+    """
+    # cria o banco se ele não existir 
+    if not os.path.exists(db_path):
+        os.makedirs(db_path)
+    if not database_exists(engine.url):
+        create_database(engine.url)
+        # a base nova ainda está vazia: o VACUUM aplica o auto_vacuum configurado (ver
+        # model/connection.py), que não vale para o arquivo criado por create_database
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.exec_driver_sql("VACUUM")
+
+    precision = position_precision(engine)
+    if precision is not None and precision != Config.COORDINATE_PRECISION and not rekey:
+        raise ValueError("a base usa %d casas decimais na posição das coordenadas e "
+                         "GEOVISIO_COORDINATE_PRECISION é %d: recalcular as posições pode unir "
+                         "coordenadas (flask init-db --rekey)." % (precision, Config.COORDINATE_PRECISION))
+
+    # cria as tabelas do banco, caso não existam
+    Base.metadata.create_all(engine)
+
+    # atualiza o esquema de bases criadas por versões anteriores
+    migrate(engine)
+
+    # cria o índice espacial das coordenadas, caso não exista
+    create_spatial_index(engine)
+
+    # cria os índices de texto (FTS5) de catálogos e coordenadas, caso não existam
+    create_full_text_index(engine)
+
+    # cria o contador de gerações dos dados, caso não exista
+    data_generation.create()
+
+    # cria o registro de posições alteradas, caso não exista
+    location_changes.create()
+
+    # cria o registro de alterações, caso não exista
+    change_log.create()
+
+    # cria as estatísticas de hashtags e regiões, caso não existam
+    create_stats(engine)
+
+    # converte as bases criadas sem auto_vacuum incremental, se configurado
+    if Config.MAINTENANCE_FULL_VACUUM:
+        maintenance.convert()
+
+    # marca a base como inicializada (ver schema_error)
+    set_schema_version(engine)
+
+
+def schema_error() -> Optional[str]:
+    """ Retorna o motivo pelo qual a base não pode ser usada (não inicializada por
+        init_db com o esquema atual, ou com outra precisão das posições), ou None.
+    """
+    # sem conectar a uma base inexistente, o que criaria um arquivo vazio
+    if not database_exists(engine.url) or schema_version(engine) != SCHEMA_VERSION:
+        return "base de dados não inicializada com o esquema atual (flask init-db)."
+    # as chaves calculadas em Python (quantize) devem ser as das colunas geradas
+    precision = position_precision(engine)
+    if precision != Config.COORDINATE_PRECISION:
+        return ("a base usa %s casas decimais na posição das coordenadas e GEOVISIO_COORDINATE_PRECISION "
+                "é %d (flask init-db --rekey)." % (precision, Config.COORDINATE_PRECISION))
+    return None
@@ -0,0 +1,136 @@
+from hashlib import sha256
+from typing import Optional, Tuple
+import glob
+import os
+import tempfile
+
+from config import Config
+
+
+# assinaturas (magic bytes) dos formatos de imagem mais comuns
+IMAGE_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+]
+
+
+class BlobStore:
+    """ Armazena conteúdos binários em disco, endereçados pelo SHA-256.
+
+    Cada conteúdo é gravado uma única vez em <root>/<2 primeiros dígitos>/<hash>,
+    de forma que envios idênticos compartilham o mesmo arquivo. As imagens
+    derivadas (ver model/thumbnails.py) ficam ao lado, em <hash>.<tamanho>.
+    """
+
+    def __init__(self, root: str):
+        # caminho absoluto: relativo ao diretório de execução, como a base sqlite
+        self.root = os.path.abspath(root)
+
+    def path(self, digest: str) -> str:
+        """ Retorna o caminho do arquivo que guarda o conteúdo com o hash informado.
+        """
+        return os.path.join(self.root, digest[:2], digest)
+
+    def derivative_path(self, digest: str, size: str) -> str:
+        """ Retorna o caminho da imagem derivada (ex.: size="thumb") do conteúdo.
+        """
+        return self.path(digest) + "." + size
+
+    def exists(self, digest: str, size: Optional[str] = None) -> bool:
+        return os.path.exists(self.derivative_path(digest, size) if size else self.path(digest))
+
+    def put(self, data: bytes) -> Tuple[str, int]:
+        """ Grava o conteúdo (caso ainda não exista) e retorna seu hash e tamanho.
+        """
+        digest = sha256(data).hexdigest()
+        path = self.path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # grava em um arquivo temporário e renomeia, para que um leitor
+            # concorrente nunca veja um arquivo incompleto
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as tmp_file:
+                    tmp_file.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        return digest, len(data)
+
+    def get(self, digest: str) -> bytes:
+        with open(self.path(digest), "rb") as blob_file:
+            return blob_file.read()
+
+    def delete(self, digest: str) -> int:
+        """ Remove o conteúdo do disco, e as suas imagens derivadas, caso existam.
+            Retorna os bytes removidos.
+        """
+        removed = 0
+        for path in [self.path(digest)] + glob.glob(glob.escape(self.path(digest)) + ".*"):
+            try:
+                size = os.path.getsize(path)
+                os.unlink(path)
+                removed += size
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def size(self, digest: str) -> int:
+        """ Retorna os bytes do conteúdo e das suas imagens derivadas no disco.
+        """
+        size = 0
+        for path in [self.path(digest)] + glob.glob(glob.escape(self.path(digest)) + ".*"):
+            try:
+                size += os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+        return size
+
+    def mimetype(self, digest: str, size: Optional[str] = None) -> str:
+        """ Identifica o tipo da imagem (ou da derivada) pelos primeiros bytes do arquivo.
+        """
+        with open(self.derivative_path(digest, size) if size else self.path(digest), "rb") as blob_file:
+            head = blob_file.read(16)
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            return "image/webp"
+        for signature, mimetype in IMAGE_SIGNATURES:
+            if head.startswith(signature):
+                return mimetype
+        return "application/octet-stream"
+
+
+class PendingDeletes:
+    """ Conteúdos a remover do blob store ao fim da transação do escritor.
+
+    As operações do escritor marcam, na sua sessão, os conteúdos que deixaram de
+    ser referenciados (add); uma operação seguinte da mesma transação que volte a
+    referenciar o conteúdo desfaz a marcação (cancel). Os arquivos são removidos
+    pelo último hook antes do commit, com o lock de escrita da base ainda retido:
+    uma inserção de outro processo só verifica o arquivo depois de obter o lock,
+    quando a remoção já terminou (ver model/bulk.py, retain_images). Uma operação
+    que falha é desfeita junto com as suas marcações.
+    """
+
+    def __init__(self, store: BlobStore):
+        self.store = store
+
+    def add(self, session, digests):
+        session.info.setdefault("blob_deletes", set()).update(digests)
+
+    def cancel(self, session, digest: str):
+        session.info.get("blob_deletes", set()).discard(digest)
+
+    def before_commit(self, session):
+        for digest in session.info.pop("blob_deletes", set()):
+            self.store.delete(digest)
+
+
+# diretório das imagens dos catálogos
+blob_path = Config.BLOB_PATH
+
+blob_store = BlobStore(blob_path)
+pending_deletes = PendingDeletes(blob_store)
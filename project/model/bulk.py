@@ -0,0 +1,285 @@
+from itertools import islice
+from typing import Callable, Iterable, Tuple, Union
+from sqlalchemy import delete, insert, select, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from model.coordinate import Coordinate, quantize
+from model.geo_catalog import GeoCatalog
+from model.blob_store import blob_store, pending_deletes
+from model.thumbnails import thumbnails
+from model import writer
+from model.dictionary import Hashtag, assign_term_ids, normalize_key
+
+
+class BulkReport:
+    """ Acumula o resultado de uma carga em lote.
+    """
+
+    def __init__(self):
+        self.accepted = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.rows = []
+
+    def duplicate(self, number: int, error: str):
+        self.duplicates += 1
+        self.rows.append({"row": number, "status": "duplicate", "error": error})
+
+    def reject(self, number: int, error):
+        self.invalid += 1
+        self.rows.append({"row": number, "status": "invalid", "error": str(error)})
+
+    def as_dict(self):
+        self.rows.sort(key=lambda row: row["row"])
+        return {"accepted": self.accepted, "duplicates": self.duplicates,
+                "invalid": self.invalid, "rows": self.rows}
+
+
+# colunas atualizadas quando uma coordenada é enviada na posição de outra já cadastrada
+UPSERT_COLUMNS = ("name", "contact", "city", "region", "country", "city_id", "region_id", "country_id")
+
+
+def position(row) -> Tuple[int, int]:
+    """ Chave da posição da linha, a mesma do índice único das coordenadas.
+    """
+    return quantize(row.latitude), quantize(row.longitude)
+
+
+def coordinate_ids_at(session, positions) -> dict:
+    """ Retorna o id das coordenadas cadastradas em cada posição (lat_key, lon_key),
+        lidas pelo índice único da posição.
+    """
+    if not positions:
+        return {}
+    # o IN de pares não usa o índice: o IN da latitude o usa, e o de pares filtra
+    return {(lat_key, lon_key): id_ for id_, lat_key, lon_key in session.execute(
+        select(Coordinate.id, Coordinate.lat_key, Coordinate.lon_key).where(
+            Coordinate.lat_key.in_({lat_key for lat_key, _ in positions}),
+            tuple_(Coordinate.lat_key, Coordinate.lon_key).in_(positions)))}
+
+
+def coordinate_upsert():
+    """ Insert de coordenadas que, na posição de uma coordenada já cadastrada,
+        atualiza os dados dela (INSERT ... ON CONFLICT pelo índice único da posição).
+    """
+    statement = sqlite_insert(Coordinate.__table__)
+    return statement.on_conflict_do_update(
+        index_elements=[Coordinate.lat_key, Coordinate.lon_key],
+        set_={column: statement.excluded[column] for column in UPSERT_COLUMNS})
+
+
+def chunks(iterable: Iterable, size: int):
+    """ Percorre o iterável em listas de até size itens.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def validate(chunk, schema, report: BulkReport):
+    """ Valida as linhas do bloco com o schema, relatando as inválidas.
+    """
+    valid = []
+    for number, data in chunk:
+        if isinstance(data, Exception):
+            report.reject(number, data)
+            continue
+        try:
+            valid.append((number, schema.model_validate(data)))
+        except ValueError as e:
+            report.reject(number, "; ".join(error["msg"] for error in e.errors())
+                          if hasattr(e, "errors") else e)
+    return valid
+
+
+def ingest_coordinates(session, rows: Iterable[Tuple[int, Union[dict, Exception]]],
+                       schema, chunk_size: int, upsert: bool = False) -> BulkReport:
+    """ Grava coordenadas em lote, uma transação a cada chunk_size linhas.
+
+    Uma coordenada é duplicada se a sua posição (latitude, longitude, com
+    GEOVISIO_COORDINATE_PRECISION casas) já está na base ou apareceu antes na
+    mesma carga. Com upsert, as duplicadas atualizam a coordenada cadastrada.
+    """
+    report = BulkReport()
+    seen = set()
+    for chunk in chunks(rows, chunk_size):
+        valid = validate(chunk, schema, report)
+        if upsert:
+            write_chunk(session, Coordinate, [(number, row.model_dump()) for number, row in valid],
+                        report, coordinate_upsert())
+            continue
+        existing = coordinate_ids_at(session, {position(row) for _, row in valid})
+
+        values = []
+        for number, row in valid:
+            key = position(row)
+            if key in existing or key in seen:
+                report.duplicate(number, "coordenada já cadastrada")
+                continue
+            seen.add(key)
+            values.append((number, row.model_dump()))
+        # uma coordenada gravada por outra requisição após a verificação é ignorada
+        write_chunk(session, Coordinate, values, report,
+                    sqlite_insert(Coordinate.__table__).on_conflict_do_nothing())
+    return report
+
+
+def ingest_geo_catalogs(session, rows: Iterable[Tuple[int, Union[dict, Exception]]],
+                        schema, chunk_size: int, upsert: bool = False) -> BulkReport:
+    """ Grava catálogos geográficos em lote, uma transação a cada chunk_size linhas.
+
+    A coordenada de cada catálogo deve estar cadastrada; com upsert, as que não
+    estão são criadas (apenas com a posição). Um catálogo é duplicado se já há,
+    na mesma coordenada, um catálogo com o mesmo título e hashtag (comparada pela
+    chave do dicionário: "#Safra" e "#safra" são a mesma hashtag).
+    """
+    report = BulkReport()
+    seen = set()
+    for chunk in chunks(rows, chunk_size):
+        valid = validate(chunk, schema, report)
+        positions = {position(row): row for _, row in valid}
+        coordinate_ids = coordinate_ids_at(session, set(positions))
+        missing = [{"latitude": row.latitude, "longitude": row.longitude}
+                   for key, row in positions.items() if key not in coordinate_ids]
+        missing_error = "coordenada não cadastrada"
+        if upsert and missing:
+            try:
+                writer.submit(lambda writer_session: writer_session.execute(
+                    sqlite_insert(Coordinate.__table__).on_conflict_do_nothing(), missing))
+            except Exception as e:
+                # as linhas das coordenadas que não foram criadas são relatadas como inválidas
+                missing_error = "erro ao criar a coordenada: %s" % e
+            else:
+                session.commit()
+                coordinate_ids = coordinate_ids_at(session, set(positions))
+
+        candidates = []
+        for number, row in valid:
+            coordinate_id = coordinate_ids.get(position(row))
+            if coordinate_id is None:
+                report.reject(number, missing_error)
+                continue
+            candidates.append((number, row, (coordinate_id, row.title, normalize_key(row.hashtag) or None)))
+        pairs = {(coordinate_id, title) for _, _, (coordinate_id, title, _) in candidates}
+        existing = set(session.execute(
+            select(GeoCatalog.coordinate_id, GeoCatalog.title, Hashtag.key).select_from(GeoCatalog).outerjoin(
+                Hashtag, GeoCatalog.hashtag_id == Hashtag.id).where(
+                tuple_(GeoCatalog.coordinate_id, GeoCatalog.title).in_(pairs)))) \
+            if pairs else set()
+
+        values, images = [], {}
+        for number, row, key in candidates:
+            if key in existing or key in seen:
+                report.duplicate(number, "catálogo já cadastrado nesta coordenada")
+                continue
+            seen.add(key)
+            img_hash, img_size = blob_store.put(row.img_source) if row.img_source else (None, None)
+            if img_hash is not None:
+                images[img_hash] = row.img_source
+            values.append((number, {"coordinate_id": key[0], "title": row.title,
+                                    "description": row.description, "hashtag": row.hashtag,
+                                    "img_hash": img_hash, "img_size": img_size}))
+        write_chunk(session, GeoCatalog, values, report, images=images)
+        # as miniaturas são geradas em segundo plano (ver model/thumbnails.py)
+        for _, row in values:
+            thumbnails.submit(row["img_hash"])
+    return report
+
+
+def write_chunk(session, model, values: list, report: BulkReport, statement=None, images=None):
+    """ Insere as linhas (número, valores) do bloco com um único executemany, em
+        uma transação (com statement, ex.: um upsert, no lugar do insert simples).
+        Se a gravação falhar, as linhas do bloco são relatadas como inválidas.
+        images (hash -> conteúdo) são as imagens referenciadas pelas linhas (ver retain_images).
+    """
+    # encerra a transação de leitura do bloco, para não reter o snapshot do WAL
+    session.commit()
+    if not values:
+        return
+    rows = [row for _, row in values]
+    try:
+        # insert do Core (sem hidratar entidades do ORM): um único executemany,
+        # executado pelo escritor único para não disputar o lock com outras escritas
+        def write(writer_session):
+            # ids dos dicionários (hashtags, regiões...) na mesma transação
+            assign_term_ids(writer_session, model.__tablename__, rows)
+            writer_session.execute(insert(model.__table__) if statement is None else statement, rows)
+            retain_images(writer_session, images or {})
+
+        writer.submit(write)
+        report.accepted += len(values)
+    except Exception as e:
+        for number, _ in values:
+            report.reject(number, "erro ao gravar o bloco: %s" % e)
+
+
+def delete_geo_catalogs(candidates, batch_size: int) -> dict:
+    """ Remove os catálogos selecionados por candidates (consulta de GeoCatalog.id e
+        GeoCatalog.img_hash), em transações de batch_size linhas, e as imagens que
+        deixaram de ser referenciadas. Retorna as quantidades removidas.
+
+    Cada lote é lido e removido pelo escritor único, na mesma operação (com a
+    verificação das imagens liberadas, ver release_images): uma escrita concorrente
+    nunca espera mais que um lote, e o que já foi removido permanece removido se um
+    lote falhar.
+    """
+    candidates = candidates.order_by(GeoCatalog.id).limit(batch_size)
+    report = {"deleted": 0, "batches": 0, "images_removed": 0, "image_bytes": 0}
+
+    def delete_batch(writer_session):
+        rows = writer_session.execute(candidates).all()
+        if not rows:
+            return 0, 0, 0
+        # delete do Core: os triggers mantêm estatísticas, índices de texto e registro de alterações
+        writer_session.execute(delete(GeoCatalog.__table__).where(
+            GeoCatalog.id.in_([id_ for id_, _ in rows])))
+        return (len(rows),) + release_images(writer_session, {img_hash for _, img_hash in rows})
+
+    while True:
+        deleted, images, size = writer.submit(delete_batch)
+        if not deleted:
+            break
+        report["deleted"] += deleted
+        report["batches"] += 1
+        report["images_removed"] += images
+        report["image_bytes"] += size
+        if deleted < batch_size:
+            break
+    return report
+
+
+def release_images(session, hashes) -> Tuple[int, int]:
+    """ Remove do blob store as imagens que nenhum catálogo referencia mais.
+        Retorna a quantidade de imagens e os bytes a remover.
+
+    Executado pelo escritor, na operação que remove os catálogos: a verificação é
+    serializada com as inserções, e os arquivos são removidos ao fim da transação
+    (ver PendingDeletes), a não ser que um catálogo gravado na mesma transação
+    volte a referenciar a imagem (ver retain_images).
+    """
+    hashes = {img_hash for img_hash in hashes if img_hash is not None}
+    if not hashes:
+        return 0, 0
+    referenced = set(session.scalars(select(GeoCatalog.img_hash).where(
+        GeoCatalog.img_hash.in_(hashes)).distinct()))
+    released = hashes - referenced
+    pending_deletes.add(session, released)
+    return len(released), sum(blob_store.size(img_hash) for img_hash in released)
+
+
+def retain_images(session, images: dict):
+    """ Mantém no blob store as imagens (hash -> conteúdo) dos catálogos gravados
+        pela operação do escritor.
+
+    A imagem é gravada por blob_store.put antes da operação, fora do escritor: se
+    uma remoção concorrente a liberou nesse intervalo, a remoção ainda pendente é
+    desfeita, ou o arquivo, já removido, é gravado de novo. Chamado após o insert
+    dos catálogos, com o lock de escrita da base retido.
+    """
+    for img_hash, data in images.items():
+        pending_deletes.cancel(session, img_hash)
+        if not blob_store.exists(img_hash):
+            blob_store.put(data)
@@ -0,0 +1,111 @@
+from typing import List, Tuple
+from sqlalchemy import text
+
+
+# Registro de alterações das entidades, para a sincronização incremental dos
+# clientes (GET /changes). Cada inserção, alteração ou remoção de uma coordenada ou
+# de um catálogo grava um evento, na mesma transação, com id crescente (AUTOINCREMENT:
+# ids nunca são reaproveitados). Remoções ficam registradas como 'delete' (tombstones).
+# Apenas alterações das colunas retornadas aos clientes geram eventos: contadores
+# mantidos pela própria base (ex.: coordinates.catalog_count) não entram no registro.
+CHANGES_DDL = [
+    """CREATE TABLE IF NOT EXISTS changes (
+           id INTEGER PRIMARY KEY AUTOINCREMENT,
+           entity TEXT NOT NULL,
+           entity_id INTEGER NOT NULL,
+           op TEXT NOT NULL
+       )""",
+    # última alteração de cada entidade (ver since)
+    """CREATE INDEX IF NOT EXISTS ix_changes_entity ON changes (entity, entity_id, id)""",
+    # bases já existentes: as entidades cadastradas entram no registro como 'upsert'
+    """INSERT INTO changes (entity, entity_id, op)
+       SELECT 'coordinate', id_coordinate, 'upsert' FROM coordinates
+       WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'changes')
+       UNION ALL
+       SELECT 'geo_catalog', id_geo_catalog, 'upsert' FROM geo_catalogs
+       WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'changes')""",
+]
+
+# colunas de cada tabela cuja alteração gera um evento
+CHANGES_COLUMNS = {
+    "coordinates": "id_coordinate, latitude, longitude, name, contact, city, region, country",
+    "geo_catalogs": "id_geo_catalog, title, description, hashtag, img_hash, img_size, coordinate_id",
+}
+
+for table, entity, key in (("coordinates", "coordinate", "id_coordinate"), ("geo_catalogs", "geo_catalog", "id_geo_catalog")):
+    CHANGES_DDL += [
+        f"""CREATE TRIGGER IF NOT EXISTS changes_{entity}_insert AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO changes (entity, entity_id, op) VALUES ('{entity}', new.{key}, 'upsert');
+            END""",
+        f"""CREATE TRIGGER IF NOT EXISTS changes_{entity}_update AFTER UPDATE OF {CHANGES_COLUMNS[table]} ON {table}
+            BEGIN
+                INSERT INTO changes (entity, entity_id, op)
+                SELECT '{entity}', old.{key}, 'delete' WHERE old.{key} IS NOT new.{key}
+                UNION ALL
+                SELECT '{entity}', new.{key}, 'upsert';
+            END""",
+        f"""CREATE TRIGGER IF NOT EXISTS changes_{entity}_delete AFTER DELETE ON {table}
+            BEGIN
+                INSERT INTO changes (entity, entity_id, op) VALUES ('{entity}', old.{key}, 'delete');
+            END""",
+    ]
+
+
+class ChangeLog:
+    """ Leitura do registro de alterações (tabela changes).
+
+    Apenas as últimas retention alterações são mantidas (ver prune): um cliente
+    cujo cursor é anterior às alterações mantidas precisa refazer a sincronização
+    completa (ver expired).
+    """
+
+    def __init__(self, engine, retention: int):
+        self.engine = engine
+        self.retention = retention
+
+    def create(self):
+        """ Cria (caso não existam) a tabela e os triggers do registro.
+        """
+        with self.engine.begin() as connection:
+            for statement in CHANGES_DDL:
+                connection.execute(text(statement))
+
+    def prune(self, session):
+        """ Descarta as alterações mais antigas (chamado antes do commit do escritor).
+        """
+        session.execute(text(
+            "DELETE FROM changes WHERE id <= (SELECT max(id) FROM changes) - :retention"),
+            {"retention": self.retention})
+
+    def expired(self, session, after_id: int) -> bool:
+        """ Indica se alterações posteriores a after_id já foram descartadas. Como os
+            ids são consecutivos e prune descarta sempre os mais antigos, basta
+            comparar com o menor id mantido.
+        """
+        oldest = session.execute(text("SELECT min(id) FROM changes")).scalar()
+        return oldest is not None and oldest > after_id + 1
+
+    def last_id(self, session) -> int:
+        """ Retorna o id da alteração mais recente (0 com o registro vazio).
+        """
+        return session.execute(text("SELECT coalesce(max(id), 0) FROM changes")).scalar()
+
+    def since(self, session, after_id: int, limit: int) -> List[Tuple[int, str, int, str]]:
+        """ Retorna (id, entidade, id da entidade, operação) da última alteração de
+            cada entidade alterada após after_id, em ordem de id, até limit entidades.
+
+        Como só a última alteração de cada entidade é retornada, uma entidade que
+        aparece em uma página não volta a aparecer nas seguintes, a não ser que
+        seja alterada de novo. A página percorre a chave primária a partir de
+        after_id e descarta as alterações substituídas por outras mais novas da
+        mesma entidade (verificadas no índice ix_changes_entity), sem agrupar
+        todo o restante do registro a cada página.
+        """
+        rows = session.execute(text(
+            "SELECT id, entity, entity_id, op FROM changes WHERE id > :after AND NOT EXISTS ("
+            "  SELECT 1 FROM changes AS newer WHERE newer.entity = changes.entity"
+            "  AND newer.entity_id = changes.entity_id AND newer.id > changes.id"
+            ") ORDER BY id LIMIT :limit"),
+            {"after": after_id, "limit": limit})
+        return [tuple(row) for row in rows]
@@ -0,0 +1,60 @@
+from collections import Counter
+from typing import List
+from sqlalchemy import Float, func, select, type_coerce
+
+from model.coordinate import Coordinate
+from model.dictionary import Hashtag
+from model.geo_catalog import GeoCatalog
+from model.tiles import tile_extent, tile_columns, in_tile
+
+
+# cada tile é dividido em 8 x 8 células (2 ** CELL_ZOOM_OFFSET): a célula é o
+# tile de zoom + CELL_ZOOM_OFFSET que contém a coordenada
+CELL_ZOOM_OFFSET = 3
+# hashtags mais frequentes retornadas por célula
+TOP_HASHTAGS = 3
+
+
+def cluster_tile(session, zoom: int, x: int, y: int) -> List[dict]:
+    """ Agrega as coordenadas do tile por célula: quantidade de coordenadas,
+        centróide, quantidade de catálogos e hashtags mais frequentes. As hashtags
+        são agrupadas pelo dicionário ("#Safra" e "#safra" contam juntas) e
+        retornadas com o texto cadastrado no dicionário.
+    """
+    cell_zoom = zoom + CELL_ZOOM_OFFSET
+    cell_x, cell_y = (column.label(name) for column, name in zip(tile_columns(cell_zoom), ("x", "y")))
+
+    coordinates = in_tile(select(
+        cell_x, cell_y, func.count(),
+        func.avg(type_coerce(Coordinate.latitude, Float())),
+        func.avg(type_coerce(Coordinate.longitude, Float()))).select_from(Coordinate), zoom, x, y)
+    coordinates = coordinates.group_by(cell_x, cell_y)
+
+    catalogs = in_tile(select(
+        cell_x, cell_y, Hashtag.name, func.count()).select_from(GeoCatalog).join(
+        Coordinate, GeoCatalog.coordinate_id == Coordinate.id).outerjoin(
+        Hashtag, GeoCatalog.hashtag_id == Hashtag.id), zoom, x, y)
+    catalogs = catalogs.group_by(cell_x, cell_y, GeoCatalog.hashtag_id, Hashtag.name)
+
+    cells = {}
+    for cx, cy, count, latitude, longitude in session.execute(coordinates):
+        cells[cx, cy] = {
+            "cell": "%d/%d/%d" % (cell_zoom, cx, cy),
+            "bbox": list(tile_extent(cell_zoom, cx, cy)),
+            "count": count,
+            "latitude": latitude,
+            "longitude": longitude,
+            "catalogs": 0,
+            "hashtags": Counter(),
+        }
+    if not cells:
+        return []
+    for cx, cy, hashtag, count in session.execute(catalogs):
+        cell = cells[cx, cy]
+        cell["catalogs"] += count
+        if hashtag is not None:
+            cell["hashtags"][hashtag] = count
+
+    for cell in cells.values():
+        cell["hashtags"] = [hashtag for hashtag, _ in cell["hashtags"].most_common(TOP_HASHTAGS)]
+    return list(cells.values())
@@ -0,0 +1,61 @@
+from config import Config
+
+# valores aceitos em cada PRAGMA configurável (são interpolados no SQL)
+JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"}
+SYNCHRONOUS_MODES = {"OFF", "NORMAL", "FULL", "EXTRA"}
+AUTO_VACUUM_MODES = {"NONE", "FULL", "INCREMENTAL"}
+
+
+def sqlite_pragmas(config=Config):
+    """ Retorna os PRAGMAs aplicados a cada nova conexão, conforme a configuração.
+    """
+    journal_mode = config.SQLITE_JOURNAL_MODE.upper()
+    synchronous = config.SQLITE_SYNCHRONOUS.upper()
+    auto_vacuum = config.SQLITE_AUTO_VACUUM.upper()
+    if journal_mode not in JOURNAL_MODES:
+        raise ValueError("journal_mode inválido: %s" % config.SQLITE_JOURNAL_MODE)
+    if synchronous not in SYNCHRONOUS_MODES:
+        raise ValueError("synchronous inválido: %s" % config.SQLITE_SYNCHRONOUS)
+    if auto_vacuum not in AUTO_VACUUM_MODES:
+        raise ValueError("auto_vacuum inválido: %s" % config.SQLITE_AUTO_VACUUM)
+    return [
+        # busy_timeout primeiro: a troca do journal_mode também pode esperar por lock
+        "PRAGMA busy_timeout = %d" % config.SQLITE_BUSY_TIMEOUT,
+        # antes do journal_mode: numa base nova, precisa vir antes da criação do arquivo
+        # (numa base existente, só muda com um VACUUM; ver model/maintenance.py)
+        "PRAGMA auto_vacuum = %s" % auto_vacuum,
+        "PRAGMA journal_mode = %s" % journal_mode,
+        "PRAGMA synchronous = %s" % synchronous,
+        "PRAGMA mmap_size = %d" % config.SQLITE_MMAP_SIZE,
+        "PRAGMA cache_size = %d" % config.SQLITE_CACHE_SIZE,
+    ]
+
+
+def apply_pragmas(dbapi_connection, connection_record):
+    """ Aplica os PRAGMAs configurados em uma nova conexão sqlite.
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in sqlite_pragmas():
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+def begin_transaction(connection):
+    """ Inicia explicitamente cada transação do SQLAlchemy (evento begin).
+
+    O driver sqlite3 só inicia uma transação antes de INSERT, UPDATE ou DELETE,
+    e não antes de um SAVEPOINT: o SAVEPOINT de uma operação do escritor abriria
+    a transação e o seu RELEASE a confirmaria, fora do commit em grupo (ver
+    model/writer.py). Com a opção de execução begin_immediate (usada pelo
+    escritor), o lock de escrita é obtido já no início; com AUTOCOMMIT, nenhuma
+    transação é iniciada.
+    """
+    # o driver não inicia mais transações por conta própria (nem depois de o
+    # pool restaurar o isolation_level de uma conexão usada em AUTOCOMMIT)
+    connection.connection.driver_connection.isolation_level = None
+    options = connection.get_execution_options()
+    if options.get("isolation_level") == "AUTOCOMMIT":
+        return
+    connection.exec_driver_sql("BEGIN IMMEDIATE" if options.get("begin_immediate") else "BEGIN")
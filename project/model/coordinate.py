@@ -1,9 +1,28 @@
-from sqlalchemy import Column, Integer, DateTime, Float, String
+from sqlalchemy import Column, Computed, Index, Integer, DateTime, Float, String, ForeignKey
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from typing import Union
 
 from  model import Base, GeoCatalog
+from config import Config
+
+
+# posições iguais até COORDINATE_PRECISION casas decimais são a mesma coordenada
+POSITION_SCALE = 10 ** Config.COORDINATE_PRECISION
+
+
+def position_key_sql(column: str) -> str:
+    """ Expressão da chave quantizada (inteiro) de latitude ou longitude.
+    """
+    return "CAST(round(%s * %d) AS INTEGER)" % (column, POSITION_SCALE)
+
+
+def quantize(value: float) -> int:
+    """ Calcula em Python a mesma chave de position_key_sql: o round do sqlite
+        arredonda as metades para longe do zero (o de Python, para o par).
+    """
+    scaled = value * POSITION_SCALE
+    return int(scaled - 0.5) if scaled < 0 else int(scaled + 0.5)
 
 
 class Coordinate(Base):
@@ -17,10 +36,24 @@ class Coordinate(Base):
     country = Column(String(144))
     name = Column(String(144))
     contact = Column(String(144))
-    created_at = Column(DateTime, default=datetime.now())
+    # data da inserção (a função é chamada a cada linha), indexada para as buscas por intervalo
+    created_at = Column(DateTime, default=datetime.now, index=True)
+    # quantidade de catálogos, mantida pelos triggers de model/stats.py
+    catalog_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # ids de região, cidade e país nos dicionários (ver model/dictionary.py)
+    region_id = Column(Integer, ForeignKey("regions.id"), index=True)
+    city_id = Column(Integer, ForeignKey("cities.id"), index=True)
+    country_id = Column(Integer, ForeignKey("countries.id"), index=True)
+    # posição quantizada (colunas geradas), chave única das coordenadas
+    lat_key = Column(Integer, Computed(position_key_sql("latitude")))
+    lon_key = Column(Integer, Computed(position_key_sql("longitude")))
+
+    __table_args__ = (Index("ux_coordinates_position", "lat_key", "lon_key", unique=True),)
 
     # Definindo relacionamento com os catálogos geográficos. Uma coordenada pode ter N catálogos.
-    geo_catalogs = relationship("GeoCatalog")
+    # A coleção nunca é carregada (write_only): uma coordenada pode ter milhares de
+    # catálogos, que são lidos pelas consultas das listagens.
+    geo_catalogs = relationship("GeoCatalog", lazy="write_only")
 
     def __init__(self, longitude:float, latitude:float, name:str,
                  contact:str, city:str, region: str, country:str,
@@ -45,7 +78,14 @@ class Coordinate(Base):
         if created_at:
             self.created_at = created_at
 
+    @classmethod
+    def at(cls, latitude: float, longitude: float) -> tuple:
+        """ Retorna o filtro (pelo índice único da posição) da coordenada na posição.
+        """
+        return cls.lat_key == quantize(latitude), cls.lon_key == quantize(longitude)
+
     def add_geo_catalog(self, geo_catalog: GeoCatalog):
-        """ Adiciona um novo catálogo a coordenada.
+        """ Adiciona um novo catálogo a coordenada (já gravada na base), sem ler
+            os catálogos que ela já tem.
         """
-        self.geo_catalogs.append(geo_catalog)
+        geo_catalog.coordinate_id = self.id
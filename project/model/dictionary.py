@@ -0,0 +1,110 @@
+import unicodedata
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import Column, Integer, String, event, insert, inspect, select
+
+from model.base import Base
+
+
+def normalize_key(value: Optional[str]) -> Optional[str]:
+    """ Retorna a chave de dicionário de um texto: sem acentos, em minúsculas
+        (casefold) e sem espaços nas pontas. "#Safra" e "#safra " têm a mesma chave.
+    """
+    if value is None:
+        return None
+    decomposed = unicodedata.normalize("NFKD", value.strip())
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+class Term:
+    """ Colunas comuns dos dicionários: a chave normalizada (única) e o texto
+        como foi cadastrado pela primeira vez.
+    """
+    id = Column(Integer, primary_key=True)
+    key = Column(String(144), nullable=False, unique=True)
+    name = Column(String(144), nullable=False)
+
+
+class Hashtag(Term, Base):
+    __tablename__ = "hashtags"
+
+
+class Region(Term, Base):
+    __tablename__ = "regions"
+
+
+class City(Term, Base):
+    __tablename__ = "cities"
+
+
+class Country(Term, Base):
+    __tablename__ = "countries"
+
+
+# colunas de texto de cada tabela com a chave estrangeira para o seu dicionário:
+# tabela -> [(coluna de texto, coluna do id, dicionário)]
+TERM_COLUMNS = {
+    "coordinates": [("region", "region_id", Region), ("city", "city_id", City),
+                    ("country", "country_id", Country)],
+    "geo_catalogs": [("hashtag", "hashtag_id", Hashtag)],
+}
+
+
+def term_ids(connection, model, values: Iterable[Optional[str]]) -> Dict[str, int]:
+    """ Retorna o id no dicionário de cada texto (por chave), cadastrando as chaves
+        novas. Deve ser chamada na transação que grava as linhas que usam os ids.
+    """
+    names = {}
+    for value in values:
+        key = normalize_key(value)
+        if key:
+            names.setdefault(key, value.strip())
+    if not names:
+        return {}
+    table = model.__table__
+    connection.execute(insert(table).prefix_with("OR IGNORE"),
+                       [{"key": key, "name": name} for key, name in names.items()])
+    ids = {}
+    keys = list(names)
+    for start in range(0, len(keys), 500):
+        ids.update(connection.execute(select(table.c.key, table.c.id).where(
+            table.c.key.in_(keys[start:start + 500]))).all())
+    return ids
+
+
+def assign_term_ids(connection, table: str, rows: List[dict]):
+    """ Preenche, nas linhas a inserir com o Core, os ids dos dicionários
+        correspondentes às colunas de texto.
+    """
+    for column, id_column, model in TERM_COLUMNS[table]:
+        ids = term_ids(connection, model, (row.get(column) for row in rows))
+        for row in rows:
+            row[id_column] = ids.get(normalize_key(row.get(column)))
+
+
+def matching_terms(model, value: str, prefix: bool = False):
+    """ Retorna a consulta dos ids do dicionário cuja chave é igual à do texto
+        (ou começa por ela, com prefix), usando o índice único da chave.
+    """
+    key = normalize_key(value)
+    if prefix:
+        # intervalo [chave, chave + maior caractere): equivale a um LIKE 'chave%' indexado
+        return select(model.id).where(model.key >= key, model.key < key + "\U0010ffff")
+    return select(model.id).where(model.key == key)
+
+
+def register_term_events(mapped_class):
+    """ Mantém os ids dos dicionários das entidades do ORM: antes de cada inserção
+        ou alteração, os textos alterados são procurados (ou cadastrados) no dicionário.
+    """
+    columns = TERM_COLUMNS[mapped_class.__tablename__]
+
+    def assign(mapper, connection, target):
+        state = inspect(target)
+        for column, id_column, model in columns:
+            if state.persistent and not state.attrs[column].history.has_changes():
+                continue
+            value = getattr(target, column)
+            setattr(target, id_column, term_ids(connection, model, [value]).get(normalize_key(value)))
+
+    event.listen(mapped_class, "before_insert", assign)
+    event.listen(mapped_class, "before_update", assign)
@@ -0,0 +1,65 @@
+from sqlalchemy import text
+import threading
+import time
+
+
+# contador persistente das gerações dos dados: incrementado a cada transação do
+# escritor, permite que cada processo saiba se os dados mudaram desde a última leitura
+GENERATION_DDL = [
+    """CREATE TABLE IF NOT EXISTS data_generation (
+           id INTEGER PRIMARY KEY CHECK (id = 1),
+           generation INTEGER NOT NULL
+       )""",
+    "INSERT OR IGNORE INTO data_generation (id, generation) VALUES (1, 0)",
+]
+
+
+class DataGeneration:
+    """ Geração atual dos dados, usada para invalidar caches.
+
+    As escritas deste processo atualizam o valor local imediatamente (ver bump e
+    commit). Escritas de outros processos (ex.: outros workers do gunicorn) são
+    percebidas relendo o contador da base, no máximo a cada check_interval segundos.
+    """
+
+    def __init__(self, engine, check_interval: float):
+        self.engine = engine
+        self.check_interval = check_interval
+        self.value = None
+        self.checked_at = 0.0
+        self.pending = None
+        self.lock = threading.Lock()
+
+    def create(self):
+        """ Cria (caso não exista) a tabela do contador.
+        """
+        with self.engine.begin() as connection:
+            for statement in GENERATION_DDL:
+                connection.execute(text(statement))
+
+    def current(self) -> int:
+        """ Retorna a geração atual, relendo a base se a última leitura expirou.
+        """
+        now = time.monotonic()
+        if self.value is None or now - self.checked_at >= self.check_interval:
+            with self.engine.connect() as connection:
+                value = connection.execute(
+                    text("SELECT generation FROM data_generation WHERE id = 1")).scalar()
+            with self.lock:
+                self.value, self.checked_at = value, now
+        return self.value
+
+    def bump(self, session):
+        """ Incrementa o contador na transação da sessão (chamado antes do commit).
+        """
+        self.pending = session.execute(text(
+            "UPDATE data_generation SET generation = generation + 1 WHERE id = 1 "
+            "RETURNING generation")).scalar()
+
+    def commit(self):
+        """ Publica localmente a geração gravada por bump (chamado após o commit).
+        """
+        with self.lock:
+            if self.pending is not None:
+                self.value, self.checked_at = self.pending, time.monotonic()
+                self.pending = None
@@ -12,19 +12,26 @@ class GeoCatalog(Base):
     id = Column("id_geo_catalog",Integer, primary_key=True)
     title = Column(String(144))
     description = Column(String(3000))
-    img_source = Column(BLOB, nullable=True)
+    # a imagem fica no blob store (model.blob_store), a linha guarda apenas
+    # o hash SHA-256 e o tamanho do conteúdo
+    img_hash = Column(String(64), nullable=True, index=True)
+    img_size = Column(Integer, nullable=True)
     hashtag = Column(String(40))
-    created_at = Column(DateTime, default=datetime.now())
+    # id da hashtag no dicionário (ver model/dictionary.py)
+    hashtag_id = Column(Integer, ForeignKey("hashtags.id"), index=True)
+    # data da inserção (a função é chamada a cada linha), indexada para as buscas por intervalo
+    created_at = Column(DateTime, default=datetime.now, index=True)
 
     # Definição do relacionamento entre o catálogo geográfico e uma coordenada.
     # Aqui está sendo definido a coluna 'coordenada' que vai guardar
     # a referencia a coordenada, a chave estrangeira que relaciona
     # uma coordenada a um catálogo geográfico.
-    coordinate_id = Column(Integer, ForeignKey("coordinates.id_coordinate"), nullable=False)
+    coordinate_id = Column(Integer, ForeignKey("coordinates.id_coordinate"), nullable=False, index=True)
 
     def __init__(self, title:str,
                  description:str,
-                 img_source:LargeBinary,
+                 img_hash:Union[str, None],
+                 img_size:Union[int, None],
                  hashtag:str,
                  created_at:Union[DateTime, None] = None):
         """
@@ -34,12 +41,14 @@ class GeoCatalog(Base):
             title: título de um catálogo geográfico.
             description: descrição de um catálogo geográfico.
             hashtag: chave para acesso ao catálogo.
-            img_source: imagem vinculada ao catálogo.
+            img_hash: hash SHA-256 da imagem vinculada ao catálogo.
+            img_size: tamanho, em bytes, da imagem vinculada ao catálogo.
             created_at: data de inserção da informação geográfica.
         """
         self.title = title
         self.description = description
-        self.img_source = img_source
+        self.img_hash = img_hash
+        self.img_size = img_size
         self.hashtag = hashtag
 
         if created_at:
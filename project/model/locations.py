@@ -0,0 +1,95 @@
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+
+
+# Registro das posições alteradas: cada inserção, remoção ou alteração de uma
+# coordenada (posição ou dados exibidos nos tiles e usados nos filtros, inclusive
+# por um upsert) ou de um catálogo, na posição da sua coordenada, grava a latitude
+# e a longitude afetadas, na mesma transação. Os caches por tile (ex.: /clusters)
+# leem o registro para invalidar apenas os tiles que contêm essas posições.
+LOCATION_CHANGES_DDL = [
+    """CREATE TABLE IF NOT EXISTS location_changes (
+           id INTEGER PRIMARY KEY,
+           latitude FLOAT NOT NULL,
+           longitude FLOAT NOT NULL
+       )""",
+    """CREATE TRIGGER IF NOT EXISTS location_changes_coordinate_insert AFTER INSERT ON coordinates
+       WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL
+       BEGIN
+           INSERT INTO location_changes (latitude, longitude) VALUES (new.latitude, new.longitude);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS location_changes_coordinate_update
+       AFTER UPDATE OF latitude, longitude, name, contact, city, region, country,
+                       city_id, region_id, country_id ON coordinates
+       BEGIN
+           INSERT INTO location_changes (latitude, longitude)
+           SELECT old.latitude, old.longitude WHERE old.latitude IS NOT NULL AND old.longitude IS NOT NULL
+           UNION ALL
+           SELECT new.latitude, new.longitude WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS location_changes_coordinate_delete AFTER DELETE ON coordinates
+       WHEN old.latitude IS NOT NULL AND old.longitude IS NOT NULL
+       BEGIN
+           INSERT INTO location_changes (latitude, longitude) VALUES (old.latitude, old.longitude);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS location_changes_catalog_insert AFTER INSERT ON geo_catalogs
+       BEGIN
+           INSERT INTO location_changes (latitude, longitude)
+           SELECT latitude, longitude FROM coordinates
+           WHERE id_coordinate = new.coordinate_id AND latitude IS NOT NULL AND longitude IS NOT NULL;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS location_changes_catalog_update
+       AFTER UPDATE OF hashtag, coordinate_id ON geo_catalogs
+       BEGIN
+           INSERT INTO location_changes (latitude, longitude)
+           SELECT latitude, longitude FROM coordinates
+           WHERE id_coordinate IN (old.coordinate_id, new.coordinate_id)
+           AND latitude IS NOT NULL AND longitude IS NOT NULL;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS location_changes_catalog_delete AFTER DELETE ON geo_catalogs
+       BEGIN
+           INSERT INTO location_changes (latitude, longitude)
+           SELECT latitude, longitude FROM coordinates
+           WHERE id_coordinate = old.coordinate_id AND latitude IS NOT NULL AND longitude IS NOT NULL;
+       END""",
+]
+
+
+class LocationChanges:
+    """ Leitura do registro de posições alteradas (tabela location_changes).
+
+    Apenas as últimas retention posições são mantidas (ver prune): um leitor que
+    ficou mais atrasado que isso deve descartar tudo o que guardou.
+    """
+
+    def __init__(self, engine, retention: int):
+        self.engine = engine
+        self.retention = retention
+
+    def create(self):
+        """ Cria (caso não existam) a tabela e os triggers do registro.
+        """
+        with self.engine.begin() as connection:
+            for statement in LOCATION_CHANGES_DDL:
+                connection.execute(text(statement))
+
+    def last_id(self) -> int:
+        with self.engine.connect() as connection:
+            return connection.execute(text("SELECT coalesce(max(id), 0) FROM location_changes")).scalar()
+
+    def since(self, after_id: int, limit: int) -> Tuple[Optional[int], List[Tuple[int, float, float]]]:
+        """ Retorna o menor id ainda guardado e até limit posições gravadas após after_id.
+        """
+        with self.engine.connect() as connection:
+            oldest = connection.execute(text("SELECT min(id) FROM location_changes")).scalar()
+            rows = connection.execute(text(
+                "SELECT id, latitude, longitude FROM location_changes WHERE id > :after "
+                "ORDER BY id LIMIT :limit"), {"after": after_id, "limit": limit}).all()
+        return oldest, [tuple(row) for row in rows]
+
+    def prune(self, session):
+        """ Descarta as posições mais antigas (chamado antes do commit do escritor).
+        """
+        session.execute(text(
+            "DELETE FROM location_changes WHERE id <= "
+            "(SELECT max(id) FROM location_changes) - :retention"), {"retention": self.retention})
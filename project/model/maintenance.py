@@ -0,0 +1,192 @@
+from typing import Optional
+import os
+import threading
+import time
+
+from logger import logger
+from metrics import registry, Counter, Gauge, Histogram
+
+
+# valores de PRAGMA auto_vacuum
+AUTO_VACUUM_INCREMENTAL = 2
+
+maintenance_duration = registry.register(Histogram(
+    "geovisio_maintenance_duration_seconds",
+    "Tempo das tarefas de manutenção da base (vacuum, analyze e checkpoint).", ("task",)))
+reclaimed_bytes_total = registry.register(Counter(
+    "geovisio_maintenance_reclaimed_bytes_total",
+    "Bytes devolvidos ao sistema pelo vacuum incremental."))
+
+
+class StorageMaintenance:
+    """ Manutenção da base sqlite em segundo plano, em uma thread por processo.
+
+    A cada interval segundos (ou ao ser acordada, ex.: após uma remoção em lote):
+    - devolve ao sistema as páginas livres (PRAGMA incremental_vacuum), quando
+      passam de vacuum_bytes, em passos de step_pages páginas com uma pausa entre
+      eles, para que o escritor não espere pelo lock mais que um passo;
+    - atualiza as estatísticas do planejador (ANALYZE, limitado a analysis_limit
+      linhas por índice) a cada analyze_interval segundos, após um vacuum ou
+      quando pedido em wake (ex.: após uma remoção em lote);
+    - faz um checkpoint do WAL (PASSIVE: não espera por leitores nem pelo escritor).
+
+    O espaço devolvido é registrado no log e nas métricas. O vacuum incremental
+    exige auto_vacuum=INCREMENTAL, definido na criação da base (ver convert).
+    """
+
+    def __init__(self, engine, interval: float, vacuum_bytes: int, step_pages: int, pause: float,
+                 analyze_interval: float, analysis_limit: int):
+        self.engine = engine
+        self.interval = interval
+        self.vacuum_bytes = vacuum_bytes
+        self.step_pages = step_pages
+        self.pause = pause
+        self.analyze_interval = analyze_interval
+        self.analysis_limit = analysis_limit
+        self.analyzed_at = time.monotonic()
+        self.analyze_requested = False
+        # bytes livres na base, na última verificação
+        self.free_bytes = 0
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.pid = None
+        self.lock = threading.Lock()
+        registry.register(Gauge("geovisio_db_free_bytes",
+                                "Bytes de páginas livres na base, na última manutenção.", lambda: self.free_bytes))
+
+    def start(self):
+        """ Inicia a thread da manutenção, caso ainda não esteja rodando neste processo
+            (após um fork, a thread do processo pai não existe no filho).
+        """
+        if self.interval <= 0:
+            return
+        if self.thread is not None and self.pid == os.getpid() and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is None or self.pid != os.getpid() or not self.thread.is_alive():
+                self.pid = os.getpid()
+                self.wakeup = threading.Event()
+                self.thread = threading.Thread(target=self.run, name="geovisio-maintenance", daemon=True)
+                self.thread.start()
+
+    def wake(self, analyze: bool = False):
+        """ Antecipa a próxima manutenção (ex.: após muitas remoções), com a
+            atualização das estatísticas, se analyze.
+        """
+        self.analyze_requested = self.analyze_requested or analyze
+        self.start()
+        self.wakeup.set()
+
+    def run(self):
+        while True:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.warning(f"Erro na manutenção da base: {e}")
+
+    def run_once(self, analyze: Optional[bool] = None) -> dict:
+        """ Executa as tarefas devidas e retorna o que foi feito: bytes devolvidos
+            ao sistema, se as estatísticas foram atualizadas e o resultado do checkpoint.
+        """
+        connection = self.engine.raw_connection()
+        try:
+            # a conexão do driver: os PRAGMAs de manutenção não passam pelo ORM
+            dbapi_connection = connection.driver_connection
+            reclaimed = self.timed("vacuum", self.vacuum, dbapi_connection)
+            if analyze is None:
+                analyze = reclaimed > 0 or self.analyze_requested or \
+                          time.monotonic() - self.analyzed_at >= self.analyze_interval
+            if analyze:
+                self.timed("analyze", self.analyze, dbapi_connection)
+            checkpoint = self.timed("checkpoint", self.checkpoint, dbapi_connection)
+        finally:
+            connection.close()
+        if reclaimed:
+            logger.info(f"Manutenção da base: {reclaimed} bytes devolvidos ao sistema")
+        return {"reclaimed_bytes": reclaimed, "analyzed": analyze, "checkpoint": checkpoint}
+
+    def timed(self, task: str, function, dbapi_connection):
+        start = time.perf_counter()
+        try:
+            return function(dbapi_connection)
+        finally:
+            maintenance_duration.observe((task,), time.perf_counter() - start)
+
+    def vacuum(self, dbapi_connection) -> int:
+        """ Devolve as páginas livres ao sistema, em passos curtos, e retorna os
+            bytes devolvidos (pela redução do número de páginas da base).
+        """
+        page_size = pragma_value(dbapi_connection, "page_size")
+        free_pages = pragma_value(dbapi_connection, "freelist_count")
+        self.free_bytes = free_pages * page_size
+        if self.free_bytes < self.vacuum_bytes or \
+                pragma_value(dbapi_connection, "auto_vacuum") != AUTO_VACUUM_INCREMENTAL:
+            return 0
+
+        page_count = pragma_value(dbapi_connection, "page_count")
+        while free_pages > 0:
+            # executescript executa o PRAGMA até o fim (com execute, apenas uma
+            # página é liberada) e encerra a transação, liberando o lock de escrita
+            dbapi_connection.executescript("PRAGMA incremental_vacuum(%d);" % self.step_pages)
+            remaining = pragma_value(dbapi_connection, "freelist_count")
+            if remaining >= free_pages:
+                # nada foi liberado (ex.: remoções concorrentes): fica para a próxima execução
+                break
+            free_pages = remaining
+            time.sleep(self.pause)
+
+        self.free_bytes = free_pages * page_size
+        reclaimed = max(page_count - pragma_value(dbapi_connection, "page_count"), 0) * page_size
+        reclaimed_bytes_total.inc(value=reclaimed)
+        return reclaimed
+
+    def analyze(self, dbapi_connection):
+        """ Atualiza as estatísticas usadas pelo planejador de consultas. Com
+            analysis_limit, cada índice é amostrado, e o ANALYZE é curto mesmo em bases grandes.
+        """
+        self.analyze_requested = False
+        dbapi_connection.executescript("PRAGMA analysis_limit = %d; ANALYZE;" % self.analysis_limit)
+        self.analyzed_at = time.monotonic()
+
+    def checkpoint(self, dbapi_connection) -> tuple:
+        """ Copia as páginas do WAL para a base, sem esperar por leitores ou pelo
+            escritor. Retorna (ocupado, páginas no WAL, páginas copiadas).
+        """
+        cursor = dbapi_connection.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        try:
+            return tuple(cursor.fetchone())
+        finally:
+            cursor.close()
+
+    def convert(self):
+        """ Converte uma base criada sem auto_vacuum incremental, com um VACUUM
+            completo (reescreve o arquivo e bloqueia a base enquanto isso).
+        """
+        connection = self.engine.raw_connection()
+        try:
+            dbapi_connection = connection.driver_connection
+            if pragma_value(dbapi_connection, "auto_vacuum") == AUTO_VACUUM_INCREMENTAL:
+                return
+            logger.info("Convertendo a base para auto_vacuum incremental (VACUUM)")
+            dbapi_connection.executescript("PRAGMA auto_vacuum = INCREMENTAL; VACUUM;")
+        finally:
+            connection.close()
+
+    def incremental(self) -> bool:
+        """ Indica se a base tem auto_vacuum incremental.
+        """
+        connection = self.engine.raw_connection()
+        try:
+            return pragma_value(connection.driver_connection, "auto_vacuum") == AUTO_VACUUM_INCREMENTAL
+        finally:
+            connection.close()
+
+
+def pragma_value(dbapi_connection, name: str) -> int:
+    cursor = dbapi_connection.execute("PRAGMA %s" % name)
+    try:
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
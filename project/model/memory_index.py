@@ -0,0 +1,237 @@
+import threading
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+from sqlalchemy import Float, select, tuple_, type_coerce
+
+from model.coordinate import Coordinate
+from model.geo_catalog import GeoCatalog
+from model.pagination import decode_cursor
+from model.spatial import EARTH_RADIUS_M, parse_bbox, parse_point, bbox_around
+
+# numpy é opcional: sem ele, as buscas espaciais são sempre feitas pelo sqlite
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# quantidade de valores por consulta IN (abaixo do limite de variáveis do sqlite)
+CHUNK_SIZE = 500
+
+
+class Snapshot:
+    """ Cópia imutável das coordenadas (com latitude e longitude) em arrays:
+        um leitor sempre vê uma cópia inteira, mesmo durante uma atualização.
+    """
+
+    def __init__(self, ids, latitudes, longitudes, region_ids, hashtags: dict):
+        self.ids = ids
+        self.lat_deg = latitudes
+        self.lon_deg = longitudes
+        self.lat_rad = np.radians(latitudes)
+        self.lon_rad = np.radians(longitudes)
+        self.cos_lat = np.cos(self.lat_rad)
+        # id da região no dicionário (-1 sem região)
+        self.region_ids = region_ids
+        # id da hashtag no dicionário -> ids das coordenadas com catálogos da hashtag
+        self.hashtags = hashtags
+
+    def positions(self):
+        """ Retorna as posições (latitude, longitude) como números complexos, para
+            comparação com np.isin.
+        """
+        return self.lat_deg + 1j * self.lon_deg
+
+
+class CoordinateIndex:
+    """ Índice em memória das coordenadas, para buscas espaciais (bbox, raio e
+        mais próximas) vetorizadas com numpy, sem consultar a base.
+
+    A carga é feita na primeira busca. As escritas chegam pelo registro de
+    posições alteradas (ver cache.TileInvalidation): invalidate recarrega apenas
+    as coordenadas nessas posições, e clear descarta o índice inteiro.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.snapshot = None
+        self.lock = threading.Lock()
+
+    def load(self) -> Snapshot:
+        """ Lê todas as coordenadas e as hashtags dos seus catálogos.
+        """
+        with self.engine.connect() as connection:
+            rows = connection.execute(coordinate_rows()).all()
+            tags = connection.execute(select(GeoCatalog.coordinate_id, GeoCatalog.hashtag_id).where(
+                GeoCatalog.hashtag_id.is_not(None)).distinct()).all()
+        hashtags = {}
+        for coordinate_id, hashtag in tags:
+            hashtags.setdefault(hashtag, set()).add(coordinate_id)
+        return Snapshot(
+            np.array([row[0] for row in rows], dtype=np.int64),
+            np.array([row[1] for row in rows], dtype=np.float64),
+            np.array([row[2] for row in rows], dtype=np.float64),
+            region_array(rows), {hashtag: frozenset(ids) for hashtag, ids in hashtags.items()})
+
+    def current(self) -> Snapshot:
+        snapshot = self.snapshot
+        if snapshot is None:
+            with self.lock:
+                if self.snapshot is None:
+                    self.snapshot = self.load()
+                snapshot = self.snapshot
+        return snapshot
+
+    def invalidate(self, points: Set[Tuple[float, float]]):
+        """ Recarrega as coordenadas (e as hashtags) nas posições alteradas.
+        """
+        with self.lock:
+            old = self.snapshot
+            if old is None:
+                return
+            points = list(points)
+            rows, tags = [], []
+            with self.engine.connect() as connection:
+                for start in range(0, len(points), CHUNK_SIZE):
+                    chunk = points[start:start + CHUNK_SIZE]
+                    rows.extend(connection.execute(coordinate_rows().where(tuple_(
+                        type_coerce(Coordinate.latitude, Float()),
+                        type_coerce(Coordinate.longitude, Float())).in_(chunk))).all())
+                ids = [row[0] for row in rows]
+                for start in range(0, len(ids), CHUNK_SIZE):
+                    tags.extend(connection.execute(select(GeoCatalog.coordinate_id, GeoCatalog.hashtag_id).where(
+                        GeoCatalog.coordinate_id.in_(ids[start:start + CHUNK_SIZE]),
+                        GeoCatalog.hashtag_id.is_not(None)).distinct()).all())
+
+            # remove as coordenadas das posições alteradas (e as que foram recarregadas,
+            # caso tenham mudado de posição) e acrescenta as lidas agora
+            keep = ~(np.isin(old.positions(), np.array([complex(lat, lon) for lat, lon in points]))
+                     | np.isin(old.ids, np.array(ids, dtype=np.int64)))
+            removed = set(old.ids[~keep].tolist())
+            hashtags = dict(old.hashtags)
+            for hashtag, tagged in hashtags.items():
+                if not tagged.isdisjoint(removed):
+                    hashtags[hashtag] = tagged - removed
+            added = {}
+            for coordinate_id, hashtag in tags:
+                added.setdefault(hashtag, set()).add(coordinate_id)
+            for hashtag, tagged in added.items():
+                hashtags[hashtag] = hashtags.get(hashtag, frozenset()) | tagged
+
+            self.snapshot = Snapshot(
+                np.concatenate([old.ids[keep], np.array([row[0] for row in rows], dtype=np.int64)]),
+                np.concatenate([old.lat_deg[keep], np.array([row[1] for row in rows], dtype=np.float64)]),
+                np.concatenate([old.lon_deg[keep], np.array([row[2] for row in rows], dtype=np.float64)]),
+                np.concatenate([old.region_ids[keep], region_array(rows)]),
+                {hashtag: tagged for hashtag, tagged in hashtags.items() if tagged})
+
+    def clear(self):
+        """ Descarta o índice: a próxima busca o recarrega inteiro.
+        """
+        with self.lock:
+            self.snapshot = None
+
+    def search(self, within: Optional[str] = None, near: Optional[str] = None,
+               radius_m: Optional[float] = None, nearest: Optional[int] = None,
+               region_ids: Optional[List[int]] = None, hashtag_ids: Optional[List[int]] = None,
+               after: Optional[str] = None, limit: Optional[int] = None) -> List[Tuple[float, int]]:
+        """ Retorna (distância, id) das coordenadas encontradas, na ordem da listagem
+            (distância ao ponto de referência e id), com os mesmos filtros e cursores
+            da busca pelo sqlite (ver spatial_filter e keyset_paginate). Região e
+            hashtag são filtradas pelos ids dos dicionários (ver matching_terms).
+
+        Com limit, uma linha além do limite é retornada, para que se saiba se há
+        próxima página.
+        """
+        snapshot = self.current()
+        if near:
+            lat, lon = parse_point(near)
+            if radius_m is not None:
+                min_lon, min_lat, max_lon, max_lat = bbox_around(lat, lon, radius_m)
+                mask = bbox_mask(snapshot, min_lon, min_lat, max_lon, max_lat)
+            else:
+                mask = np.ones(len(snapshot.ids), dtype=bool)
+        else:
+            min_lon, min_lat, max_lon, max_lat = parse_bbox(within)
+            lat, lon = (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
+            mask = bbox_mask(snapshot, min_lon, min_lat, max_lon, max_lat)
+
+        if region_ids is not None:
+            mask &= np.isin(snapshot.region_ids, np.array(region_ids, dtype=np.int64))
+        if hashtag_ids is not None:
+            tagged = set()
+            for hashtag_id in hashtag_ids:
+                tagged |= snapshot.hashtags.get(hashtag_id, frozenset())
+            mask &= np.isin(snapshot.ids, np.fromiter(tagged, dtype=np.int64, count=len(tagged)))
+
+        candidates = np.flatnonzero(mask)
+        distances = haversine(snapshot, candidates, lat, lon)
+        if near and radius_m is not None:
+            inside = distances <= radius_m
+            candidates, distances = candidates[inside], distances[inside]
+        ids = snapshot.ids[candidates]
+
+        if nearest and len(ids) > nearest:
+            # apenas as nearest mais próximas (com os empates no limite, decididos pelo id)
+            threshold = np.partition(distances, nearest - 1)[nearest - 1]
+            closest = distances <= threshold
+            ids, distances = ids[closest], distances[closest]
+        order = np.lexsort((ids, distances))
+        if nearest:
+            order = order[:nearest]
+        ids, distances = ids[order], distances[order]
+
+        if after:
+            values = decode_cursor(after)
+            if len(values) != 2:
+                raise ValueError("cursor não corresponde a esta busca")
+            after_distance, after_id = values
+            start = np.flatnonzero((distances > after_distance) |
+                                   ((distances == after_distance) & (ids > after_id)))
+            start = start[0] if len(start) else len(ids)
+            ids, distances = ids[start:], distances[start:]
+        if limit:
+            ids, distances = ids[:limit + 1], distances[:limit + 1]
+        return list(zip(distances.tolist(), ids.tolist()))
+
+
+def coordinate_rows():
+    return select(Coordinate.id, type_coerce(Coordinate.latitude, Float()),
+                  type_coerce(Coordinate.longitude, Float()), Coordinate.region_id).where(
+        Coordinate.latitude.is_not(None), Coordinate.longitude.is_not(None))
+
+
+def region_array(rows):
+    return np.array([-1 if row[3] is None else row[3] for row in rows], dtype=np.int64)
+
+
+def bbox_mask(snapshot: Snapshot, min_lon: float, min_lat: float, max_lon: float, max_lat: float):
+    return ((snapshot.lat_deg >= min_lat) & (snapshot.lat_deg <= max_lat) &
+            (snapshot.lon_deg >= min_lon) & (snapshot.lon_deg <= max_lon))
+
+
+def haversine(snapshot: Snapshot, positions, lat: float, lon: float):
+    """ Distância, em metros, das coordenadas nas posições informadas até o ponto
+        (a mesma conta de model.spatial.haversine, sobre arrays).
+    """
+    lat, lon = np.radians(lat), np.radians(lon)
+    lat_rad, lon_rad = snapshot.lat_rad[positions], snapshot.lon_rad[positions]
+    a = np.sin((lat - lat_rad) / 2) ** 2 + \
+        snapshot.cos_lat[positions] * np.cos(lat) * np.sin((lon - lon_rad) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def rows_by_id(session, columns: list, results: Iterable[Tuple[float, int]]) -> Iterator[tuple]:
+    """ Lê as colunas das coordenadas encontradas por CoordinateIndex.search, em
+        blocos, e percorre as linhas na ordem da busca, com as chaves (distância e
+        id) ao final de cada linha (como em keyset_paginate).
+    """
+    results = list(results)
+    for start in range(0, len(results), CHUNK_SIZE):
+        chunk = results[start:start + CHUNK_SIZE]
+        rows = session.execute(select(*columns).add_columns(Coordinate.id).select_from(Coordinate).where(
+            Coordinate.id.in_([coordinate_id for _, coordinate_id in chunk])))
+        by_id = {row[-1]: tuple(row[:-1]) for row in rows}
+        for distance, coordinate_id in chunk:
+            row = by_id.get(coordinate_id)
+            if row is not None:
+                yield row + (distance, coordinate_id)
@@ -0,0 +1,238 @@
+from typing import Optional, Tuple
+import re
+from sqlalchemy import bindparam, inspect, text
+
+from logger import logger
+from model.blob_store import blob_store
+from model.coordinate import position_key_sql
+from model.dictionary import TERM_COLUMNS, term_ids, normalize_key
+from model.changes import CHANGES_DDL
+from model.locations import LOCATION_CHANGES_DDL
+
+
+# imagens lidas da base por vez ao movê-las para o blob store
+MOVE_IMAGES_BATCH_SIZE = 100
+# primeira versão do sqlite com ALTER TABLE ... DROP COLUMN
+DROP_COLUMN_SQLITE_VERSION = (3, 35, 0)
+
+
+def column_names(connection, table: str):
+    return {column["name"] for column in inspect(connection).get_columns(table)}
+
+
+def sqlite_version(connection) -> Tuple[int, ...]:
+    """ Retorna a versão da biblioteca sqlite usada pela conexão.
+    """
+    return tuple(int(part) for part in connection.exec_driver_sql("SELECT sqlite_version()").scalar().split("."))
+
+
+def move_images_to_blob_store(connection):
+    """ Move as imagens guardadas na coluna geo_catalogs.img_source para o
+        blob store, mantendo na linha apenas o hash e o tamanho.
+    """
+    columns = column_names(connection, "geo_catalogs")
+    if "img_source" not in columns:
+        return
+    version = sqlite_version(connection)
+    if version < DROP_COLUMN_SQLITE_VERSION:
+        raise ValueError("mover as imagens para o blob store exige o sqlite %s ou mais recente "
+                         "(ALTER TABLE ... DROP COLUMN); a versão em uso é %s." % (
+                             ".".join(map(str, DROP_COLUMN_SQLITE_VERSION)), ".".join(map(str, version))))
+    for column, type_ in (("img_hash", "VARCHAR(64)"), ("img_size", "INTEGER")):
+        if column not in columns:
+            connection.execute(text(f"ALTER TABLE geo_catalogs ADD COLUMN {column} {type_}"))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_geo_catalogs_img_hash ON geo_catalogs (img_hash)"))
+
+    # apenas os ids ficam em memória: as imagens são lidas em lotes pequenos
+    ids = connection.execute(text(
+        "SELECT id_geo_catalog FROM geo_catalogs WHERE img_source IS NOT NULL "
+        "ORDER BY id_geo_catalog")).scalars().all()
+    images = text("SELECT id_geo_catalog, img_source FROM geo_catalogs WHERE id_geo_catalog IN :ids").bindparams(
+        bindparam("ids", expanding=True))
+    for start in range(0, len(ids), MOVE_IMAGES_BATCH_SIZE):
+        batch = connection.execute(images, {"ids": ids[start:start + MOVE_IMAGES_BATCH_SIZE]}).all()
+        for id_geo_catalog, img_source in batch:
+            digest, size = blob_store.put(img_source)
+            connection.execute(text(
+                "UPDATE geo_catalogs SET img_hash = :digest, img_size = :size WHERE id_geo_catalog = :id"),
+                {"digest": digest, "size": size, "id": id_geo_catalog})
+    connection.execute(text("ALTER TABLE geo_catalogs DROP COLUMN img_source"))
+
+
+def index_catalog_coordinates(connection):
+    """ Indexa geo_catalogs.coordinate_id, usado nas junções com as coordenadas
+        (ex.: agregação dos catálogos por tile, em /clusters).
+    """
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_geo_catalogs_coordinate_id ON geo_catalogs (coordinate_id)"))
+
+
+def index_created_at(connection):
+    """ Indexa a data de criação das coordenadas e dos catálogos (buscas por
+        intervalo e histograma de /stats/timeline).
+    """
+    for table in ("coordinates", "geo_catalogs"):
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_created_at ON {table} (created_at)"))
+
+
+def add_catalog_count(connection):
+    """ Acrescenta coordinates.catalog_count (mantido pelos triggers de model/stats.py)
+        e o preenche com a quantidade atual de catálogos de cada coordenada.
+    """
+    if "catalog_count" in column_names(connection, "coordinates"):
+        return
+    connection.execute(text(
+        "ALTER TABLE coordinates ADD COLUMN catalog_count INTEGER NOT NULL DEFAULT 0"))
+    connection.execute(text(
+        "UPDATE coordinates SET catalog_count = (SELECT count(*) FROM geo_catalogs "
+        "WHERE geo_catalogs.coordinate_id = coordinates.id_coordinate)"))
+
+
+def rekey_stats(connection):
+    """ Descarta as estatísticas indexadas pelo texto da hashtag e da região: são
+        recriadas, pelos ids dos dicionários, por model/stats.py.
+    """
+    if not inspect(connection).has_table("hashtag_stats") or \
+       "hashtag" not in column_names(connection, "hashtag_stats"):
+        return
+    for trigger in ("stats_coordinate_insert", "stats_coordinate_update", "stats_coordinate_delete",
+                    "stats_catalog_insert", "stats_catalog_update", "stats_catalog_delete"):
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    connection.execute(text("DROP TABLE hashtag_stats"))
+    connection.execute(text("DROP TABLE IF EXISTS region_stats"))
+
+
+def add_term_ids(connection):
+    """ Acrescenta as chaves estrangeiras para os dicionários (hashtag, região,
+        cidade e país) e as preenche a partir dos textos já cadastrados.
+    """
+    for table, columns in TERM_COLUMNS.items():
+        existing = column_names(connection, table)
+        for column, id_column, model in columns:
+            if id_column in existing:
+                continue
+            connection.execute(text(
+                f"ALTER TABLE {table} ADD COLUMN {id_column} INTEGER REFERENCES {model.__tablename__}(id)"))
+            connection.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_{id_column} ON {table} ({id_column})"))
+            values = connection.execute(text(
+                f"SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL")).scalars().all()
+            ids = term_ids(connection, model, values)
+            updates = [{"value": value, "id": ids.get(key)} for value in values
+                       for key in [normalize_key(value)] if ids.get(key) is not None]
+            if updates:
+                connection.execute(text(
+                    f"UPDATE {table} SET {id_column} = :id WHERE {column} = :value"), updates)
+
+
+def add_position_key(connection):
+    """ Acrescenta a posição quantizada (lat_key, lon_key) e o seu índice único.
+        Coordenadas repetidas na mesma posição são unidas na de menor id, que
+        recebe os catálogos das demais. Com outra GEOVISIO_COORDINATE_PRECISION,
+        as colunas são recriadas (apenas com init-db --rekey, ver init_db).
+    """
+    table_sql = connection.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'coordinates'")).scalar()
+    if position_key_sql("latitude") in table_sql and connection.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'ux_coordinates_position'")).first():
+        return
+    connection.execute(text("DROP INDEX IF EXISTS ux_coordinates_position"))
+    for column, source in (("lat_key", "latitude"), ("lon_key", "longitude")):
+        if column in column_names(connection, "coordinates"):
+            connection.execute(text(f"ALTER TABLE coordinates DROP COLUMN {column}"))
+        connection.execute(text(
+            f"ALTER TABLE coordinates ADD COLUMN {column} INTEGER GENERATED ALWAYS AS ({position_key_sql(source)})"))
+
+    repeated = connection.execute(text(
+        "SELECT id_coordinate, kept FROM coordinates JOIN ("
+        "    SELECT lat_key, lon_key, min(id_coordinate) AS kept FROM coordinates"
+        "    GROUP BY lat_key, lon_key HAVING count(*) > 1"
+        ") USING (lat_key, lon_key) WHERE id_coordinate != kept")).all()
+    if repeated:
+        logger.warning(f"Unindo {len(repeated)} coordenadas repetidas na mesma posição")
+        connection.execute(text("UPDATE geo_catalogs SET coordinate_id = :kept WHERE coordinate_id = :id"),
+                           [{"id": id_, "kept": kept_id} for id_, kept_id in repeated])
+        connection.execute(text("DELETE FROM coordinates WHERE id_coordinate = :id"),
+                           [{"id": id_} for id_, _ in repeated])
+        # em bases anteriores aos triggers de model/stats.py, o contador não acompanhou a união
+        connection.execute(text(
+            "UPDATE coordinates SET catalog_count = (SELECT count(*) FROM geo_catalogs "
+            "WHERE geo_catalogs.coordinate_id = coordinates.id_coordinate) WHERE id_coordinate = :kept"),
+            [{"kept": kept_id} for kept_id in {kept_id for _, kept_id in repeated}])
+    connection.execute(text(
+        "CREATE UNIQUE INDEX ux_coordinates_position ON coordinates (lat_key, lon_key)"))
+
+
+def trigger_definitions(statements) -> dict:
+    """ Retorna nome -> definição (como guardada em sqlite_master, sem IF NOT EXISTS
+        e com os espaços normalizados) dos triggers criados por statements.
+    """
+    definitions = {}
+    for statement in statements:
+        match = re.match(r"\s*CREATE TRIGGER IF NOT EXISTS (\w+)", statement)
+        if match:
+            definitions[match.group(1)] = " ".join(statement.replace(" IF NOT EXISTS", "", 1).split())
+    return definitions
+
+
+def drop_outdated_triggers(connection):
+    """ Remove os triggers criados por versões anteriores com outra definição (ex.:
+        outras colunas em UPDATE OF): são recriados, com a definição atual, pelo
+        create de model/locations.py e de model/changes.py.
+    """
+    definitions = trigger_definitions(LOCATION_CHANGES_DDL + CHANGES_DDL)
+    for name, sql in connection.execute(text("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'")).all():
+        if name in definitions and " ".join(sql.split()) != definitions[name]:
+            connection.execute(text(f"DROP TRIGGER {name}"))
+
+
+# migrações das bases existentes, na ordem em que devem ser aplicadas.
+# Cada migração verifica o estado da base e só age se ainda for necessária.
+MIGRATIONS = [
+    move_images_to_blob_store,
+    index_catalog_coordinates,
+    add_catalog_count,
+    rekey_stats,
+    add_term_ids,
+    add_position_key,
+    index_created_at,
+    drop_outdated_triggers,
+]
+
+
+# versão do esquema gravada por init_db (PRAGMA user_version): deve ser incrementada
+# a cada mudança de tabelas, índices, triggers ou migrações
+SCHEMA_VERSION = 4
+
+
+def migrate(engine):
+    """ Aplica as migrações pendentes, em uma única transação.
+    """
+    with engine.begin() as connection:
+        for migration in MIGRATIONS:
+            migration(connection)
+
+
+def schema_version(engine) -> int:
+    """ Retorna a versão do esquema gravada na base (0 em bases não inicializadas).
+    """
+    with engine.connect() as connection:
+        return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def position_precision(engine) -> Optional[int]:
+    """ Retorna as casas decimais das chaves de posição (colunas geradas lat_key e
+        lon_key, ver position_key_sql) gravadas na base, ou None se ainda não existem.
+    """
+    with engine.connect() as connection:
+        table_sql = connection.execute(text(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'coordinates'")).scalar()
+    match = re.search(r"round\(latitude \* (\d+)\)", table_sql or "")
+    return len(match.group(1)) - 1 if match else None
+
+
+def set_schema_version(engine, version: int = SCHEMA_VERSION):
+    with engine.begin() as connection:
+        connection.exec_driver_sql("PRAGMA user_version = %d" % version)
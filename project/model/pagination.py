@@ -0,0 +1,72 @@
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from json import dumps, loads
+from typing import List, Optional
+from sqlalchemy import tuple_
+
+from metrics import record_rows
+
+
+def encode_cursor(values) -> str:
+    """ Gera o cursor opaco que aponta para a linha com as chaves informadas.
+    """
+    return urlsafe_b64encode(dumps(list(values)).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> List[float]:
+    """ Recupera as chaves de ordenação guardadas em um cursor.
+    """
+    try:
+        values = loads(urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError("cursor inválido")
+    if not isinstance(values, list) or not values or \
+       not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+        raise ValueError("cursor inválido")
+    return values
+
+
+def keyset_paginate(query, keys: list, after: Optional[str] = None, limit: Optional[int] = None):
+    """ Ordena a consulta pelas chaves (a última deve ser única, ex.: o id) e
+        retorna apenas as linhas posteriores ao cursor after.
+
+    As chaves são adicionadas ao final de cada linha, para que o cursor da
+    próxima página possa ser gerado (ver KeysetPage). Uma linha além do limite
+    é buscada para saber se há próxima página.
+    """
+    if after:
+        values = decode_cursor(after)
+        if len(values) != len(keys):
+            raise ValueError("cursor não corresponde a esta busca")
+        query = query.filter(tuple_(*keys) > tuple_(*values))
+    query = query.add_columns(*keys).order_by(*keys)
+    if limit:
+        query = query.limit(limit + 1)
+    return query
+
+
+class KeysetPage:
+    """ Percorre as linhas de uma consulta paginada por keyset_paginate.
+
+    Cada item é a linha sem as chaves de ordenação. Ao final da iteração,
+    next guarda o cursor da próxima página (ou None, se não houver).
+    """
+
+    def __init__(self, rows, key_count: int, limit: Optional[int] = None):
+        self.rows = rows
+        self.key_count = key_count
+        self.limit = limit
+        self.next = None
+
+    def __iter__(self):
+        last_keys = None
+        count = 0
+        try:
+            for row in self.rows:
+                if self.limit and count == self.limit:
+                    self.next = encode_cursor(last_keys)
+                    break
+                last_keys = row[-self.key_count:]
+                count += 1
+                yield row[:-self.key_count]
+        finally:
+            record_rows(count)
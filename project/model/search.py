@@ -0,0 +1,122 @@
+from typing import Optional
+from sqlalchemy import Table, Column, Integer, Float, String, MetaData, text, literal_column
+
+from model.coordinate import Coordinate
+from model.geo_catalog import GeoCatalog
+
+
+# Os índices de texto são tabelas virtuais FTS5 do sqlite, por isso ficam em um
+# metadata separado: o create_all não sabe criar tabelas virtuais.
+search_metadata = MetaData()
+
+# catálogos, com os dados de texto da coordenada copiados em cada linha (rowid = id do catálogo)
+geo_catalogs_fts = Table(
+    "geo_catalogs_fts", search_metadata,
+    Column("rowid", Integer, primary_key=True),
+    Column("rank", Float),
+    Column("title", String),
+    Column("description", String),
+    Column("hashtag", String),
+    Column("name", String),
+    Column("city", String),
+    Column("region", String))
+
+# coordenadas (rowid = id da coordenada)
+coordinates_fts = Table(
+    "coordinates_fts", search_metadata,
+    Column("rowid", Integer, primary_key=True),
+    Column("rank", Float),
+    Column("name", String),
+    Column("city", String),
+    Column("region", String))
+
+# remove_diacritics: 'sao' encontra 'São'; prefix: índices auxiliares para buscas por prefixo
+FTS_OPTIONS = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+
+# DDL dos índices de texto. Os triggers mantém os índices sincronizados com as
+# tabelas e os comandos INSERT preenchem os índices para bases já existentes.
+SEARCH_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS geo_catalogs_fts
+        USING fts5(title, description, hashtag, name, city, region, {FTS_OPTIONS})""",
+    """CREATE TRIGGER IF NOT EXISTS geo_catalogs_fts_insert AFTER INSERT ON geo_catalogs
+       BEGIN
+           INSERT INTO geo_catalogs_fts (rowid, title, description, hashtag, name, city, region)
+           SELECT new.id_geo_catalog, new.title, new.description, new.hashtag, c.name, c.city, c.region
+           FROM coordinates c WHERE c.id_coordinate = new.coordinate_id;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS geo_catalogs_fts_update AFTER UPDATE ON geo_catalogs
+       BEGIN
+           DELETE FROM geo_catalogs_fts WHERE rowid = old.id_geo_catalog;
+           INSERT INTO geo_catalogs_fts (rowid, title, description, hashtag, name, city, region)
+           SELECT new.id_geo_catalog, new.title, new.description, new.hashtag, c.name, c.city, c.region
+           FROM coordinates c WHERE c.id_coordinate = new.coordinate_id;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS geo_catalogs_fts_delete AFTER DELETE ON geo_catalogs
+       BEGIN
+           DELETE FROM geo_catalogs_fts WHERE rowid = old.id_geo_catalog;
+       END""",
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS coordinates_fts
+        USING fts5(name, city, region, {FTS_OPTIONS})""",
+    """CREATE TRIGGER IF NOT EXISTS coordinates_fts_insert AFTER INSERT ON coordinates
+       BEGIN
+           INSERT INTO coordinates_fts (rowid, name, city, region)
+           VALUES (new.id_coordinate, new.name, new.city, new.region);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS coordinates_fts_update AFTER UPDATE OF name, city, region ON coordinates
+       BEGIN
+           UPDATE coordinates_fts SET name = new.name, city = new.city, region = new.region
+           WHERE rowid = new.id_coordinate;
+           UPDATE geo_catalogs_fts SET name = new.name, city = new.city, region = new.region
+           WHERE rowid IN (SELECT id_geo_catalog FROM geo_catalogs WHERE coordinate_id = new.id_coordinate);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS coordinates_fts_delete AFTER DELETE ON coordinates
+       BEGIN
+           DELETE FROM coordinates_fts WHERE rowid = old.id_coordinate;
+       END""",
+    """INSERT INTO geo_catalogs_fts (rowid, title, description, hashtag, name, city, region)
+       SELECT g.id_geo_catalog, g.title, g.description, g.hashtag, c.name, c.city, c.region
+       FROM geo_catalogs g JOIN coordinates c ON c.id_coordinate = g.coordinate_id
+       WHERE g.id_geo_catalog NOT IN (SELECT rowid FROM geo_catalogs_fts)""",
+    """INSERT INTO coordinates_fts (rowid, name, city, region)
+       SELECT id_coordinate, name, city, region FROM coordinates
+       WHERE id_coordinate NOT IN (SELECT rowid FROM coordinates_fts)""",
+]
+
+
+def create_full_text_index(engine):
+    """ Cria (caso não existam) os índices de texto de catálogos e coordenadas.
+    """
+    with engine.begin() as connection:
+        for statement in SEARCH_DDL:
+            connection.execute(text(statement))
+
+
+def match_expression(q: str) -> str:
+    """ Converte o texto buscado em uma expressão FTS5: cada palavra vira um termo
+        entre aspas (sem operadores do usuário) buscado por prefixo, e todas
+        devem estar presentes.
+    """
+    terms = ['"%s"*' % term.replace('"', '""') for term in q.split()]
+    if not terms:
+        raise ValueError("busca vazia")
+    return " ".join(terms)
+
+
+def full_text_filter(query, fts_table: Table, id_column, q: Optional[str] = None):
+    """ Restringe a consulta às linhas que correspondem ao texto buscado em q.
+        A ordenação por relevância fica a cargo de quem consulta, utilizando
+        full_text_rank.
+    """
+    if not q:
+        return query
+    return query.join(fts_table, fts_table.c.rowid == id_column).filter(
+        literal_column(fts_table.name).op("MATCH")(match_expression(q)))
+
+
+def full_text_rank(fts_table: Table, q: Optional[str] = None):
+    """ Retorna a relevância (bm25; menor é mais relevante) de cada linha para a
+        busca em q. Sem busca, retorna None.
+    """
+    if not q:
+        return None
+    return fts_table.c.rank
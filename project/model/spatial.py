@@ -0,0 +1,209 @@
+from math import radians, degrees, sin, cos, tan, asin, sqrt, log, pi
+from typing import Optional, Tuple
+from sqlalchemy import Table, Column, Integer, Float, MetaData, text, func, and_, select
+import sqlite3
+
+from model.coordinate import Coordinate
+
+
+# raio médio da Terra, em metros
+EARTH_RADIUS_M = 6371008.8
+# maior distância entre dois pontos (com folga para os arredondamentos)
+MAX_DISTANCE_M = pi * EARTH_RADIUS_M + 1.0
+
+# busca pelos mais próximos sem raio: raio inicial, em metros, e fator de
+# crescimento do raio a cada tentativa (ver nearest_ids)
+NEAREST_START_RADIUS_M = 1000.0
+NEAREST_RADIUS_GROWTH = 4.0
+
+# O índice espacial é uma tabela virtual R*Tree do sqlite, por isso fica em um
+# metadata separado: o create_all não sabe criar tabelas virtuais.
+spatial_metadata = MetaData()
+
+coordinates_rtree = Table(
+    "coordinates_rtree", spatial_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("min_lat", Float),
+    Column("max_lat", Float),
+    Column("min_lon", Float),
+    Column("max_lon", Float))
+
+# DDL do índice espacial. Os triggers mantém o R*Tree sincronizado com a tabela
+# de coordenadas e o último comando preenche o índice para bases já existentes.
+SPATIAL_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS coordinates_rtree
+       USING rtree(id, min_lat, max_lat, min_lon, max_lon)""",
+    """CREATE TRIGGER IF NOT EXISTS coordinates_rtree_insert AFTER INSERT ON coordinates
+       WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL
+       BEGIN
+           INSERT INTO coordinates_rtree
+           VALUES (new.id_coordinate, new.latitude, new.latitude, new.longitude, new.longitude);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS coordinates_rtree_update AFTER UPDATE OF latitude, longitude ON coordinates
+       BEGIN
+           DELETE FROM coordinates_rtree WHERE id = old.id_coordinate;
+           INSERT INTO coordinates_rtree
+           SELECT new.id_coordinate, new.latitude, new.latitude, new.longitude, new.longitude
+           WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS coordinates_rtree_delete AFTER DELETE ON coordinates
+       BEGIN
+           DELETE FROM coordinates_rtree WHERE id = old.id_coordinate;
+       END""",
+    """INSERT INTO coordinates_rtree
+       SELECT id_coordinate, latitude, latitude, longitude, longitude FROM coordinates
+       WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+       AND id_coordinate NOT IN (SELECT id FROM coordinates_rtree)""",
+]
+
+
+def create_spatial_index(engine):
+    """ Cria (caso não exista) o índice espacial das coordenadas.
+    """
+    with engine.begin() as connection:
+        for statement in SPATIAL_DDL:
+            connection.execute(text(statement))
+
+
+def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> Optional[float]:
+    """ Retorna a distância, em metros, entre dois pontos da superfície terrestre.
+    """
+    if None in (lat1, lon1, lat2, lon2):
+        return None
+    lat1, lon1, lat2, lon2 = map(radians, (lat1, lon1, lat2, lon2))
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * asin(min(1.0, sqrt(a)))
+
+
+# funções matemáticas registradas quando o sqlite não as oferece
+MATH_FUNCTIONS = {
+    "ln": lambda x: None if x is None else log(x),
+    "tan": lambda x: None if x is None else tan(x),
+    "cos": lambda x: None if x is None else cos(x),
+    "radians": lambda x: None if x is None else radians(x),
+}
+
+
+def register_functions(dbapi_connection, connection_record):
+    """ Registra as funções geográficas na conexão sqlite, para que possam
+        ser utilizadas diretamente no SQL.
+    """
+    dbapi_connection.create_function("haversine", 4, haversine, deterministic=True)
+    # funções matemáticas usadas no cálculo dos tiles (model/tiles.py): nativas no
+    # sqlite 3.35+, quando compilado com elas, e registradas em Python caso contrário
+    try:
+        dbapi_connection.execute("SELECT ln(1), tan(0), cos(0), radians(0)")
+    except sqlite3.OperationalError:
+        for name, function in MATH_FUNCTIONS.items():
+            dbapi_connection.create_function(name, 1, function, deterministic=True)
+
+
+def parse_bbox(value: str) -> Tuple[float, float, float, float]:
+    """ Converte uma string 'min_lon,min_lat,max_lon,max_lat' em uma tupla.
+    """
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in value.split(","))
+    except ValueError:
+        raise ValueError("bbox deve estar no formato 'min_lon,min_lat,max_lon,max_lat'")
+    if min_lon > max_lon or min_lat > max_lat:
+        raise ValueError("bbox inválido: valores mínimos maiores que os máximos")
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def parse_point(value: str) -> Tuple[float, float]:
+    """ Converte uma string 'lat,lon' em uma tupla.
+    """
+    try:
+        lat, lon = (float(v) for v in value.split(","))
+    except ValueError:
+        raise ValueError("ponto deve estar no formato 'lat,lon'")
+    if not -90 <= lat <= 90 or not -180 <= lon <= 180:
+        raise ValueError("ponto fora dos limites de latitude/longitude")
+    return lat, lon
+
+
+def bbox_around(lat: float, lon: float, radius_m: float) -> Tuple[float, float, float, float]:
+    """ Retorna o bbox que envolve o círculo de raio radius_m em torno do ponto.
+    """
+    delta_lat = degrees(radius_m / EARTH_RADIUS_M)
+    min_lat, max_lat = max(-90.0, lat - delta_lat), min(90.0, lat + delta_lat)
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        # o círculo contém um dos polos: todas as longitudes são candidatas
+        return -180.0, min_lat, 180.0, max_lat
+    delta_lon = degrees(radius_m / (EARTH_RADIUS_M * cos(radians(lat))))
+    if delta_lon >= 180.0 or lon - delta_lon < -180.0 or lon + delta_lon > 180.0:
+        # o círculo atravessa o antimeridiano
+        return -180.0, min_lat, 180.0, max_lat
+    return lon - delta_lon, min_lat, lon + delta_lon, max_lat
+
+
+def spatial_distance(within: Optional[str] = None, near: Optional[str] = None):
+    """ Retorna a expressão SQL da distância (em metros) de cada coordenada ao
+        ponto de referência da busca: o ponto informado em near, ou o centro do
+        bbox em within. Sem filtro espacial, retorna None.
+    """
+    if near:
+        lat, lon = parse_point(near)
+    elif within:
+        min_lon, min_lat, max_lon, max_lat = parse_bbox(within)
+        lat, lon = (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
+    else:
+        return None
+    return func.haversine(Coordinate.latitude, Coordinate.longitude, lat, lon)
+
+
+def nearest_ids(session, ids, near: str, count: int, radius_m: Optional[float] = None):
+    """ Restringe a consulta dos ids (select(Coordinate.id), já com os demais filtros)
+        às count coordenadas mais próximas do ponto, para uso em um filtro IN.
+
+    Com radius_m, os ids já estão restritos ao raio (spatial_filter) e apenas
+    são ordenados. Sem raio, busca no R*Tree em raios crescentes até encontrar
+    count coordenadas (ou cobrir toda a superfície): as count mais próximas do
+    raio são as mais próximas de todas, e a distância só é calculada e ordenada
+    para os candidatos do último raio.
+    """
+    def nearest(candidates):
+        return candidates.order_by(spatial_distance(near=near), Coordinate.id).limit(count)
+
+    if radius_m is not None:
+        return nearest(ids)
+    radius = NEAREST_START_RADIUS_M
+    while True:
+        candidates = spatial_filter(ids, near=near, radius_m=radius)
+        if radius >= MAX_DISTANCE_M:
+            return nearest(candidates)
+        found = session.execute(select(func.count()).select_from(candidates.limit(count).subquery())).scalar()
+        if found >= count:
+            return nearest(candidates)
+        radius = min(radius * NEAREST_RADIUS_GROWTH, MAX_DISTANCE_M)
+
+
+def spatial_filter(query, within: Optional[str] = None, near: Optional[str] = None,
+                   radius_m: Optional[float] = None):
+    """ Aplica a uma consulta sobre Coordinate os filtros espaciais informados.
+
+    O R*Tree restringe os candidatos ao bbox e a verificação exata é feita nas
+    colunas da coordenada. A ordenação por distância fica a cargo de quem consulta,
+    utilizando spatial_distance.
+    """
+    if near and radius_m is None:
+        # sem raio (busca pelos mais próximos): apenas a ordenação pela distância
+        return query
+    if near:
+        lat, lon = parse_point(near)
+        min_lon, min_lat, max_lon, max_lat = bbox_around(lat, lon, radius_m)
+    elif within:
+        min_lon, min_lat, max_lon, max_lat = parse_bbox(within)
+    else:
+        return query
+
+    # o R*Tree guarda as coordenadas em precisão simples (arredondadas para fora),
+    # então serve como pré-filtro e a comparação exata é refeita nas colunas.
+    query = query.join(coordinates_rtree, coordinates_rtree.c.id == Coordinate.id).filter(
+        and_(coordinates_rtree.c.max_lat >= min_lat, coordinates_rtree.c.min_lat <= max_lat,
+             coordinates_rtree.c.max_lon >= min_lon, coordinates_rtree.c.min_lon <= max_lon),
+        Coordinate.latitude.between(min_lat, max_lat),
+        Coordinate.longitude.between(min_lon, max_lon))
+    if near:
+        query = query.filter(spatial_distance(near=near) <= radius_m)
+    return query
@@ -0,0 +1,105 @@
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+
+
+# Contadores mantidos pelos triggers, na mesma transação das escritas:
+# coordinates.catalog_count (catálogos de cada coordenada), hashtag_stats
+# (catálogos por hashtag) e region_stats (coordenadas e catálogos por região).
+# Hashtags e regiões são contadas pelos ids dos dicionários (model/dictionary.py),
+# de modo que "#Safra" e "#safra" somam juntas. Os triggers só somam e subtraem;
+# linhas zeradas são mantidas e ignoradas na leitura.
+STATS_DDL = [
+    """CREATE TABLE IF NOT EXISTS hashtag_stats (
+           hashtag_id INTEGER PRIMARY KEY REFERENCES hashtags(id),
+           catalogs INTEGER NOT NULL DEFAULT 0
+       )""",
+    """CREATE TABLE IF NOT EXISTS region_stats (
+           region_id INTEGER PRIMARY KEY REFERENCES regions(id),
+           coordinates INTEGER NOT NULL DEFAULT 0,
+           catalogs INTEGER NOT NULL DEFAULT 0
+       )""",
+    # bases já existentes: os contadores são calculados uma única vez
+    """INSERT INTO hashtag_stats (hashtag_id, catalogs)
+       SELECT hashtag_id, count(*) FROM geo_catalogs WHERE hashtag_id IS NOT NULL
+       AND NOT EXISTS (SELECT 1 FROM hashtag_stats) GROUP BY hashtag_id""",
+    """INSERT INTO region_stats (region_id, coordinates, catalogs)
+       SELECT region_id, count(*), sum(catalog_count) FROM coordinates WHERE region_id IS NOT NULL
+       AND NOT EXISTS (SELECT 1 FROM region_stats) GROUP BY region_id""",
+
+    """CREATE TRIGGER IF NOT EXISTS stats_coordinate_insert AFTER INSERT ON coordinates
+       WHEN new.region_id IS NOT NULL
+       BEGIN
+           INSERT INTO region_stats (region_id, coordinates, catalogs) VALUES (new.region_id, 1, new.catalog_count)
+           ON CONFLICT (region_id) DO UPDATE SET coordinates = coordinates + 1,
+                                                 catalogs = catalogs + excluded.catalogs;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS stats_coordinate_update AFTER UPDATE OF region_id ON coordinates
+       WHEN old.region_id IS NOT new.region_id
+       BEGIN
+           UPDATE region_stats SET coordinates = coordinates - 1, catalogs = catalogs - old.catalog_count
+           WHERE region_id = old.region_id;
+           INSERT INTO region_stats (region_id, coordinates, catalogs)
+           SELECT new.region_id, 1, new.catalog_count WHERE new.region_id IS NOT NULL
+           ON CONFLICT (region_id) DO UPDATE SET coordinates = coordinates + 1,
+                                                 catalogs = catalogs + excluded.catalogs;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS stats_coordinate_delete AFTER DELETE ON coordinates
+       WHEN old.region_id IS NOT NULL
+       BEGIN
+           UPDATE region_stats SET coordinates = coordinates - 1, catalogs = catalogs - old.catalog_count
+           WHERE region_id = old.region_id;
+       END""",
+
+    """CREATE TRIGGER IF NOT EXISTS stats_catalog_insert AFTER INSERT ON geo_catalogs
+       BEGIN
+           UPDATE coordinates SET catalog_count = catalog_count + 1 WHERE id_coordinate = new.coordinate_id;
+           UPDATE region_stats SET catalogs = catalogs + 1
+           WHERE region_id = (SELECT region_id FROM coordinates WHERE id_coordinate = new.coordinate_id);
+           INSERT INTO hashtag_stats (hashtag_id, catalogs) SELECT new.hashtag_id, 1 WHERE new.hashtag_id IS NOT NULL
+           ON CONFLICT (hashtag_id) DO UPDATE SET catalogs = catalogs + 1;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS stats_catalog_update AFTER UPDATE OF hashtag_id, coordinate_id ON geo_catalogs
+       BEGIN
+           UPDATE coordinates SET catalog_count = catalog_count - 1 WHERE id_coordinate = old.coordinate_id;
+           UPDATE region_stats SET catalogs = catalogs - 1
+           WHERE region_id = (SELECT region_id FROM coordinates WHERE id_coordinate = old.coordinate_id);
+           UPDATE hashtag_stats SET catalogs = catalogs - 1 WHERE hashtag_id = old.hashtag_id;
+           UPDATE coordinates SET catalog_count = catalog_count + 1 WHERE id_coordinate = new.coordinate_id;
+           UPDATE region_stats SET catalogs = catalogs + 1
+           WHERE region_id = (SELECT region_id FROM coordinates WHERE id_coordinate = new.coordinate_id);
+           INSERT INTO hashtag_stats (hashtag_id, catalogs) SELECT new.hashtag_id, 1 WHERE new.hashtag_id IS NOT NULL
+           ON CONFLICT (hashtag_id) DO UPDATE SET catalogs = catalogs + 1;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS stats_catalog_delete AFTER DELETE ON geo_catalogs
+       BEGIN
+           UPDATE coordinates SET catalog_count = catalog_count - 1 WHERE id_coordinate = old.coordinate_id;
+           UPDATE region_stats SET catalogs = catalogs - 1
+           WHERE region_id = (SELECT region_id FROM coordinates WHERE id_coordinate = old.coordinate_id);
+           UPDATE hashtag_stats SET catalogs = catalogs - 1 WHERE hashtag_id = old.hashtag_id;
+       END""",
+]
+
+
+def create_stats(engine):
+    """ Cria (caso não existam) as tabelas de estatísticas e os seus triggers.
+    """
+    with engine.begin() as connection:
+        for statement in STATS_DDL:
+            connection.execute(text(statement))
+
+
+def hashtag_stats(session, top: Optional[int] = None) -> List[Tuple[str, int]]:
+    """ Retorna (hashtag, catálogos), das hashtags mais frequentes para as menos.
+    """
+    return [tuple(row) for row in session.execute(text(
+        "SELECT hashtags.name, catalogs FROM hashtag_stats JOIN hashtags ON hashtags.id = hashtag_id "
+        "WHERE catalogs > 0 ORDER BY catalogs DESC, hashtags.key LIMIT :top"), {"top": -1 if top is None else top})]
+
+
+def region_stats(session, top: Optional[int] = None) -> List[Tuple[str, int, int]]:
+    """ Retorna (região, coordenadas, catálogos), das regiões com mais coordenadas
+        para as com menos.
+    """
+    return [tuple(row) for row in session.execute(text(
+        "SELECT regions.name, coordinates, catalogs FROM region_stats JOIN regions ON regions.id = region_id "
+        "WHERE coordinates > 0 ORDER BY coordinates DESC, regions.key LIMIT :top"), {"top": -1 if top is None else top})]
@@ -0,0 +1,98 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Dict, Optional
+
+from config import Config
+from images import Image, encoder_format, make_derivative
+from logger import logger
+from metrics import registry, Counter, Gauge, Histogram
+from model.blob_store import BlobStore, blob_store
+
+
+# tamanhos das imagens derivadas (?size=): nome -> maior lado, em pixels
+DERIVATIVE_SIZES = {
+    "thumb": Config.THUMB_SIZE,
+    "medium": Config.MEDIUM_SIZE,
+}
+
+thumbnail_duration = registry.register(Histogram(
+    "geovisio_thumbnail_duration_seconds",
+    "Tempo de geração das imagens derivadas (decodificação, redução e codificação).", ("size",)))
+thumbnails_total = registry.register(Counter(
+    "geovisio_thumbnails_total", "Imagens derivadas processadas.", ("size", "status")))
+
+
+class ThumbnailPipeline:
+    """ Gera as imagens derivadas (miniaturas) em um pool de processos, fora do
+        caminho das requisições: o envio da imagem apenas enfileira o trabalho.
+
+    As derivadas são gravadas no blob store, ao lado da imagem original (ver
+    BlobStore.derivative_path): como a original, são compartilhadas por envios
+    idênticos. Enquanto uma derivada não existe, ?size= retorna a original.
+    Sem o Pillow, nada é gerado.
+    """
+
+    def __init__(self, store: BlobStore, sizes: Dict[str, int], workers: int, format: str, quality: int):
+        self.store = store
+        self.sizes = sizes
+        self.workers = workers
+        self.format = encoder_format(format) if Image is not None else None
+        self.quality = quality
+        self.available = Image is not None
+        # (hash, tamanho) enfileirados ou em processamento
+        self.pending = set()
+        # hashes de conteúdos que não puderam ser decodificados como imagem
+        self.failed = set()
+        self.executor = None
+        self.lock = threading.Lock()
+        registry.register(Gauge("geovisio_thumbnail_queue_depth",
+                                "Imagens derivadas aguardando ou em processamento.", lambda: len(self.pending)))
+
+    def submit(self, digest: Optional[str]):
+        """ Enfileira a geração das derivadas que ainda não existem para a imagem.
+        """
+        if not self.available or digest is None or digest in self.failed:
+            return
+        futures = []
+        with self.lock:
+            for size, max_size in self.sizes.items():
+                key = (digest, size)
+                if key in self.pending or self.store.exists(digest, size):
+                    continue
+                # o pool é criado na primeira imagem (cada worker do servidor tem o seu)
+                if self.executor is None:
+                    self.executor = ProcessPoolExecutor(max_workers=self.workers)
+                try:
+                    future = self.executor.submit(make_derivative, self.store.path(digest),
+                                                  self.store.derivative_path(digest, size),
+                                                  max_size, self.format, self.quality)
+                except BrokenProcessPool:
+                    # um processo do pool morreu: o pool é recriado na próxima imagem
+                    logger.warning("Pool de miniaturas interrompido; será recriado")
+                    self.executor = None
+                    break
+                self.pending.add(key)
+                futures.append((size, future))
+        # fora do lock: um trabalho já concluído chama done imediatamente
+        for size, future in futures:
+            future.add_done_callback(partial(self.done, digest, size))
+
+    def done(self, digest: str, size: str, future):
+        with self.lock:
+            self.pending.discard((digest, size))
+        error = future.exception()
+        if error is None:
+            thumbnail_duration.observe((size,), future.result())
+            thumbnails_total.inc((size, "ok"))
+            return
+        thumbnails_total.inc((size, "error"))
+        # a imagem removida antes do processamento pode ser enviada de novo
+        if not isinstance(error, (FileNotFoundError, BrokenProcessPool)):
+            self.failed.add(digest)
+        logger.warning(f"Erro ao gerar a imagem derivada {size} de {digest}: {error}")
+
+
+thumbnails = ThumbnailPipeline(blob_store, DERIVATIVE_SIZES, workers=Config.THUMBNAIL_WORKERS,
+                               format=Config.THUMBNAIL_FORMAT, quality=Config.THUMBNAIL_QUALITY)
@@ -0,0 +1,96 @@
+from math import radians, degrees, log, tan, cos, atan, sinh, pi
+from typing import Iterator, Tuple
+from sqlalchemy import Float, Integer, cast, func, type_coerce, and_
+
+from model.coordinate import Coordinate
+from model.spatial import coordinates_rtree
+
+
+# latitude máxima da projeção Web Mercator (os tiles são quadrados)
+MAX_LATITUDE = 85.0511287798
+MAX_ZOOM = 22
+
+
+def clamp_latitude(lat: float) -> float:
+    return max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+
+
+def tile_of(lat: float, lon: float, zoom: int) -> Tuple[int, int]:
+    """ Retorna o tile (x, y), no esquema XYZ (Web Mercator), que contém o ponto.
+
+    A conta é a mesma de tile_columns, para que a base e o Python concordem sobre
+    o tile de cada coordenada.
+    """
+    n = 2 ** zoom
+    lat = radians(clamp_latitude(lat))
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - log(tan(lat) + 1.0 / cos(lat)) / pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bounds(zoom: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """ Retorna o bbox (min_lon, min_lat, max_lon, max_lat) do tile.
+    """
+    n = 2 ** zoom
+
+    def latitude(row):
+        return degrees(atan(sinh(pi * (1 - 2 * row / n))))
+
+    return x / n * 360.0 - 180.0, latitude(y + 1), (x + 1) / n * 360.0 - 180.0, latitude(y)
+
+
+def tile_extent(zoom: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """ Retorna o bbox das coordenadas que pertencem ao tile: o de tile_bounds,
+        estendido até os polos na primeira e na última linha, que recebem as
+        coordenadas além de ±MAX_LATITUDE (ver tile_columns).
+    """
+    min_lon, min_lat, max_lon, max_lat = tile_bounds(zoom, x, y)
+    if y == 0:
+        max_lat = 90.0
+    if y == 2 ** zoom - 1:
+        min_lat = -90.0
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def tiles_covering(bbox: Tuple[float, float, float, float], zoom: int) -> Iterator[Tuple[int, int]]:
+    """ Percorre os tiles (x, y) do zoom que cobrem o bbox.
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    min_x, min_y = tile_of(max_lat, min_lon, zoom)
+    max_x, max_y = tile_of(min_lat, max_lon, zoom)
+    for x in range(min_x, max_x + 1):
+        for y in range(min_y, max_y + 1):
+            yield x, y
+
+
+def tile_count(bbox: Tuple[float, float, float, float], zoom: int) -> int:
+    min_lon, min_lat, max_lon, max_lat = bbox
+    min_x, min_y = tile_of(max_lat, min_lon, zoom)
+    max_x, max_y = tile_of(min_lat, max_lon, zoom)
+    return (max_x - min_x + 1) * (max_y - min_y + 1)
+
+
+def tile_columns(zoom: int):
+    """ Retorna as expressões SQL do tile (x, y) de cada coordenada no zoom.
+    """
+    n = 2 ** zoom
+    lat = func.radians(func.max(-MAX_LATITUDE, func.min(MAX_LATITUDE,
+                                                        type_coerce(Coordinate.latitude, Float()))))
+    lon = type_coerce(Coordinate.longitude, Float())
+    x = cast((lon + 180.0) / 360.0 * n, Integer)
+    y = cast((1.0 - func.ln(func.tan(lat) + 1.0 / func.cos(lat)) / pi) / 2.0 * n, Integer)
+    return func.min(func.max(x, 0), n - 1), func.min(func.max(y, 0), n - 1)
+
+
+def in_tile(query, zoom: int, x: int, y: int):
+    """ Restringe a consulta (sobre Coordinate) às coordenadas do tile.
+
+    O R*Tree pré-filtra pelo bbox do tile (ver tile_extent) e a conta do tile
+    garante que uma coordenada na borda pertença a um único tile.
+    """
+    min_lon, min_lat, max_lon, max_lat = tile_extent(zoom, x, y)
+    tile_x, tile_y = tile_columns(zoom)
+    return query.join(coordinates_rtree, coordinates_rtree.c.id == Coordinate.id).where(
+        and_(coordinates_rtree.c.max_lat >= min_lat, coordinates_rtree.c.min_lat <= max_lat,
+             coordinates_rtree.c.max_lon >= min_lon, coordinates_rtree.c.min_lon <= max_lon),
+        tile_x == x, tile_y == y)
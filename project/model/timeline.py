@@ -0,0 +1,36 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import String, func, select, type_coerce
+
+
+# intervalos do histograma: caracteres do início da data guardada pelo sqlite
+# ('2024-01-01 13:45:00.000000') que identificam o intervalo e o complemento
+# que forma a data de início do intervalo
+BUCKETS = {
+    "hour": (13, ":00:00"),
+    "day": (10, " 00:00:00"),
+}
+
+
+def time_window_filter(query, column, since: Optional[datetime] = None, until: Optional[datetime] = None):
+    """ Filtra a consulta pelo intervalo [since, until) da coluna de data (indexada).
+    """
+    if since:
+        query = query.filter(column >= since)
+    if until:
+        query = query.filter(column < until)
+    return query
+
+
+def timeline(session, column, bucket: str, since: Optional[datetime] = None,
+             until: Optional[datetime] = None, where=()) -> List[Tuple[str, int]]:
+    """ Retorna (início do intervalo, quantidade) das linhas criadas em cada hora ou
+        dia, em ordem. A contagem é feita pelo sqlite, percorrendo apenas o trecho
+        [since, until) do índice da coluna (ver time_window_filter).
+    """
+    length, suffix = BUCKETS[bucket]
+    # o texto guardado, sem a conversão para datetime
+    start = func.substr(type_coerce(column, String()), 1, length)
+    statement = select(start, func.count()).where(column.is_not(None), *where)
+    statement = time_window_filter(statement, column, since, until).group_by(start).order_by(start)
+    return [(value + suffix, count) for value, count in session.execute(statement)]
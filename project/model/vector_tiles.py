@@ -0,0 +1,157 @@
+from collections import Counter, defaultdict
+from math import log, tan, cos, radians, pi
+from typing import List
+from struct import pack
+from sqlalchemy import Float, func, select, type_coerce
+
+from model.coordinate import Coordinate
+from model.dictionary import Hashtag
+from model.geo_catalog import GeoCatalog
+from model.tiles import clamp_latitude, in_tile
+
+
+# resolução das coordenadas dentro de um tile MVT
+TILE_EXTENT = 4096
+# nome da camada dos tiles MVT
+TILE_LAYER = "coordinates"
+# hashtags mais frequentes informadas por coordenada
+TOP_HASHTAGS = 3
+
+MVT_MIMETYPE = "application/vnd.mapbox-vector-tile"
+GEOJSON_MIMETYPE = "application/geo+json"
+
+
+def tile_features(session, zoom: int, x: int, y: int, limit: int) -> List[dict]:
+    """ Retorna as coordenadas do tile (até limit), com o resumo dos seus catálogos:
+        quantidade e hashtags mais frequentes (agrupadas pelo dicionário, com o
+        texto cadastrado no dicionário).
+    """
+    coordinates = in_tile(select(
+        Coordinate.id, type_coerce(Coordinate.latitude, Float()),
+        type_coerce(Coordinate.longitude, Float()), Coordinate.name, Coordinate.city,
+        Coordinate.region, Coordinate.country).select_from(Coordinate), zoom, x, y)
+    coordinates = coordinates.order_by(Coordinate.id).limit(limit)
+
+    features = []
+    for id, latitude, longitude, name, city, region, country in session.execute(coordinates):
+        features.append({"id": id, "latitude": latitude, "longitude": longitude,
+                         "properties": {"id": id, "name": name, "city": city, "region": region,
+                                        "country": country, "catalogs": 0, "hashtags": []}})
+    if not features:
+        return features
+
+    hashtags = defaultdict(Counter)
+    catalogs = select(GeoCatalog.coordinate_id, Hashtag.name, func.count()).select_from(GeoCatalog).outerjoin(
+        Hashtag, GeoCatalog.hashtag_id == Hashtag.id).where(
+        GeoCatalog.coordinate_id.in_([feature["id"] for feature in features])).group_by(
+        GeoCatalog.coordinate_id, GeoCatalog.hashtag_id, Hashtag.name)
+    for coordinate_id, hashtag, count in session.execute(catalogs):
+        hashtags[coordinate_id][hashtag] += count
+    for feature in features:
+        counts = hashtags.get(feature["id"])
+        if counts:
+            feature["properties"]["catalogs"] = sum(counts.values())
+            feature["properties"]["hashtags"] = [hashtag for hashtag, _ in counts.most_common()
+                                                 if hashtag is not None][:TOP_HASHTAGS]
+    return features
+
+
+def encode_geojson(features: List[dict]) -> dict:
+    """ Retorna as coordenadas do tile como uma FeatureCollection GeoJSON.
+    """
+    return {
+        "type": "FeatureCollection",
+        "features": [{"type": "Feature", "id": feature["id"],
+                      "geometry": {"type": "Point",
+                                   "coordinates": [feature["longitude"], feature["latitude"]]},
+                      "properties": feature["properties"]} for feature in features],
+    }
+
+
+# Codificação Protocol Buffers do Mapbox Vector Tile (especificação 2.1), apenas
+# com o necessário para uma camada de pontos.
+
+def varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def field(number: int, wire_type: int) -> bytes:
+    return varint((number << 3) | wire_type)
+
+
+def length_delimited(number: int, payload: bytes) -> bytes:
+    return field(number, 2) + varint(len(payload)) + payload
+
+
+def encode_value(value) -> bytes:
+    """ Codifica um valor de atributo (mensagem Tile.Value).
+    """
+    if isinstance(value, bool):
+        return field(7, 0) + varint(int(value))
+    if isinstance(value, int):
+        if value >= 0:
+            return field(5, 0) + varint(value)
+        return field(6, 0) + varint(zigzag(value))
+    if isinstance(value, float):
+        return field(3, 1) + pack("<d", value)
+    return length_delimited(1, str(value).encode("utf-8"))
+
+
+def tile_position(latitude: float, longitude: float, zoom: int, x: int, y: int):
+    """ Retorna a posição do ponto dentro do tile, em unidades de TILE_EXTENT.
+    """
+    n = 2 ** zoom
+    lat = radians(clamp_latitude(latitude))
+    px = ((longitude + 180.0) / 360.0 * n - x) * TILE_EXTENT
+    py = ((1.0 - log(tan(lat) + 1.0 / cos(lat)) / pi) / 2.0 * n - y) * TILE_EXTENT
+    return int(round(px)), int(round(py))
+
+
+def encode_mvt(features: List[dict], zoom: int, x: int, y: int) -> bytes:
+    """ Retorna as coordenadas do tile codificadas como Mapbox Vector Tile, em
+        uma camada de pontos. As hashtags são unidas por vírgula, já que os
+        atributos MVT não aceitam listas.
+    """
+    if not features:
+        return b""
+    keys, values = {}, {}
+    encoded = []
+    for feature in features:
+        tags = []
+        for key, value in feature["properties"].items():
+            if isinstance(value, list):
+                value = ",".join(value)
+            if value is None:
+                continue
+            tags.append(keys.setdefault(key, len(keys)))
+            tags.append(values.setdefault((type(value), value), len(values)))
+        px, py = tile_position(feature["latitude"], feature["longitude"], zoom, x, y)
+        # MoveTo com um único ponto, relativo à origem do tile
+        geometry = varint(9) + varint(zigzag(px)) + varint(zigzag(py))
+        encoded.append(length_delimited(2, b"".join((
+            field(1, 0) + varint(feature["id"]),
+            length_delimited(2, b"".join(varint(tag) for tag in tags)),
+            field(3, 0) + varint(1),
+            length_delimited(4, geometry)))))
+
+    layer = b"".join([
+        field(15, 0) + varint(2),
+        length_delimited(1, TILE_LAYER.encode("utf-8")),
+        *encoded,
+        *(length_delimited(3, key.encode("utf-8")) for key in keys),
+        *(length_delimited(4, encode_value(value)) for _, value in values),
+        field(5, 0) + varint(TILE_EXTENT),
+    ])
+    return length_delimited(3, layer)
@@ -0,0 +1,146 @@
+from queue import Queue, Empty
+from typing import Callable, List
+from sqlalchemy.orm import sessionmaker
+import os
+import threading
+import time
+
+from config import Config
+from logger import logger
+from metrics import attributed_to, current_stats
+
+
+class PendingWrite:
+    """ Uma operação de escrita aguardando o escritor, e seu resultado. stats são
+        as estatísticas da requisição que enviou a operação (ver metrics.py).
+    """
+
+    def __init__(self, operation: Callable, stats=None):
+        self.operation = operation
+        self.stats = stats
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def finish(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.done.set()
+
+
+class WriteCoordinator:
+    """ Escritor único da base, com commit em grupo.
+
+    O sqlite aceita um escritor por vez: em vez de cada requisição abrir sua
+    própria transação e disputar o lock, as operações de escrita são enfileiradas
+    e executadas por uma única thread. Ela reúne as operações que chegam em até
+    max_delay segundos (ou até max_batch operações) e as confirma em uma única
+    transação. Cada operação roda em um SAVEPOINT: se falhar, apenas ela é
+    desfeita e quem a enviou recebe o erro (ex.: IntegrityError).
+    """
+
+    def __init__(self, session_factory: sessionmaker, max_batch: int, max_delay: float):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.queue = Queue()
+        self.thread = None
+        self.pid = None
+        self.lock = threading.Lock()
+        # funções chamadas com a sessão antes de cada commit, na mesma transação,
+        # e sem argumentos após cada commit (ex.: invalidação de caches)
+        self.before_commit_hooks: List[Callable] = []
+        self.after_commit_hooks: List[Callable] = []
+
+    def submit(self, operation: Callable):
+        """ Executa operation(session) no escritor e retorna seu resultado, ou
+            levanta a exceção da operação (ou do commit).
+
+        O resultado deve ser calculado dentro da operação (ex.: a representação
+        do objeto gravado), pois a sessão do escritor não pertence a quem chama.
+        Os comandos SQL da operação, e os do commit do seu lote, são contabilizados
+        nas estatísticas da requisição que a envia.
+        """
+        if threading.current_thread() is self.thread:
+            # chamada de dentro de uma operação: o escritor esperaria por si mesmo
+            raise RuntimeError("operação de escrita aninhada")
+        self.start()
+        pending = PendingWrite(operation, current_stats())
+        self.queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def start(self):
+        """ Inicia a thread do escritor, caso ainda não esteja rodando neste processo
+            (após um fork, a thread do processo pai não existe no filho).
+        """
+        if self.thread is not None and self.pid == os.getpid() and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is None or self.pid != os.getpid() or not self.thread.is_alive():
+                self.pid = os.getpid()
+                self.queue = Queue()
+                self.thread = threading.Thread(target=self.run, name="geovisio-writer", daemon=True)
+                self.thread.start()
+
+    def collect(self) -> List[PendingWrite]:
+        """ Aguarda a primeira operação e reúne as que chegarem em seguida.
+        """
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def run(self):
+        while True:
+            batch = self.collect()
+            try:
+                self.write(batch)
+            except Exception as e:
+                logger.warning(f"Erro no escritor: {e}")
+                for pending in batch:
+                    if not pending.done.is_set():
+                        pending.finish(error=e)
+
+    def write(self, batch: List[PendingWrite]):
+        """ Executa as operações do lote em uma única transação.
+        """
+        session = self.session_factory()
+        results = []
+        try:
+            for pending in batch:
+                try:
+                    with attributed_to([pending.stats]), session.begin_nested():
+                        results.append((pending, pending.operation(session), None))
+                except Exception as e:
+                    results.append((pending, None, e))
+            # os hooks e o commit são de todo o lote: contam em cada requisição
+            with attributed_to([pending.stats for pending in batch]):
+                for hook in self.before_commit_hooks:
+                    hook(session)
+                session.commit()
+        except Exception as e:
+            session.rollback()
+            for pending, _, _ in results:
+                pending.finish(error=e)
+            return
+        finally:
+            session.close()
+
+        logger.debug(f"Escritor: {len(batch)} operações confirmadas em uma transação")
+        for hook in self.after_commit_hooks:
+            try:
+                hook()
+            except Exception as e:
+                logger.warning(f"Erro após o commit do escritor: {e}")
+        for pending, result, error in results:
+            pending.finish(result, error)
@@ -0,0 +1,139 @@
+from hashlib import sha256
+from typing import Optional
+import json
+import os
+import sys
+import tempfile
+
+import pydantic
+from flask_openapi3 import OpenAPI, APIBlueprint
+from flask_openapi3.__version__ import __version__ as flask_openapi3_version
+from flask_openapi3.utils import get_operation_id_for_path, parse_parameters
+
+from logger import logger
+
+
+# diretório do projeto: os módulos daqui definem as rotas e os schemas da especificação
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+class LazyAPIBlueprint(APIBlueprint):
+    """ APIBlueprint que adia a documentação das rotas (schemas JSON dos parâmetros e
+        respostas) até a especificação ser pedida (ver LazyOpenAPI).
+
+    Na definição de cada rota, apenas os tipos dos parâmetros são lidos, o que basta
+    para validar as requisições. Depende de métodos internos do flask-openapi3
+    (_collect_openapi_info e flask_openapi3.utils): a versão é fixada em
+    requirements.txt e deve ser revista a cada atualização.
+    """
+
+    def __init__(self, *args, **kwargs):
+        # operationId sem o nome do blueprint, como nas rotas registradas na aplicação
+        kwargs.setdefault("operation_id_callback", operation_id)
+        super().__init__(*args, **kwargs)
+        self.deferred = []
+
+    def _collect_openapi_info(self, rule, func, **kwargs):
+        if kwargs.get("doc_ui", True):
+            self.deferred.append((rule, func, kwargs))
+        return parse_parameters(func, doc_ui=False)
+
+    def collect(self):
+        """ Documenta as rotas adiadas.
+        """
+        for rule, func, kwargs in self.deferred:
+            super()._collect_openapi_info(rule, func, **kwargs)
+        self.deferred = []
+
+
+class LazyOpenAPI(OpenAPI):
+    """ OpenAPI cuja especificação é montada apenas no primeiro pedido (/openapi ou
+        flask openapi) e gravada em spec_path.
+
+    A especificação gravada é reutilizada pelos demais processos e reinícios enquanto
+    o código das rotas e schemas (e as versões do flask-openapi3 e do pydantic) não
+    mudar: o arquivo guarda a impressão digital desse código.
+    """
+
+    def __init__(self, *args, spec_path: Optional[str] = None, **kwargs):
+        self.spec_path = spec_path
+        self.lazy_apis = []
+        super().__init__(*args, **kwargs)
+
+    def register_api(self, api: APIBlueprint, **options):
+        super().register_api(api, **options)
+        if isinstance(api, LazyAPIBlueprint):
+            self.lazy_apis.append(api)
+
+    @property
+    def api_doc(self) -> dict:
+        if not self.spec_json:
+            fingerprint = source_fingerprint()
+            self.spec_json = self.load_spec(fingerprint) or self.build_spec(fingerprint)
+        return self.spec_json
+
+    def build_spec(self, fingerprint: str) -> dict:
+        """ Documenta as rotas adiadas, monta a especificação e a grava em spec_path.
+        """
+        for api in self.lazy_apis:
+            api.collect()
+            for tag in api.tags:
+                if tag.name not in self.tag_names:
+                    self.tags.append(tag)
+                    self.tag_names.append(tag.name)
+            self.paths.update(**api.paths)
+            self.components_schemas.update(**api.components_schemas)
+        self.generate_spec_json()
+        if self.spec_path:
+            try:
+                write_json(self.spec_path, {"fingerprint": fingerprint, "spec": self.spec_json})
+            except OSError as e:
+                logger.warning(f"Erro ao gravar a especificação OpenAPI em {self.spec_path}: {e}")
+        return self.spec_json
+
+    def load_spec(self, fingerprint: str) -> Optional[dict]:
+        """ Lê a especificação gravada em spec_path, se gerada pelo mesmo código.
+        """
+        if not self.spec_path:
+            return None
+        try:
+            with open(self.spec_path, encoding="utf-8") as spec_file:
+                cached = json.load(spec_file)
+        except (OSError, ValueError):
+            return None
+        return cached.get("spec") if cached.get("fingerprint") == fingerprint else None
+
+
+def operation_id(name: str, path: str, method: str) -> str:
+    return get_operation_id_for_path(name=name, path=path, method=method)
+
+
+def source_fingerprint() -> str:
+    """ Hash dos arquivos dos módulos do projeto carregados e das versões das
+        bibliotecas que geram a especificação.
+    """
+    digest = sha256(("%s %s" % (flask_openapi3_version, pydantic.VERSION)).encode())
+    paths = sorted({os.path.abspath(module.__file__) for module in list(sys.modules.values())
+                    if getattr(module, "__file__", None)})
+    for path in paths:
+        if path.startswith(PROJECT_ROOT + os.sep) and path.endswith(".py"):
+            digest.update(path[len(PROJECT_ROOT):].encode())
+            with open(path, "rb") as source:
+                digest.update(source.read())
+    return digest.hexdigest()
+
+
+def write_json(path: str, data: dict):
+    """ Grava o JSON em um arquivo temporário e o renomeia, para que um leitor
+        concorrente (outro worker) nunca veja um arquivo incompleto.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as tmp_file:
+            json.dump(data, tmp_file, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
@@ -1,7 +1,18 @@
 from schemas.geo_catalog import GeoCatalogSchema, SearchGeoCatalogSchema, GeoCatalogViewSchema, \
-                                ViewGeoCatalogsSchema, DeleteGeoCatalogSchema, ViewHashtagsSchema, show_geo_catalog, \
-                                show_geo_catalogs
-from schemas.coordinate import CoordinateSchema, CoordinateViewSchema, SearchCoordinateSchema, \
+                                ViewGeoCatalogsSchema, DeleteGeoCatalogSchema, DeleteGeoCatalogsQuerySchema, \
+                                DeleteGeoCatalogsReportSchema, GeoCatalogPathSchema, GeoCatalogImageQuerySchema, ViewHashtagsSchema, show_geo_catalog, \
+                                show_geo_catalogs, geo_catalog_serializer, \
+                                geo_catalog_columns, GeoCatalogListItemSchema
+from schemas.coordinate import CoordinateSchema, CoordinateUpsertSchema, CoordinateViewSchema, SearchCoordinateSchema, \
                                ViewCoordinatesSchema, CoordinateDelSchema, view_coordinate, \
-                               view_coordinates
+                               view_coordinates, coordinate_serializer, \
+                               coordinate_columns, CoordinateListItemSchema
 from schemas.error import ErrorSchema
+from schemas.bulk import BulkQuerySchema, BulkReportSchema, BulkRowReportSchema, \
+                         CoordinateRowSchema, GeoCatalogRowSchema
+from schemas.cluster import ClusterQuerySchema, ClusterSchema, ViewClustersSchema
+from schemas.tile import TilePathSchema
+from schemas.change import ChangesQuerySchema, ChangeSchema, ViewChangesSchema, ExpiredChangesSchema
+from schemas.export import ExportQuerySchema
+from schemas.stats import StatsQuerySchema, HashtagCountSchema, RegionCountSchema, ViewRegionsSchema, \
+                          TimelineQuerySchema, TimelineBucketSchema, ViewTimelineSchema
@@ -0,0 +1,213 @@
+from pydantic import BaseModel, Field, field_validator, Base64UrlBytes
+from typing import Optional, List, Iterator, Tuple, Union
+from json import JSONDecoder, JSONDecodeError, loads
+import csv
+import io
+
+
+CSV_MIMETYPE = "text/csv"
+NDJSON_MIMETYPE = "application/x-ndjson"
+GEOJSON_MIMETYPES = ("application/geo+json", "application/json")
+BULK_MIMETYPES = (CSV_MIMETYPE, NDJSON_MIMETYPE) + GEOJSON_MIMETYPES
+
+# bytes lidos do corpo da requisição por vez
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class BulkQuerySchema(BaseModel):
+    """ Define os parâmetros de uma carga em lote: quantidade de linhas
+        gravadas por transação e, com upsert, atualização das coordenadas já
+        cadastradas na mesma posição (ou criação das coordenadas dos catálogos).
+    """
+    chunk_size: int = Field(1000, ge=1, le=50000)
+    upsert: bool = False
+
+
+class CoordinateRowSchema(BaseModel):
+    """ Define uma coordenada de uma carga em lote. Diferente de CoordinateSchema,
+        não há valores de exemplo: apenas latitude e longitude são obrigatórias.
+    """
+    latitude: float = Field(ge=-90, le=90)
+    longitude: float = Field(ge=-180, le=180)
+    city: Optional[str] = Field(None, max_length=144)
+    region: Optional[str] = Field(None, max_length=144)
+    country: Optional[str] = Field(None, max_length=144)
+    name: Optional[str] = Field(None, max_length=144)
+    contact: Optional[str] = Field(None, max_length=144)
+
+
+class GeoCatalogRowSchema(BaseModel):
+    """ Define um catálogo geográfico de uma carga em lote. A coordenada
+        (latitude, longitude) já deve estar cadastrada, exceto com upsert.
+    """
+    latitude: float = Field(ge=-90, le=90)
+    longitude: float = Field(ge=-180, le=180)
+    title: str = Field(max_length=144)
+    description: Optional[str] = Field(None, max_length=3000)
+    hashtag: Optional[str] = Field(None, max_length=40)
+    img_source: Optional[Base64UrlBytes] = None
+
+    @field_validator("img_source", mode="before")
+    @classmethod
+    def empty_image(cls, value):
+        return value or None
+
+
+class BulkRowReportSchema(BaseModel):
+    """ Define o relatório de uma linha não aceita em uma carga em lote.
+    """
+    row: int = 1
+    status: str = "invalid"
+    error: Optional[str] = None
+
+
+class BulkReportSchema(BaseModel):
+    """ Define o relatório de uma carga em lote: totais de linhas aceitas,
+        duplicadas e inválidas, e o detalhe das linhas não aceitas.
+    """
+    accepted: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    rows: List[BulkRowReportSchema] = []
+
+
+class StreamDecoder:
+    """ Decodifica valores JSON de um stream de texto, lendo um bloco por vez.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = JSONDecoder()
+
+    def fill(self) -> bool:
+        """ Lê mais um bloco do stream. Retorna False se o stream terminou.
+        """
+        if self.eof:
+            return False
+        chunk = self.stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        # descarta o que já foi consumido, para a memória não crescer com o corpo
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def next_char(self) -> str:
+        """ Consome e retorna o próximo caractere que não seja espaço.
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                self.pos += 1
+                return self.buffer[self.pos - 1]
+            if not self.fill():
+                raise ValueError("GeoJSON incompleto")
+
+    def peek_char(self) -> str:
+        char = self.next_char()
+        self.pos -= 1
+        return char
+
+    def expect(self, expected: str):
+        char = self.next_char()
+        if char != expected:
+            raise ValueError("GeoJSON inválido: esperado '%s', encontrado '%s'" % (expected, char))
+
+    def decode(self):
+        """ Decodifica o próximo valor JSON, lendo mais blocos se necessário.
+        """
+        self.peek_char()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # um número no fim do bloco pode continuar no bloco seguinte
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except JSONDecodeError:
+                if self.eof:
+                    raise ValueError("GeoJSON inválido")
+            self.fill()
+
+
+def iter_geojson_features(stream) -> Iterator[dict]:
+    """ Percorre, sem carregar o corpo inteiro, as features de uma FeatureCollection.
+    """
+    decoder = StreamDecoder(stream)
+    decoder.expect("{")
+    if decoder.peek_char() == "}":
+        return
+    while True:
+        key = decoder.decode()
+        decoder.expect(":")
+        if key == "features":
+            decoder.expect("[")
+            if decoder.peek_char() == "]":
+                decoder.next_char()
+            else:
+                while True:
+                    yield decoder.decode()
+                    char = decoder.next_char()
+                    if char == "]":
+                        break
+                    if char != ",":
+                        raise ValueError("GeoJSON inválido: esperado ',' ou ']'")
+        else:
+            decoder.decode()
+        char = decoder.next_char()
+        if char == "}":
+            return
+        if char != ",":
+            raise ValueError("GeoJSON inválido: esperado ',' ou '}'")
+
+
+def feature_to_row(feature) -> dict:
+    """ Converte uma feature GeoJSON (Point) em uma linha da carga.
+    """
+    if not isinstance(feature, dict):
+        raise ValueError("feature inválida")
+    geometry = feature.get("geometry") or {}
+    if geometry.get("type") != "Point":
+        raise ValueError("apenas geometrias do tipo Point são aceitas")
+    longitude, latitude = geometry.get("coordinates", [None, None])[:2]
+    return dict(feature.get("properties") or {}, latitude=latitude, longitude=longitude)
+
+
+def read_rows(stream, mimetype: str) -> Iterator[Tuple[int, Union[dict, Exception]]]:
+    """ Lê incrementalmente as linhas de um corpo CSV, NDJSON ou GeoJSON.
+
+    Gera (número da linha, dados) ou (número da linha, erro), para que uma linha
+    inválida seja relatada sem interromper a carga. Um erro na estrutura do
+    GeoJSON encerra a leitura.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    if mimetype == CSV_MIMETYPE:
+        for number, row in enumerate(csv.DictReader(text), start=1):
+            yield number, {key: value for key, value in row.items() if value not in ("", None)}
+    elif mimetype == NDJSON_MIMETYPE:
+        number = 0
+        for line in text:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                yield number, loads(line)
+            except ValueError as e:
+                yield number, e
+    elif mimetype in GEOJSON_MIMETYPES:
+        number = 0
+        try:
+            for number, feature in enumerate(iter_geojson_features(text), start=1):
+                try:
+                    yield number, feature_to_row(feature)
+                except (ValueError, TypeError) as e:
+                    yield number, e
+        except ValueError as e:
+            yield number + 1, e
+    else:
+        raise ValueError("formato não suportado: %s" % mimetype)
@@ -0,0 +1,42 @@
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+
+# maior quantidade de alterações retornadas em uma única requisição
+MAX_CHANGES = 5000
+
+
+class ChangesQuerySchema(BaseModel):
+    """ Define os parâmetros da busca por alterações: cursor (next da resposta
+        anterior, ou 0 na primeira sincronização) e quantidade máxima de alterações.
+    """
+    since: int = Field(0, ge=0)
+    limit: int = Field(500, ge=1, le=MAX_CHANGES)
+
+
+class ChangeSchema(BaseModel):
+    """ Define como uma alteração é representada: a entidade (coordinate ou
+        geo_catalog), seu id e a operação. Um upsert traz os dados atuais da
+        entidade (como nas listagens); um delete traz apenas o id.
+    """
+    entity: Literal["coordinate", "geo_catalog"] = "geo_catalog"
+    id: int = 1
+    op: Literal["upsert", "delete"] = "upsert"
+    data: Optional[dict] = None
+
+
+class ViewChangesSchema(BaseModel):
+    """ Define como as alterações serão retornadas. next é o cursor a ser enviado
+        em since na próxima sincronização e has_more indica se há mais alterações.
+    """
+    changes: List[ChangeSchema]
+    next: int = 0
+    has_more: bool = False
+
+
+class ExpiredChangesSchema(BaseModel):
+    """ Define a resposta a um cursor anterior às alterações mantidas no registro:
+        o cliente deve refazer a sincronização completa (pelas listagens) e
+        continuar com since igual a next.
+    """
+    message: str
+    next: int = 0
@@ -0,0 +1,40 @@
+from pydantic import BaseModel, Field, field_validator
+from typing import List
+
+from model.spatial import parse_bbox
+from model.tiles import MAX_ZOOM
+
+
+class ClusterQuerySchema(BaseModel):
+    """ Define os parâmetros da busca por clusters: área visível do mapa
+        (bbox=min_lon,min_lat,max_lon,max_lat) e nível de zoom.
+    """
+    bbox: str = "-47.0,-24.0,-46.0,-23.0"
+    zoom: int = Field(8, ge=0, le=MAX_ZOOM)
+
+    @field_validator("bbox")
+    @classmethod
+    def check_bbox(cls, value):
+        parse_bbox(value)
+        return value
+
+
+class ClusterSchema(BaseModel):
+    """ Define como um cluster (célula da grade) é representado: célula
+        (zoom/x/y), seus limites, quantidade de coordenadas, centróide,
+        quantidade de catálogos e hashtags mais frequentes.
+    """
+    cell: str = "11/758/1158"
+    bbox: List[float] = [-46.7578125, -23.5059, -46.5820312, -23.3429]
+    count: int = 1
+    latitude: float = -23.3528444
+    longitude: float = -44.7228947
+    catalogs: int = 1
+    hashtags: List[str] = ["#example"]
+
+
+class ViewClustersSchema(BaseModel):
+    """ Define como os clusters de uma área serão retornados.
+    """
+    zoom: int = 8
+    clusters: List[ClusterSchema]
@@ -1,8 +1,20 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import Optional, List, Iterable, Literal
+from model.geo_catalog import GeoCatalog
 from model.coordinate import Coordinate
 
 from schemas import GeoCatalogSchema
+from schemas.geo_catalog import img_url
+from schemas.spatial import SpatialSearchSchema
+from schemas.time_window import TimeWindowSchema
+from schemas.pagination import PaginationSchema
+from schemas.search import TextSearchSchema
+from schemas.projection import parse_fields, select_columns, row_serializer, \
+                               float_column, text_column, timestamp_text
+
+
+# máximo de coordenadas em uma busca pelas mais próximas (nearest)
+MAX_NEAREST = 10000
 
 
 class CoordinateSchema(BaseModel):
@@ -17,34 +29,89 @@ class CoordinateSchema(BaseModel):
     contact: str = "example.com"
 
 
+class CoordinateUpsertSchema(BaseModel):
+    """ Define o modo de gravação de uma coordenada: com upsert, a coordenada
+        já cadastrada na mesma posição é atualizada, em vez de responder 409.
+    """
+    upsert: bool = False
+
+
+class CoordinateListItemSchema(BaseModel):
+    """ Define como uma coordenada é representada em uma listagem. Os campos
+        ausentes em fields são omitidos.
+    """
+    latitude: Optional[float] = -23.3528444
+    longitude: Optional[float] = -44.7228947
+    city: Optional[str] = "São Paulo"
+    region: Optional[str] = "São Paulo"
+    country: Optional[str] = "Brazil"
+    name: Optional[str] = "example"
+    contact: Optional[str] = "example.com"
+    created_at: Optional[str] = "2024-01-01 00:00:00"
+
+
 class ViewCoordinatesSchema(BaseModel):
-    """ Define como uma listagem de coordenadas será retornada.
+    """ Define como uma listagem de coordenadas será retornada. Quando paginada,
+        next traz o cursor da próxima página (ou null, na última página).
     """
-    coordinate:List[CoordinateSchema]
+    coordinates:List[CoordinateListItemSchema]
+    next: Optional[str] = None
 
-class SearchCoordinateSchema(BaseModel):
+class SearchCoordinateSchema(TextSearchSchema, SpatialSearchSchema, TimeWindowSchema, PaginationSchema):
     """ Define como deve ser a estrutura que representa a busca. Que será
-        feita apenas com base no nome da coordenada associada.
+        feita com base no nome da coordenada associada, em uma busca textual
+        (q, sobre nome, cidade e região) e/ou em um filtro
+        espacial: bbox (within=min_lon,min_lat,max_lon,max_lat), raio
+        em torno de um ponto (near=lat,lon&radius_m=) ou as nearest coordenadas
+        mais próximas do ponto (near=lat,lon&nearest=, com radius_m opcional).
+        Também pode filtrar pela região e pela hashtag dos catálogos, sem distinção de
+        maiúsculas e acentos (match=prefix busca pelo início do nome), e pela data
+        de criação (since/until). O resultado pode ser paginado com limit/after.
     """
     name: Optional[str] = None
+    region: Optional[str] = None
+    hashtag: Optional[str] = None
+    match: Literal["exact", "prefix"] = "exact"
+    nearest: Optional[int] = Field(None, ge=1, le=MAX_NEAREST)
+    fields: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_nearest(self):
+        if self.nearest and not self.near:
+            raise ValueError("nearest exige um ponto de referência (near=lat,lon)")
+        return self
+
+    def radius_required(self) -> bool:
+        return not self.nearest
+
+    @field_validator("fields")
+    @classmethod
+    def check_fields(cls, value):
+        parse_fields(value, COORDINATE_FIELDS)
+        return value
 
-def view_coordinates(coordinates: List[Coordinate]):
+    def selected_fields(self) -> List[str]:
+        """ Retorna os campos pedidos em fields.
+        """
+        return parse_fields(self.fields, COORDINATE_FIELDS)
+
+def view_coordinates(rows: Iterable[tuple], fields: Optional[List[str]] = None):
     """ Retorna uma representação do da coordenada seguindo o schema definido em
-        CoordinateViewSchema.
+        CoordinateListItemSchema. As linhas trazem as colunas de coordinate_columns.
+    """
+    serialize = coordinate_serializer(fields)
+    return {"coordinates": [serialize(row) for row in rows]}
+
+def coordinate_serializer(fields: Optional[List[str]] = None):
+    """ Retorna a função que monta a representação de uma coordenada em uma
+        listagem (sem os catálogos), a partir de uma linha de coordinate_columns.
+    """
+    return row_serializer(DEFAULT_COORDINATE_FIELDS if fields is None else fields, COORDINATE_FIELDS)
+
+def coordinate_columns(fields: List[str]) -> list:
+    """ Retorna as colunas lidas da base para os campos pedidos.
     """
-    result = []
-    for coordinate in coordinates:
-        result.append({
-            "latitude": float(coordinate.latitude),
-            "longitude": float(coordinate.longitude),
-            "city": str(coordinate.city),
-            "region": str(coordinate.region),
-            "country": str(coordinate.country),
-            "name": str(coordinate.name),
-            "contact": str(coordinate.contact),
-            "created_at": str(coordinate.created_at)
-        })
-    return {"coordinates": result}
+    return select_columns(fields, COORDINATE_FIELDS)
 
 class CoordinateViewSchema(BaseModel):
     """ Define como uma coordenada será retornada: coordenada + catálogos.
@@ -67,23 +134,46 @@ class CoordinateDelSchema(BaseModel):
     latitude: float
     longitude: float
 
-def view_coordinate(coordinate: Coordinate):
+def view_coordinate(coordinate: Coordinate, geo_catalogs: Iterable[GeoCatalog] = ()):
     """ Retorna uma representação da coordenada seguindo o schema definido em
-        CoordinateViewSchema.
+        CoordinateViewSchema. Apenas os catálogos informados (ex.: o que acabou de
+        ser adicionado) são incluídos; o total vem de catalog_count.
+
+    Latitude e longitude são sempre números: lidas da base (ex.: após um upsert),
+    as colunas Float(9,6) chegam como Decimal, que seria serializado como texto.
     """
     return {
         "id": coordinate.id,
-        "latitude": coordinate.latitude,
-        "longitude": coordinate.longitude,
+        "latitude": as_float(coordinate.latitude),
+        "longitude": as_float(coordinate.longitude),
         "city": coordinate.city,
         "region": coordinate.region,
         "country": coordinate.country,
         "name": coordinate.name,
         "contact": coordinate.contact,
-        "total_catalogs": len(coordinate.geo_catalogs),
+        "total_catalogs": coordinate.catalog_count,
         "geo_catalogs": [{"title": gc.title,
                           "description": gc.description,
                           "hashtag": gc.hashtag,
+                          "img_url": img_url(gc),
                           "created_at": gc.created_at
-                          } for gc in coordinate.geo_catalogs]
+                          } for gc in geo_catalogs]
     }
+
+def as_float(value) -> Optional[float]:
+    return None if value is None else float(value)
+
+
+# campos da listagem de coordenadas, na ordem em que são retornados
+COORDINATE_FIELDS = {
+    "latitude": ((float_column(Coordinate.latitude),), None),
+    "longitude": ((float_column(Coordinate.longitude),), None),
+    "city": ((Coordinate.city,), None),
+    "region": ((Coordinate.region,), None),
+    "country": ((Coordinate.country,), None),
+    "name": ((Coordinate.name,), None),
+    "contact": ((Coordinate.contact,), None),
+    "created_at": ((text_column(Coordinate.created_at),), timestamp_text),
+}
+
+DEFAULT_COORDINATE_FIELDS = list(COORDINATE_FIELDS)
@@ -0,0 +1,47 @@
+from pydantic import field_validator
+from typing import List, Literal, Optional
+
+from model.spatial import parse_bbox
+from schemas.geo_catalog import GEO_CATALOG_FIELDS
+from schemas.projection import parse_fields
+from schemas.time_window import TimeWindowSchema
+
+
+class ExportQuerySchema(TimeWindowSchema):
+    """ Define os parâmetros da exportação dos catálogos: formato, filtros
+        opcionais (bbox em within=min_lon,min_lat,max_lon,max_lat, hashtag e região,
+        exatas ou por prefixo com match=prefix, e intervalo de criação since/until),
+        campos e inclusão da URL da imagem.
+    """
+    format: Literal["geojson", "csv", "ndjson", "arrow", "parquet"] = "ndjson"
+    within: Optional[str] = None
+    hashtag: Optional[str] = None
+    region: Optional[str] = None
+    match: Literal["exact", "prefix"] = "exact"
+    fields: Optional[str] = None
+    include_images: bool = True
+
+    @field_validator("within")
+    @classmethod
+    def check_within(cls, value):
+        if value is not None:
+            parse_bbox(value)
+        return value
+
+    @field_validator("fields")
+    @classmethod
+    def check_fields(cls, value):
+        parse_fields(value, GEO_CATALOG_FIELDS)
+        return value
+
+    def selected_fields(self, geometry: bool = False) -> List[str]:
+        """ Retorna os campos pedidos em fields, sem img_url se include_images=false
+            e sempre com latitude e longitude se geometry.
+        """
+        names = parse_fields(self.fields, GEO_CATALOG_FIELDS)
+        if not self.include_images:
+            names = [name for name in names if name != "img_url"]
+        if geometry:
+            names = [name for name in GEO_CATALOG_FIELDS
+                     if name in names or name in ("latitude", "longitude")]
+        return names
@@ -1,10 +1,22 @@
-from pydantic import BaseModel, Base64Bytes, Base64UrlBytes 
-from typing import Optional, List
+from pydantic import BaseModel, Base64Bytes, Base64UrlBytes, Field, field_validator, model_validator
+from typing import Optional, List, Iterable, Union, Literal
 from model.geo_catalog import GeoCatalog
 from model.coordinate import Coordinate
-from base64 import b64encode
+from model.spatial import parse_bbox
 from json import dumps
 
+from schemas.spatial import SpatialSearchSchema
+from schemas.time_window import TimeWindowSchema
+from schemas.stats import HashtagCountSchema
+from schemas.pagination import PaginationSchema
+from schemas.search import TextSearchSchema
+from schemas.projection import parse_fields, select_columns, row_serializer, \
+                               float_column, text_column, timestamp_text
+
+
+# tamanhos das imagens derivadas (ver model/thumbnails.py)
+ImageSize = Literal["thumb", "medium"]
+
 
 class GeoCatalogSchema(BaseModel):
     """ Define como um novo catálogo a ser inserido deve ser representado
@@ -22,12 +34,37 @@ class GeoCatalogSchema(BaseModel):
     country: str = "example"
 
 
-class SearchGeoCatalogSchema(BaseModel):
+class SearchGeoCatalogSchema(TextSearchSchema, SpatialSearchSchema, TimeWindowSchema, PaginationSchema):
     """ Define como deve ser a estrutura que representa a busca. Que será
-        feita apenas com base na hashtag associada.
+        feita com base na hashtag e/ou região associada (sem distinção de maiúsculas
+        e acentos; com match=prefix, pelo início do nome), em uma busca textual
+        (q, sobre título, descrição, hashtag, nome, cidade e região) e/ou em um filtro
+        espacial: bbox (within=min_lon,min_lat,max_lon,max_lat) ou raio
+        em torno de um ponto (near=lat,lon&radius_m=), e/ou pela data de criação
+        (since/until, ex.: os catálogos das últimas 24 horas em uma região). O
+        resultado pode ser paginado com limit/after. Com size=thumb|medium, a URL da imagem aponta
+        para a imagem reduzida.
     """
     hashtag: Optional[str] = None
     region: Optional[str] = None
+    match: Literal["exact", "prefix"] = "exact"
+    fields: Optional[str] = None
+    include_images: bool = True
+    size: Optional[ImageSize] = None
+
+    @field_validator("fields")
+    @classmethod
+    def check_fields(cls, value):
+        parse_fields(value, GEO_CATALOG_FIELDS)
+        return value
+
+    def selected_fields(self) -> List[str]:
+        """ Retorna os campos pedidos em fields, sem img_url se include_images=false.
+        """
+        names = parse_fields(self.fields, GEO_CATALOG_FIELDS)
+        if not self.include_images:
+            names = [name for name in names if name != "img_url"]
+        return names
 
 class DeleteGeoCatalogSchema(BaseModel):
     """ Define como deve ser a estrutura que representa a remoção. Que será
@@ -36,39 +73,98 @@ class DeleteGeoCatalogSchema(BaseModel):
     id: Optional[int] = None
 
 
+class DeleteGeoCatalogsQuerySchema(TimeWindowSchema):
+    """ Define os filtros de uma remoção em lote: hashtag e região (exatas ou por
+        prefixo com match=prefix), bbox (within=min_lon,min_lat,max_lon,max_lat) e
+        intervalo de criação (since/until, ex.: until=2024-01-01T00:00:00 remove os
+        catálogos criados antes dessa data). Ao menos um filtro é obrigatório. Os
+        catálogos são removidos em transações de batch_size linhas.
+    """
+    hashtag: Optional[str] = None
+    region: Optional[str] = None
+    match: Literal["exact", "prefix"] = "exact"
+    within: Optional[str] = None
+    batch_size: int = Field(500, ge=1, le=10000)
+
+    @field_validator("within")
+    @classmethod
+    def check_within(cls, value):
+        if value is not None:
+            parse_bbox(value)
+        return value
+
+    @model_validator(mode="after")
+    def check_filters(self):
+        if not (self.hashtag or self.region or self.within or self.since or self.until):
+            raise ValueError("informe ao menos um filtro: hashtag, region, within, since ou until")
+        return self
+
+
+class DeleteGeoCatalogsReportSchema(BaseModel):
+    """ Define o resultado de uma remoção em lote: catálogos removidos, transações
+        utilizadas e imagens (não mais referenciadas) removidas do disco, com seus bytes.
+    """
+    deleted: int = 0
+    batches: int = 0
+    images_removed: int = 0
+    image_bytes: int = 0
+
+
+class GeoCatalogListItemSchema(BaseModel):
+    """ Define como um catálogo é representado em uma listagem. Os campos
+        ausentes em fields (ou img_url, com include_images=false) são omitidos.
+    """
+    id: Optional[int] = 1
+    title: Optional[str] = "Title Example"
+    name: Optional[str] = "example"
+    contact: Optional[str] = "example"
+    city: Optional[str] = "example"
+    region: Optional[str] = "example"
+    country: Optional[str] = "example"
+    description: Optional[str] = "This is an example of description of a geographic catalog."
+    hashtag: Optional[str] = "#example"
+    created_at: Optional[str] = "2024-01-01 00:00:00"
+    img_url: Optional[str] = "/geo_catalog/1/image"
+    longitude: Optional[float] = -44.7228947
+    latitude: Optional[float] = -23.3528444
+
+
 class ViewGeoCatalogsSchema(BaseModel):
-    """ Define como uma listagem de catálogos geográficos será retornada.
+    """ Define como uma listagem de catálogos geográficos será retornada. Quando
+        paginada, next traz o cursor da próxima página (ou null, na última página).
     """
-    geo_catalogs:List[GeoCatalogSchema]
+    geo_catalogs:List[GeoCatalogListItemSchema]
+    next: Optional[str] = None
 
 class ViewHashtagsSchema(BaseModel):
     """ Define como uma listagem de hashtags será retornada.
     """
-    hashtags:List[str]
+    hashtags:List[Union[str, HashtagCountSchema]]
 
-def show_geo_catalogs(geo_catalogs_with_coordinate: List[Coordinate]):
+def show_geo_catalogs(rows: Iterable[tuple], fields: Optional[List[str]] = None,
+                      size: Optional[str] = None):
     """ Retorna uma representação dos catálogos seguindo o schema definido em
-        GeoCatalog.
-    """
-    result = []
-    for coordinate in geo_catalogs_with_coordinate:
-        for geo_catalog in coordinate.geo_catalogs:
-            result.append({
-                "id": int(geo_catalog.id),
-                "title": str(geo_catalog.title),
-                "name": str(coordinate.name),
-                "contact": str(coordinate.contact),
-                "city": str(coordinate.city),
-                "region": str(coordinate.region),
-                "country": str(coordinate.country),
-                "description": str(geo_catalog.description),
-                "hashtag": str(geo_catalog.hashtag),
-                "created_at": str(geo_catalog.created_at),
-                "img_source": b64encode(geo_catalog.img_source).decode('utf-8'),
-                "longitude": float(coordinate.longitude),
-                "latitude": float(coordinate.latitude) 
-            })
-    return {"geo_catalogs": result}
+        GeoCatalogListItemSchema. As linhas trazem as colunas de geo_catalog_columns.
+    """
+    serialize = geo_catalog_serializer(fields, size)
+    return {"geo_catalogs": [serialize(row) for row in rows]}
+
+def geo_catalog_serializer(fields: Optional[List[str]] = None, size: Optional[str] = None):
+    """ Retorna a função que monta a representação de um catálogo em uma listagem,
+        junto aos dados da coordenada relacionada, a partir de uma linha de
+        geo_catalog_columns. Com size, img_url aponta para a imagem derivada.
+    """
+    fields_by_name = GEO_CATALOG_FIELDS
+    if size:
+        columns, _ = GEO_CATALOG_FIELDS["img_url"]
+        fields_by_name = {**GEO_CATALOG_FIELDS,
+                          "img_url": (columns, lambda id, img_hash: image_url(id, img_hash, size))}
+    return row_serializer(DEFAULT_GEO_CATALOG_FIELDS if fields is None else fields, fields_by_name)
+
+def geo_catalog_columns(fields: List[str]) -> list:
+    """ Retorna as colunas lidas da base para os campos pedidos.
+    """
+    return select_columns(fields, GEO_CATALOG_FIELDS)
 
 
 class GeoCatalogViewSchema(BaseModel):
@@ -77,10 +173,40 @@ class GeoCatalogViewSchema(BaseModel):
     id: int = 1
     title: str = "Title Example"
     description: str = "This is an example of description of a geographic catalog."
-    img_source: Base64UrlBytes = b'VGhpcyBpcyB0aGUgd2F5'
+    img_url: Optional[str] = "/geo_catalog/1/image"
     hashtag: str = "#example"
 
 
+class GeoCatalogPathSchema(BaseModel):
+    """ Define o identificador de um catálogo geográfico informado na URL.
+    """
+    id: int
+
+
+class GeoCatalogImageQuerySchema(BaseModel):
+    """ Define o tamanho da imagem pedida: a original ou uma derivada
+        (thumb ou medium, reduzidas, sem EXIF).
+    """
+    size: Optional[ImageSize] = None
+
+
+def img_url(geo_catalog: GeoCatalog):
+    """ Retorna a URL da imagem do catálogo (ou None, se não houver imagem).
+    """
+    return image_url(geo_catalog.id, geo_catalog.img_hash)
+
+
+def image_url(id: int, img_hash: Optional[str], size: Optional[str] = None):
+    """ Retorna a URL da imagem do catálogo com o id informado (ou None, sem imagem),
+        no tamanho pedido.
+    """
+    if img_hash is None:
+        return None
+    if size:
+        return "/geo_catalog/%d/image?size=%s" % (id, size)
+    return "/geo_catalog/%d/image" % id
+
+
 def show_geo_catalog(geo_catalog: GeoCatalog):
     """ Retorna uma representação do catálogo geográfico seguindo schema definido em
         GeoCatalogViewSchema.
@@ -89,5 +215,26 @@ def show_geo_catalog(geo_catalog: GeoCatalog):
         "id": geo_catalog.id,
         "title": geo_catalog.title,
         "description": geo_catalog.description,
+        "img_url": img_url(geo_catalog),
         "hashtag": geo_catalog.hashtag
     }
+
+
+# campos da listagem de catálogos, na ordem em que são retornados
+GEO_CATALOG_FIELDS = {
+    "id": ((GeoCatalog.id,), None),
+    "title": ((GeoCatalog.title,), None),
+    "name": ((Coordinate.name,), None),
+    "contact": ((Coordinate.contact,), None),
+    "city": ((Coordinate.city,), None),
+    "region": ((Coordinate.region,), None),
+    "country": ((Coordinate.country,), None),
+    "description": ((GeoCatalog.description,), None),
+    "hashtag": ((GeoCatalog.hashtag,), None),
+    "created_at": ((text_column(GeoCatalog.created_at),), timestamp_text),
+    "img_url": ((GeoCatalog.id, GeoCatalog.img_hash), image_url),
+    "longitude": ((float_column(Coordinate.longitude),), None),
+    "latitude": ((float_column(Coordinate.latitude),), None),
+}
+
+DEFAULT_GEO_CATALOG_FIELDS = list(GEO_CATALOG_FIELDS)
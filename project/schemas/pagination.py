@@ -0,0 +1,22 @@
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional
+
+from model.pagination import decode_cursor
+
+# maior página permitida em uma única requisição
+MAX_PAGE_SIZE = 1000
+
+
+class PaginationSchema(BaseModel):
+    """ Define os parâmetros de paginação por cursor: limit (tamanho da página)
+        e after (cursor retornado em 'next' pela página anterior).
+    """
+    limit: Optional[int] = Field(None, ge=1, le=MAX_PAGE_SIZE)
+    after: Optional[str] = None
+
+    @field_validator("after")
+    @classmethod
+    def check_after(cls, value):
+        if value is not None:
+            decode_cursor(value)
+        return value
@@ -0,0 +1,75 @@
+from operator import itemgetter
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import Float, String, type_coerce
+
+
+# campo de uma listagem: colunas lidas da base e conversão dos seus valores para
+# o JSON (None: o valor da única coluna é retornado como está)
+Field = Tuple[Tuple[object, ...], Optional[Callable]]
+
+
+def float_column(column):
+    """ Lê a coluna como float. As colunas Float(9,6) do modelo retornariam Decimal.
+    """
+    return type_coerce(column, Float())
+
+
+def text_column(column):
+    """ Lê a coluna como o texto guardado na base, sem conversão para o tipo Python.
+    """
+    return type_coerce(column, String())
+
+
+def timestamp_text(value: Optional[str]) -> Optional[str]:
+    """ Converte uma data guardada pelo sqlite ('2024-01-01 00:00:00.000000') na
+        representação de str(datetime), que omite os microssegundos zerados.
+    """
+    if value is not None and value.endswith(".000000"):
+        return value[:-7]
+    return value
+
+
+def parse_fields(value: Optional[str], fields: Dict[str, Field]) -> List[str]:
+    """ Converte o parâmetro fields (nomes separados por vírgula) na lista de
+        campos a retornar. Sem o parâmetro, todos os campos são retornados.
+    """
+    if not value:
+        return list(fields)
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in fields]
+    if unknown:
+        raise ValueError("campos desconhecidos: %s (disponíveis: %s)" %
+                         (", ".join(unknown), ", ".join(fields)))
+    # mantém a ordem de definição dos campos e remove repetições
+    return [name for name in fields if name in names]
+
+
+def select_columns(names: List[str], fields: Dict[str, Field]) -> list:
+    """ Retorna as colunas a selecionar para os campos pedidos, na ordem dos campos.
+    """
+    return [column for name in names for column in fields[name][0]]
+
+
+def row_serializer(names: List[str], fields: Dict[str, Field]) -> Callable[[tuple], dict]:
+    """ Retorna a função que converte uma linha (com as colunas de select_columns)
+        na representação contendo apenas os campos pedidos.
+
+    A função é montada uma vez por listagem: campos sem conversão são copiados
+    diretamente da linha.
+    """
+    if all(fields[name][1] is None for name in names):
+        return lambda row: dict(zip(names, row))
+
+    getters = []
+    position = 0
+    for name in names:
+        columns, convert = fields[name]
+        if convert is None:
+            getters.append(itemgetter(position))
+        elif len(columns) == 1:
+            getters.append(lambda row, position=position, convert=convert: convert(row[position]))
+        else:
+            getters.append(lambda row, start=position, end=position + len(columns), convert=convert:
+                           convert(*row[start:end]))
+        position += len(columns)
+    return lambda row: dict(zip(names, [get(row) for get in getters]))
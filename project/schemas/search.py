@@ -0,0 +1,18 @@
+from pydantic import BaseModel, field_validator
+from typing import Optional
+
+from model.search import match_expression
+
+
+class TextSearchSchema(BaseModel):
+    """ Define o parâmetro de busca textual: q, com as palavras a buscar
+        (por prefixo; todas devem estar presentes).
+    """
+    q: Optional[str] = None
+
+    @field_validator("q")
+    @classmethod
+    def check_q(cls, value):
+        if value is not None:
+            match_expression(value)
+        return value
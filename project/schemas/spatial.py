@@ -0,0 +1,42 @@
+from pydantic import BaseModel, field_validator, model_validator
+from typing import Optional
+
+from model.spatial import parse_bbox, parse_point
+
+
+class SpatialSearchSchema(BaseModel):
+    """ Define os parâmetros de busca espacial: por bbox (within) ou por raio
+        em torno de um ponto (near + radius_m).
+    """
+    within: Optional[str] = None
+    near: Optional[str] = None
+    radius_m: Optional[float] = None
+
+    @field_validator("within")
+    @classmethod
+    def check_within(cls, value):
+        if value is not None:
+            parse_bbox(value)
+        return value
+
+    @field_validator("near")
+    @classmethod
+    def check_near(cls, value):
+        if value is not None:
+            parse_point(value)
+        return value
+
+    @model_validator(mode="after")
+    def check_radius(self):
+        if self.radius_m is not None and self.radius_m <= 0:
+            raise ValueError("radius_m deve ser positivo (em metros)")
+        if self.near and self.radius_m is None and self.radius_required():
+            raise ValueError("near exige um radius_m positivo (em metros)")
+        if self.near and self.within:
+            raise ValueError("utilize apenas um dos filtros espaciais: within ou near")
+        return self
+
+    def radius_required(self) -> bool:
+        """ Indica se near exige radius_m (buscas pelos mais próximos não exigem).
+        """
+        return True
@@ -0,0 +1,62 @@
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional, Union
+
+from schemas.time_window import TimeWindowSchema
+
+
+class StatsQuerySchema(BaseModel):
+    """ Define os parâmetros das listagens de hashtags e regiões: with_counts
+        inclui as quantidades e top limita às mais frequentes.
+    """
+    with_counts: bool = False
+    top: Optional[int] = Field(None, ge=1)
+
+
+class HashtagCountSchema(BaseModel):
+    """ Define como uma hashtag é representada com with_counts: quantidade de catálogos.
+    """
+    hashtag: str = "#example"
+    catalogs: int = 1
+
+
+class RegionCountSchema(BaseModel):
+    """ Define como uma região é representada com with_counts: quantidade de
+        coordenadas e de catálogos.
+    """
+    region: str = "São Paulo"
+    coordinates: int = 1
+    catalogs: int = 1
+
+
+class ViewRegionsSchema(BaseModel):
+    """ Define como uma listagem de regiões será retornada.
+    """
+    regions: List[Union[str, RegionCountSchema]]
+
+
+class TimelineQuerySchema(TimeWindowSchema):
+    """ Define os parâmetros do histograma de criação: intervalo (hora ou dia),
+        entidade contada, período (since/until) e, opcionalmente, hashtag e
+        região (match=prefix busca pelo início do nome).
+    """
+    bucket: Literal["hour", "day"] = "day"
+    entity: Literal["geo_catalog", "coordinate"] = "geo_catalog"
+    hashtag: Optional[str] = None
+    region: Optional[str] = None
+    match: Literal["exact", "prefix"] = "exact"
+
+
+class TimelineBucketSchema(BaseModel):
+    """ Define um intervalo do histograma: data de início e quantidade criada.
+    """
+    start: str = "2024-01-01 00:00:00"
+    count: int = 1
+
+
+class ViewTimelineSchema(BaseModel):
+    """ Define como o histograma de criação será retornado (intervalos sem
+        criações são omitidos).
+    """
+    bucket: str = "day"
+    entity: str = "geo_catalog"
+    timeline: List[TimelineBucketSchema]
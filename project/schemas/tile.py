@@ -0,0 +1,14 @@
+from pydantic import BaseModel, Field
+from typing import Literal
+
+from model.tiles import MAX_ZOOM
+
+
+class TilePathSchema(BaseModel):
+    """ Define o tile (esquema XYZ, Web Mercator) informado na URL e o formato:
+        mvt (Mapbox Vector Tile) ou geojson.
+    """
+    z: int = Field(ge=0, le=MAX_ZOOM)
+    x: int = Field(ge=0)
+    y: int = Field(ge=0)
+    format: Literal["mvt", "geojson"]
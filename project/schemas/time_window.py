@@ -0,0 +1,17 @@
+from pydantic import BaseModel, model_validator
+from datetime import datetime
+from typing import Optional
+
+
+class TimeWindowSchema(BaseModel):
+    """ Define o intervalo de criação: since (inclusive) e until (exclusive),
+        ex.: since=2024-01-01T00:00:00.
+    """
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+
+    @model_validator(mode="after")
+    def check_window(self):
+        if self.since and self.until and self.until <= self.since:
+            raise ValueError("until deve ser posterior a since")
+        return self
@@ -0,0 +1,30 @@
+from flask import Response
+import json
+
+from metrics import timed_serialization
+
+# orjson é opcional: sem ele, o json da biblioteca padrão é utilizado
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+JSON_MIMETYPE = "application/json"
+
+
+def dumps(obj) -> bytes:
+    """ Serializa obj em JSON (UTF-8), com o orjson quando disponível.
+
+    Os valores devem ser tipos JSON nativos (dict, list, str, int, float, bool, None).
+    """
+    with timed_serialization():
+        if orjson is not None:
+            return orjson.dumps(obj)
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def json_response(obj, status: int = 200) -> Response:
+    """ Responde com obj serializado por dumps, sem passar pelo serializador do Flask.
+    """
+    return Response(dumps(obj), status=status, mimetype=JSON_MIMETYPE)
@@ -0,0 +1,57 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+
+# a configuração (GEOVISIO_*) é lida na importação do model: a base, as imagens,
+# os tiles e os logs dos testes ficam em um diretório temporário, definido antes
+# da importação da aplicação
+DATA_PATH = tempfile.mkdtemp(prefix="geovisio-test-")
+os.environ.update({
+    "GEOVISIO_DATABASE_PATH": DATA_PATH,
+    "GEOVISIO_BLOB_PATH": os.path.join(DATA_PATH, "blobs"),
+    "GEOVISIO_TILE_CACHE_PATH": os.path.join(DATA_PATH, "tiles"),
+    "GEOVISIO_OPENAPI_SPEC_PATH": os.path.join(DATA_PATH, "openapi.json"),
+    "GEOVISIO_LOG_PATH": os.path.join(DATA_PATH, "log"),
+    # o índice em memória é testado quando o numpy está instalado
+    "GEOVISIO_MEMORY_INDEX": "1",
+    # escritas percebidas imediatamente pelos caches; sem a thread de manutenção
+    "GEOVISIO_CACHE_CHECK_INTERVAL_MS": "0",
+    "GEOVISIO_MAINTENANCE_INTERVAL_S": "0",
+})
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import create_app
+    from model import init_db
+
+    init_db()
+    app = create_app()
+    yield app
+    shutil.rmtree(DATA_PATH, ignore_errors=True)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def add_coordinate(client, latitude: float, longitude: float, upsert: bool = False, **fields):
+    """ Cadastra uma coordenada por POST /coordinate e retorna a resposta.
+    """
+    data = {"latitude": latitude, "longitude": longitude, "name": "ponto", "contact": "contato",
+            "city": "Cidade", "region": "Região", "country": "Brasil", **fields}
+    return client.post("/coordinate", data=data, query_string={"upsert": "true"} if upsert else None)
+
+
+def add_geo_catalog(client, latitude: float, longitude: float, **fields):
+    """ Cadastra um catálogo (e a coordenada, se ainda não existe) por POST /geo_catalog.
+    """
+    data = {"title": "catálogo", "description": "descrição", "hashtag": "#teste",
+            "img_source": "aW1hZ2Vt", "latitude": latitude, "longitude": longitude,
+            "name": "ponto", "contact": "contato", "city": "Cidade", "region": "Região",
+            "country": "Brasil", **fields}
+    return client.post("/geo_catalog", data=data)
@@ -0,0 +1,106 @@
+import json
+
+import model.bulk
+from conftest import add_geo_catalog
+
+
+def ndjson(rows) -> str:
+    return "".join(json.dumps(row) + "\n" for row in rows)
+
+
+def bulk_geo_catalogs(client, rows, **query):
+    response = client.post("/geo_catalogs/bulk", data=ndjson(rows), query_string=query,
+                           content_type="application/x-ndjson")
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_duplicate_hashtag_ignores_case_and_accents(client):
+    add_geo_catalog(client, -18.0, -46.0, title="colheita", hashtag="#vindima")
+    report = bulk_geo_catalogs(client, [
+        {"latitude": -18.0, "longitude": -46.0, "title": "colheita", "hashtag": "#Vindima"},
+        {"latitude": -18.0, "longitude": -46.0, "title": "colheita", "hashtag": "#Vindimá"},
+        {"latitude": -18.0, "longitude": -46.0, "title": "colheita", "hashtag": "#outra"},
+    ])
+    assert (report["accepted"], report["duplicates"]) == (1, 2)
+
+
+def test_upsert_coordinate_failure_reports_rows(client, monkeypatch):
+    add_geo_catalog(client, -18.125, -46.0)
+
+    submit = model.bulk.writer.submit
+    calls = []
+
+    def failing_submit(operation):
+        # a primeira escrita (criação das coordenadas do bloco) falha
+        calls.append(operation)
+        if len(calls) == 1:
+            raise RuntimeError("falha simulada")
+        return submit(operation)
+
+    monkeypatch.setattr(model.bulk.writer, "submit", failing_submit)
+    report = bulk_geo_catalogs(client, [
+        {"latitude": -18.25, "longitude": -46.0, "title": "nova coordenada"},
+        {"latitude": -18.125, "longitude": -46.0, "title": "coordenada existente"},
+    ], upsert="true")
+    assert (report["accepted"], report["invalid"]) == (1, 1)
+    assert report["rows"] == [{"row": 1, "status": "invalid",
+                               "error": "erro ao criar a coordenada: falha simulada"}]
+
+
+def coordinate_names(client, name: str):
+    response = client.get("/coordinates", query_string={"name": name, "fields": "name,latitude"})
+    return sorted((coordinate["latitude"], coordinate["name"]) for coordinate in response.get_json()["coordinates"])
+
+
+def test_coordinates_csv_with_row_report(client):
+    body = ("latitude,longitude,name\n"
+            "-18.5,-46.5,lote csv\n"
+            "-18.625,-46.5,lote csv\n"
+            "-18.5,-46.5,lote csv repetido\n"
+            "norte,-46.5,lote csv\n"
+            "-95,-46.5,lote csv\n")
+    response = client.post("/coordinates/bulk", data=body, content_type="text/csv",
+                           query_string={"chunk_size": 2})
+    report = response.get_json()
+    assert (report["accepted"], report["duplicates"], report["invalid"]) == (2, 1, 2)
+    assert [(row["row"], row["status"]) for row in report["rows"]] == \
+        [(3, "duplicate"), (4, "invalid"), (5, "invalid")]
+    assert coordinate_names(client, "lote csv") == [(-18.625, "lote csv"), (-18.5, "lote csv")]
+
+
+def test_coordinates_upsert_updates_existing(client):
+    client.post("/coordinates/bulk", data=ndjson([{"latitude": -18.75, "longitude": -46.5, "name": "antigo"}]),
+                content_type="application/x-ndjson")
+    response = client.post("/coordinates/bulk", query_string={"upsert": "true"},
+                           data=ndjson([{"latitude": -18.75, "longitude": -46.5, "name": "atualizado"}]),
+                           content_type="application/x-ndjson")
+    assert response.get_json()["accepted"] == 1
+    assert coordinate_names(client, "atualizado") == [(-18.75, "atualizado")]
+
+
+def test_geo_catalogs_geojson(client):
+    client.post("/coordinates/bulk", data=ndjson([{"latitude": -18.875, "longitude": -46.5, "name": "geojson"}]),
+                content_type="application/x-ndjson")
+    features = {"type": "FeatureCollection", "features": [
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [-46.5, -18.875]},
+         "properties": {"title": "feature", "hashtag": "#geojson", "img_source": "aW1hZ2Vt"}},
+        {"type": "Feature", "geometry": {"type": "LineString", "coordinates": [[0, 0], [1, 1]]},
+         "properties": {"title": "linha"}},
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [10.0, 10.0]},
+         "properties": {"title": "sem coordenada"}},
+    ]}
+    response = client.post("/geo_catalogs/bulk", data=json.dumps(features), content_type="application/geo+json")
+    report = response.get_json()
+    assert (report["accepted"], report["invalid"]) == (1, 2)
+    assert [row["error"] for row in report["rows"]] == [
+        "apenas geometrias do tipo Point são aceitas", "coordenada não cadastrada"]
+
+    [catalog] = client.get("/geo_catalogs", query_string={"hashtag": "#geojson"}).get_json()["geo_catalogs"]
+    assert (catalog["title"], catalog["latitude"]) == ("feature", -18.875)
+    assert client.get(catalog["img_url"]).data == b"imagem"
+
+
+def test_unsupported_format(client):
+    response = client.post("/geo_catalogs/bulk", data="<xml/>", content_type="application/xml")
+    assert response.status_code == 415
@@ -0,0 +1,98 @@
+import os
+import subprocess
+import sys
+
+from cache import DiskTileCache, OWNER_LOCK_FILE
+
+
+PROJECT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_disk_tile_cache_keeps_configured_directory(tmp_path):
+    (tmp_path / "notes.txt").write_text("não é um tile")
+    (tmp_path / "other").mkdir()
+    cache = DiskTileCache(str(tmp_path), max_bytes=1024)
+
+    path = cache.get(1, 0, 0, "mvt", lambda: b"tile")
+    assert os.path.dirname(os.path.dirname(os.path.dirname(path))) == cache.directory
+    assert os.path.basename(cache.directory).startswith("tiles-%d-" % os.getpid())
+    with open(path, "rb") as tile:
+        assert tile.read() == b"tile"
+
+    cache.close()
+    assert not os.path.exists(cache.directory or path)
+    assert sorted(os.listdir(tmp_path)) == ["notes.txt", "other"]
+
+
+def test_disk_tile_cache_removes_directories_of_finished_processes(tmp_path):
+    # o dono terminou (o lock foi liberado), mesmo que o pid esteja em uso por outro processo
+    stale = tmp_path / ("tiles-%d-abc123" % os.getppid())
+    (stale / "1" / "0").mkdir(parents=True)
+    (stale / OWNER_LOCK_FILE).touch()
+    # diretório de uma versão anterior, sem arquivo de lock
+    legacy = tmp_path / "tiles-1-legacy"
+    legacy.mkdir()
+    # o dono ainda vive em outro processo, que mantém o lock
+    running = tmp_path / "tiles-1-running"
+    running.mkdir()
+    owner = subprocess.Popen([sys.executable, "-c", "import sys; from cache import lock_owner; "
+                              "lock_owner(sys.argv[1]); print(flush=True); sys.stdin.read()", str(running)],
+                             cwd=PROJECT_PATH, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        # espera o lock ser adquirido
+        assert owner.stdout.readline() == "\n"
+        cache = DiskTileCache(str(tmp_path), max_bytes=1024)
+        cache.get(1, 0, 0, "mvt", lambda: b"tile")
+
+        assert not stale.exists() and not legacy.exists()
+        assert running.exists()
+
+        # o diretório deste cache também está protegido pelo seu lock
+        other = DiskTileCache(str(tmp_path), max_bytes=1024)
+        other.get(1, 0, 0, "mvt", lambda: b"tile")
+        assert os.path.exists(cache.directory)
+        other.close()
+        cache.close()
+    finally:
+        owner.stdin.close()
+        owner.wait()
+
+    # com o dono encerrado, o lock é liberado e o diretório, removido
+    cache = DiskTileCache(str(tmp_path), max_bytes=1024)
+    cache.get(1, 0, 0, "mvt", lambda: b"tile")
+    assert not running.exists()
+    cache.close()
+
+
+def test_disk_tile_cache_budget_and_invalidation(tmp_path):
+    cache = DiskTileCache(str(tmp_path), max_bytes=10)
+    first = cache.get(0, 0, 0, "mvt", lambda: b"123456")
+    cache.get(1, 0, 0, "mvt", lambda: b"123456")
+    # o tile menos usado é removido ao passar do orçamento
+    assert not os.path.exists(first)
+
+    second = cache.get(1, 0, 0, "geojson", lambda: b"{}")
+    cache.invalidate([(10.0, -170.0)])
+    assert not os.path.exists(second)
+    cache.close()
+
+
+def test_disk_tile_cache_after_fork(tmp_path):
+    cache = DiskTileCache(str(tmp_path), max_bytes=1024)
+    cache.get(1, 0, 0, "mvt", lambda: b"pai")
+    parent_directory = cache.directory
+
+    pid = os.fork()
+    if pid == 0:
+        # o filho cria o seu diretório sem remover o do pai, cujo lock continua com ele
+        ok = False
+        try:
+            cache.get(1, 0, 0, "mvt", lambda: b"filho")
+            ok = cache.directory != parent_directory and os.path.exists(parent_directory)
+            cache.close()
+        finally:
+            os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert sorted(os.listdir(tmp_path)) == [os.path.basename(parent_directory)]
+    cache.close()
@@ -0,0 +1,64 @@
+from sqlalchemy import event
+
+from model import change_log, engine
+from conftest import add_coordinate, add_geo_catalog
+
+
+def last_change_id() -> int:
+    with engine.connect() as connection:
+        return change_log.last_id(connection)
+
+
+def test_catalog_insert_does_not_log_coordinate_upsert(client):
+    add_coordinate(client, -13.5, -39.5)
+    cursor = last_change_id()
+    add_geo_catalog(client, -13.5, -39.5)
+
+    changes = client.get(f"/changes?since={cursor}").get_json()["changes"]
+    assert [(change["entity"], change["op"]) for change in changes] == [("geo_catalog", "upsert")]
+
+
+def test_expired_cursor_requires_resync(client, monkeypatch):
+    monkeypatch.setattr(change_log, "retention", 2)
+    cursor = last_change_id()
+    for index in range(4):
+        add_coordinate(client, -13.75, -39.0 - index / 8)
+
+    response = client.get(f"/changes?since={cursor}")
+    assert response.status_code == 410
+    assert response.get_json()["next"] == last_change_id()
+
+    response = client.get(f"/changes?since={response.get_json()['next']}")
+    assert response.status_code == 200
+    assert response.get_json()["changes"] == []
+
+
+def test_only_latest_change_of_each_entity(client):
+    cursor = last_change_id()
+    first = add_coordinate(client, -13.25, -38.5, name="a").get_json()
+    add_coordinate(client, -13.25, -38.25, name="b")
+    add_coordinate(client, -13.25, -38.5, upsert=True, name="c")
+
+    response = client.get(f"/changes?since={cursor}&limit=1").get_json()
+    assert [change["data"]["name"] for change in response["changes"]] == ["b"]
+    assert response["has_more"]
+    response = client.get(f"/changes?since={response['next']}").get_json()
+    assert [(change["id"], change["data"]["name"]) for change in response["changes"]] == [(first["id"], "c")]
+    assert not response["has_more"]
+
+
+def test_changes_page_uses_entity_index():
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if "FROM changes" in statement:
+            statements.append((statement, parameters))
+
+    with engine.connect() as connection:
+        event.listen(connection, "before_cursor_execute", capture)
+        change_log.since(connection, 0, 10)
+        event.remove(connection, "before_cursor_execute", capture)
+        [(statement, parameters)] = statements
+        plan = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+    details = " | ".join(row[-1] for row in plan)
+    assert "ix_changes_entity" in details and "TEMP B-TREE" not in details
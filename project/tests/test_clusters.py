@@ -0,0 +1,22 @@
+from conftest import add_geo_catalog
+from test_invalidation import clusters_around, tile_feature
+
+
+def test_hashtags_grouped_by_dictionary(client):
+    latitude, longitude = -14.125, -42.125
+    for hashtag in ("#Safra", "#safra", "#SAFRA", "#caju"):
+        add_geo_catalog(client, latitude, longitude, hashtag=hashtag)
+
+    [cluster] = clusters_around(client, latitude, longitude)
+    assert (cluster["catalogs"], cluster["hashtags"]) == (4, ["#Safra", "#caju"])
+    feature = tile_feature(client, latitude, longitude)
+    assert (feature["catalogs"], feature["hashtags"]) == (4, ["#Safra", "#caju"])
+
+
+def test_points_beyond_mercator_limit_in_edge_tiles(client):
+    for latitude, longitude in ((89.0, 12.5), (-88.5, -12.5)):
+        add_geo_catalog(client, latitude, longitude, hashtag="#polo")
+
+        [cluster] = clusters_around(client, latitude, longitude)
+        assert cluster["catalogs"] == 1
+        assert tile_feature(client, latitude, longitude)["catalogs"] == 1
@@ -0,0 +1,22 @@
+from conftest import add_coordinate, add_geo_catalog
+
+
+def test_upsert_response_matches_insert_response(client):
+    inserted = add_coordinate(client, -11.5, -41.25, name="antes").get_json()
+    upserted = add_coordinate(client, -11.5, -41.25, upsert=True, name="depois").get_json()
+
+    assert upserted["id"] == inserted["id"]
+    assert (upserted["latitude"], upserted["longitude"]) == (-11.5, -41.25)
+    assert upserted["name"] == "depois"
+    assert set(upserted) == set(inserted)
+
+
+def test_insert_conflict_without_upsert(client):
+    add_coordinate(client, -11.75, -41.75)
+    assert add_coordinate(client, -11.75, -41.75).status_code == 409
+
+
+def test_catalog_on_existing_coordinate_returns_numbers(client):
+    add_coordinate(client, -11.875, -41.875)
+    coordinate = add_geo_catalog(client, -11.875, -41.875).get_json()
+    assert (coordinate["latitude"], coordinate["longitude"]) == (-11.875, -41.875)
@@ -0,0 +1,73 @@
+import csv
+import io
+import json
+
+import pytest
+
+import app as app_module
+from conftest import add_geo_catalog
+
+
+@pytest.fixture
+def exported(client, request):
+    """ Três catálogos de uma hashtag própria do teste, em duas coordenadas.
+    """
+    hashtag = "#exporta_" + request.node.name[len("test_"):].split("_")[0]
+    for index, (latitude, longitude) in enumerate([(-21.0, -50.0), (-21.0, -50.0), (-21.125, -50.0)]):
+        add_geo_catalog(client, latitude, longitude, hashtag=hashtag, title="exportado %d" % index)
+
+    def export(format: str, **query):
+        response = client.get("/export", query_string={"format": format, "hashtag": hashtag, **query})
+        assert response.status_code == 200
+        return response
+    return export
+
+
+def test_ndjson_in_small_batches(exported, monkeypatch):
+    monkeypatch.setattr(app_module, "EXPORT_BATCH_SIZE", 2)
+    response = exported("ndjson", fields="title,latitude")
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row["title"] for row in rows] == ["exportado 0", "exportado 1", "exportado 2"]
+    assert set(rows[0]) == {"title", "latitude", "coordinate_id"}
+    assert rows[0]["coordinate_id"] == rows[1]["coordinate_id"] != rows[2]["coordinate_id"]
+    assert response.headers["Content-Disposition"] == "attachment; filename=geo_catalogs.ndjson"
+
+
+def test_csv_header_once(exported, monkeypatch):
+    monkeypatch.setattr(app_module, "EXPORT_BATCH_SIZE", 2)
+    rows = list(csv.reader(io.StringIO(exported("csv", fields="title,hashtag").get_data(as_text=True))))
+    assert rows == [["title", "hashtag", "coordinate_id"]] + [
+        ["exportado %d" % index, row[1], row[2]] for index, row in enumerate(rows[1:])]
+    assert len(rows) == 4 and rows[1][1] == "#exporta_csv"
+
+
+def test_geojson_always_has_geometry(exported):
+    collection = exported("geojson", fields="title", include_images="false").get_json()
+    assert [feature["geometry"]["coordinates"] for feature in collection["features"]] == \
+        [[-50.0, -21.0], [-50.0, -21.0], [-50.0, -21.125]]
+    assert set(collection["features"][0]["properties"]) == {"title", "coordinate_id"}
+
+
+def test_arrow_stream(exported):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.ipc
+
+    table = pyarrow.ipc.open_stream(exported("arrow", fields="id,title,created_at").data).read_all()
+    assert table.column_names == ["id", "title", "created_at", "coordinate_id"]
+    assert table.schema.field("id").type == pyarrow.int64()
+    assert table.schema.field("created_at").type == pyarrow.timestamp("us")
+    assert table.column("title").to_pylist() == ["exportado 0", "exportado 1", "exportado 2"]
+
+
+def test_geoparquet(exported, monkeypatch):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.parquet
+    from struct import unpack
+
+    monkeypatch.setattr(app_module, "EXPORT_BATCH_SIZE", 2)
+    parquet = pyarrow.parquet.ParquetFile(io.BytesIO(exported("parquet", fields="title").data))
+    assert parquet.metadata.num_row_groups == 2
+    assert json.loads(parquet.schema_arrow.metadata[b"geo"])["primary_column"] == "geometry"
+    table = parquet.read()
+    assert table.column("title").to_pylist() == ["exportado 0", "exportado 1", "exportado 2"]
+    assert unpack("<BIdd", table.column("geometry")[2].as_py()) == (1, 1, -50.0, -21.125)
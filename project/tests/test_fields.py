@@ -0,0 +1,34 @@
+from conftest import add_coordinate, add_geo_catalog
+
+
+def listing(client, path: str, key: str, **query):
+    response = client.get(path, query_string=query)
+    assert response.status_code == 200
+    return response.get_json()[key]
+
+
+def test_geo_catalog_fields(client):
+    add_geo_catalog(client, -17.0, -45.0, hashtag="#campos", title="campos")
+    [catalog] = listing(client, "/geo_catalogs", "geo_catalogs", hashtag="#campos", fields="title,latitude")
+    assert catalog == {"title": "campos", "latitude": -17.0}
+
+
+def test_include_images(client):
+    add_geo_catalog(client, -17.125, -45.0, hashtag="#imagens")
+    [catalog] = listing(client, "/geo_catalogs", "geo_catalogs", hashtag="#imagens")
+    assert client.get(catalog["img_url"]).status_code == 200
+
+    [catalog] = listing(client, "/geo_catalogs", "geo_catalogs", hashtag="#imagens", include_images="false")
+    assert "img_url" not in catalog and catalog["title"] == "catálogo"
+
+
+def test_coordinate_fields(client):
+    add_coordinate(client, -17.25, -45.0, name="esparso")
+    [coordinate] = listing(client, "/coordinates", "coordinates", name="esparso", fields="latitude,longitude")
+    assert coordinate == {"latitude": -17.25, "longitude": -45.0}
+
+
+def test_unknown_field_is_rejected(client):
+    response = client.get("/geo_catalogs", query_string={"fields": "title,senha"})
+    assert response.status_code == 422
+    assert "senha" in response.get_data(as_text=True)
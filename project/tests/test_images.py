@@ -0,0 +1,78 @@
+from base64 import urlsafe_b64encode
+from hashlib import sha256
+
+from conftest import add_geo_catalog
+
+
+def image(content: bytes) -> str:
+    return urlsafe_b64encode(content).decode()
+
+
+def catalog_id(response) -> int:
+    return int(response.get_json()["geo_catalogs"][-1]["img_url"].split("/")[2])
+
+
+def test_delete_releases_only_unreferenced_images(client):
+    from model.blob_store import blob_store
+
+    content = b"imagem compartilhada"
+    digest = sha256(content).hexdigest()
+    first = add_geo_catalog(client, -12.101, -42.101, title="um", img_source=image(content))
+    second = add_geo_catalog(client, -12.102, -42.102, title="dois", img_source=image(content))
+
+    client.delete("/geo_catalog", query_string={"id": catalog_id(first)})
+    assert blob_store.exists(digest)
+    client.delete("/geo_catalog", query_string={"id": catalog_id(second)})
+    assert not blob_store.exists(digest)
+
+
+def test_insert_keeps_image_released_after_put(client, monkeypatch):
+    from model.blob_store import blob_store
+
+    content = b"imagem removida durante o envio"
+    digest = sha256(content).hexdigest()
+    first = add_geo_catalog(client, -12.201, -42.201, title="um", img_source=image(content))
+    client.delete("/geo_catalog", query_string={"id": catalog_id(first)})
+    assert not blob_store.exists(digest)
+
+    # o put do novo envio aconteceu antes da remoção, quando o arquivo ainda existia
+    put = blob_store.put
+    calls = []
+
+    def put_before_release(data):
+        calls.append(data)
+        return (sha256(data).hexdigest(), len(data)) if len(calls) == 1 else put(data)
+
+    monkeypatch.setattr(blob_store, "put", put_before_release)
+    second = add_geo_catalog(client, -12.202, -42.202, title="dois", img_source=image(content))
+    assert second.status_code == 200
+    assert blob_store.get(digest) == content
+
+
+def test_release_and_insert_in_the_same_transaction(app):
+    from model import writer
+    from model.blob_store import blob_store
+    from model.bulk import release_images, retain_images
+
+    content = b"imagem liberada e usada de novo"
+    digest, _ = blob_store.put(content)
+
+    def release_and_retain(session):
+        release_images(session, [digest])
+        retain_images(session, {digest: content})
+
+    writer.submit(release_and_retain)
+    assert blob_store.exists(digest)
+    writer.submit(lambda session: release_images(session, [digest]))
+    assert not blob_store.exists(digest)
+
+
+def test_bulk_delete_reports_released_images(client):
+    content = b"imagem da remocao em lote"
+    for index in range(3):
+        add_geo_catalog(client, -12.3 - index / 1000, -42.3, title="lote %d" % index,
+                        hashtag="#lote", img_source=image(content))
+
+    response = client.delete("/geo_catalogs", query_string={"hashtag": "#lote", "batch_size": 2})
+    assert response.get_json() == {"deleted": 3, "batches": 2, "images_removed": 1,
+                                   "image_bytes": len(content)}
@@ -0,0 +1,86 @@
+import pytest
+
+from conftest import add_coordinate, add_geo_catalog
+
+
+def tile_feature(client, latitude: float, longitude: float, zoom: int = 12):
+    """ Retorna as propriedades da coordenada no tile GeoJSON que contém a posição.
+    """
+    from model.tiles import tile_of
+
+    x, y = tile_of(latitude, longitude, zoom)
+    response = client.get("/tiles/%d/%d/%d.geojson" % (zoom, x, y))
+    assert response.status_code == 200
+    features = [feature for feature in response.get_json()["features"]
+                if feature["geometry"]["coordinates"] == [longitude, latitude]]
+    return features[0]["properties"] if features else None
+
+
+def clusters_around(client, latitude: float, longitude: float, zoom: int = 10):
+    bbox = "%f,%f,%f,%f" % (longitude - 0.01, latitude - 0.01, longitude + 0.01, latitude + 0.01)
+    response = client.get("/clusters", query_string={"bbox": bbox, "zoom": zoom})
+    assert response.status_code == 200
+    return response.get_json()["clusters"]
+
+
+def test_insert_invalidates_tiles_and_clusters(client):
+    latitude, longitude = -10.101, -40.101
+    assert tile_feature(client, latitude, longitude) is None
+    assert clusters_around(client, latitude, longitude) == []
+
+    assert add_geo_catalog(client, latitude, longitude, hashtag="#caju").status_code == 200
+
+    assert tile_feature(client, latitude, longitude)["catalogs"] == 1
+    [cluster] = clusters_around(client, latitude, longitude)
+    assert (cluster["count"], cluster["catalogs"], cluster["hashtags"]) == (1, 1, ["#caju"])
+
+
+def test_delete_invalidates_tiles_and_clusters(client):
+    latitude, longitude = -10.202, -40.202
+    catalog = add_geo_catalog(client, latitude, longitude).get_json()
+    assert tile_feature(client, latitude, longitude)["catalogs"] == 1
+    assert clusters_around(client, latitude, longitude)[0]["catalogs"] == 1
+
+    catalog_id = int(catalog["geo_catalogs"][0]["img_url"].split("/")[2])
+    assert client.delete("/geo_catalog", query_string={"id": catalog_id}).status_code == 200
+
+    assert tile_feature(client, latitude, longitude)["catalogs"] == 0
+    assert clusters_around(client, latitude, longitude)[0]["catalogs"] == 0
+
+
+def test_insert_updates_cached_listing(client):
+    etag = client.get("/hashtags").headers["ETag"]
+    add_geo_catalog(client, -10.303, -40.303, hashtag="#umbu")
+    response = client.get("/hashtags", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert "#umbu" in response.get_json()["hashtags"]
+
+
+def test_memory_index_sees_inserted_coordinate(client):
+    from app import coordinate_index
+
+    if coordinate_index is None:
+        pytest.skip("índice em memória exige o numpy")
+    near = {"near": "-10.404,-40.404", "radius_m": 1000}
+    assert client.get("/coordinates", query_string=near).get_json()["coordinates"] == []
+    add_coordinate(client, -10.404, -40.404, name="novo")
+    [coordinate] = client.get("/coordinates", query_string=near).get_json()["coordinates"]
+    assert coordinate["name"] == "novo"
+
+
+def test_upsert_invalidates_tiles_and_memory_index(client):
+    latitude, longitude = -10.505, -40.505
+    add_coordinate(client, latitude, longitude, name="Praça", region="São Paulo")
+    assert tile_feature(client, latitude, longitude)["region"] == "São Paulo"
+    near = {"near": "%f,%f" % (latitude, longitude), "radius_m": 1000}
+    assert len(client.get("/coordinates", query_string={**near, "region": "sao paulo"})
+               .get_json()["coordinates"]) == 1
+
+    response = add_coordinate(client, latitude, longitude, upsert=True, name="Farol", region="Bahia")
+    assert response.status_code == 200
+
+    properties = tile_feature(client, latitude, longitude)
+    assert (properties["name"], properties["region"]) == ("Farol", "Bahia")
+    assert client.get("/coordinates", query_string={**near, "region": "sao paulo"}).get_json()["coordinates"] == []
+    [coordinate] = client.get("/coordinates", query_string={**near, "region": "bahia"}).get_json()["coordinates"]
+    assert coordinate["name"] == "Farol"
@@ -0,0 +1,49 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from model import engine
+from conftest import add_geo_catalog
+
+
+@contextmanager
+def captured_statements():
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+
+@pytest.mark.parametrize("path", ["/hashtags", "/regions?with_counts=true", "/geo_catalogs?limit=5"])
+def test_not_modified_without_reading_listing(client, path):
+    add_geo_catalog(client, -20.0, -49.0, hashtag="#etag")
+    response = client.get(path)
+    etag = response.headers["ETag"]
+    assert response.status_code == 200
+
+    with captured_statements() as statements:
+        response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 304 and response.data == b""
+    # apenas a verificação da geração dos dados (ver model/generation.py)
+    assert all("data_generation" in statement or statement == "BEGIN" for statement in statements)
+
+
+def test_write_changes_etag(client):
+    etag = client.get("/hashtags?with_counts=true").headers["ETag"]
+    add_geo_catalog(client, -20.125, -49.0, hashtag="#etag")
+    response = client.get("/hashtags?with_counts=true", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["ETag"] != etag
+
+
+def test_variants_have_their_own_etag(client):
+    add_geo_catalog(client, -20.25, -49.0, hashtag="#variante")
+    plain, counted = client.get("/hashtags"), client.get("/hashtags?with_counts=true")
+    assert plain.headers["ETag"] != counted.headers["ETag"]
+    assert client.get("/hashtags?with_counts=true", headers={"If-None-Match": plain.headers["ETag"]}).status_code == 200
@@ -0,0 +1,14 @@
+import logging
+
+from logger import logger, request_logger, sample_filter
+
+
+def test_sampling_applies_only_to_request_logger(app, caplog, monkeypatch):
+    monkeypatch.setattr(sample_filter, "rate", 0.0)
+    caplog.set_level(logging.DEBUG, logger=logger.name)
+
+    request_logger.debug("leitura")
+    logger.debug("escrita")
+    request_logger.info("aviso")
+
+    assert [record.getMessage() for record in caplog.records] == ["escrita", "aviso"]
@@ -0,0 +1,88 @@
+import os
+
+from sqlalchemy import create_engine
+
+import app as app_module
+from conftest import add_geo_catalog
+from model.maintenance import StorageMaintenance, AUTO_VACUUM_INCREMENTAL, pragma_value
+
+
+def maintenance_for(path, auto_vacuum: str = "INCREMENTAL", **options) -> StorageMaintenance:
+    """ Cria uma base em WAL com 200 linhas de 4 KiB, das quais as 150 primeiras
+        são removidas, e a manutenção dela.
+    """
+    engine = create_engine("sqlite:///%s" % os.path.join(path, "manutencao.sqlite3"))
+    connection = engine.raw_connection()
+    dbapi_connection = connection.driver_connection
+    dbapi_connection.executescript("PRAGMA auto_vacuum = %s; PRAGMA journal_mode = WAL; "
+                                   "CREATE TABLE dados (id INTEGER PRIMARY KEY, conteudo BLOB);" % auto_vacuum)
+    dbapi_connection.executemany("INSERT INTO dados (conteudo) VALUES (?)", [(os.urandom(4096),) for _ in range(200)])
+    dbapi_connection.execute("DELETE FROM dados WHERE id <= 150")
+    dbapi_connection.commit()
+    connection.close()
+    options = {"interval": 0, "vacuum_bytes": 4096, "step_pages": 16, "pause": 0,
+               "analyze_interval": 3600, "analysis_limit": 100, **options}
+    return StorageMaintenance(engine, **options)
+
+
+def test_vacuum_analyze_and_checkpoint(tmp_path):
+    maintenance = maintenance_for(tmp_path)
+    result = maintenance.run_once()
+    # o vacuum devolve as páginas (em vários passos) e antecipa o ANALYZE
+    assert result["reclaimed_bytes"] >= 150 * 4096
+    assert result["analyzed"] is True
+    assert maintenance.free_bytes == 0
+    busy, wal_pages, copied = result["checkpoint"]
+    assert busy == 0 and copied == wal_pages
+
+    with maintenance.engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT count(*) FROM sqlite_stat1").scalar() > 0
+
+    # nada a devolver: o ANALYZE espera analyze_interval, a menos que seja pedido
+    result = maintenance.run_once()
+    assert (result["reclaimed_bytes"], result["analyzed"]) == (0, False)
+    maintenance.analyze_requested = True
+    assert maintenance.run_once()["analyzed"] is True
+
+
+def test_small_free_space_is_kept(tmp_path):
+    maintenance = maintenance_for(tmp_path, vacuum_bytes=10 * 1024 * 1024)
+    assert maintenance.run_once(analyze=False)["reclaimed_bytes"] == 0
+    assert maintenance.free_bytes >= 150 * 4096
+
+
+def test_convert_to_incremental(tmp_path):
+    maintenance = maintenance_for(tmp_path, auto_vacuum="NONE")
+    assert not maintenance.incremental()
+    # sem auto_vacuum incremental, o espaço livre não é devolvido
+    assert maintenance.run_once()["reclaimed_bytes"] == 0
+
+    maintenance.convert()
+    assert maintenance.incremental()
+    connection = maintenance.engine.raw_connection()
+    try:
+        assert pragma_value(connection.driver_connection, "auto_vacuum") == AUTO_VACUUM_INCREMENTAL
+        assert pragma_value(connection.driver_connection, "freelist_count") == 0
+    finally:
+        connection.close()
+
+
+def test_filtered_delete_wakes_maintenance(client, monkeypatch):
+    wakes = []
+    monkeypatch.setattr(app_module.maintenance, "wake", lambda analyze=False: wakes.append(analyze))
+    for latitude in (-11.0, -11.125, -11.25):
+        add_geo_catalog(client, latitude, -38.0, hashtag="#descarte")
+
+    response = client.delete("/geo_catalogs", query_string={"hashtag": "#descarte", "within": "-38.5,-11.2,-37.5,-10.9"})
+    assert response.get_json()["deleted"] == 2
+    assert wakes == [True]
+    catalogs = client.get("/geo_catalogs", query_string={"hashtag": "#descarte"}).get_json()["geo_catalogs"]
+    assert [catalog["latitude"] for catalog in catalogs] == [-11.25]
+
+    # nenhum catálogo removido: a manutenção não é antecipada
+    assert client.delete("/geo_catalogs", query_string={"hashtag": "#inexistente"}).get_json()["deleted"] == 0
+    assert wakes == [True]
+
+
+def test_filtered_delete_requires_filter(client):
+    assert client.delete("/geo_catalogs").status_code == 422
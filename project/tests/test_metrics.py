@@ -0,0 +1,43 @@
+from metrics import request_duration, sql_statements, rows_returned
+from conftest import add_coordinate, add_geo_catalog
+
+
+def duration_count(labels) -> int:
+    counts, _ = request_duration.values.get(labels, ([0], 0.0))
+    return sum(counts)
+
+
+def test_writer_statements_count_in_request(client):
+    labels = ("/coordinate", "POST")
+    before = sql_statements.values.get(labels, 0)
+    add_coordinate(client, -15.25, -43.25)
+    # SAVEPOINT, INSERT, RELEASE e o commit do lote, ao menos
+    assert sql_statements.values.get(labels, 0) - before >= 4
+
+
+def test_streamed_response_recorded_after_body(client):
+    add_geo_catalog(client, -15.5, -43.5)
+    labels = ("/export", "GET")
+    count, statements = duration_count(labels), sql_statements.values.get(labels, 0)
+
+    response = client.get("/export?format=ndjson", buffered=False)
+    assert duration_count(labels) == count
+    body = response.get_data()
+    response.close()
+
+    assert body
+    assert duration_count(labels) == count + 1
+    assert sql_statements.values.get(labels, 0) > statements
+
+
+def test_rows_returned_by_core_listings(client):
+    for latitude in (-15.75, -15.875):
+        add_geo_catalog(client, latitude, -43.75, hashtag="#contadas")
+    listing, export = ("/geo_catalogs", "GET"), ("/export", "GET")
+    before = rows_returned.values.get(listing, 0), rows_returned.values.get(export, 0)
+
+    client.get("/geo_catalogs", query_string={"hashtag": "#contadas"})
+    client.get("/export", query_string={"format": "csv", "hashtag": "#contadas"}).get_data()
+    assert rows_returned.values.get(listing, 0) - before[0] == 2
+    assert rows_returned.values.get(export, 0) - before[1] == 2
+    assert "geovisio_rows_returned_total" in client.get("/metrics").get_data(as_text=True)
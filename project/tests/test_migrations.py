@@ -0,0 +1,190 @@
+from hashlib import sha256
+import os
+import sqlite3
+import subprocess
+import sys
+
+from model.migrations import SCHEMA_VERSION
+
+
+PROJECT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# esquema criado pela primeira versão da API (antes das migrações)
+BASELINE_DDL = """
+CREATE TABLE coordinates (
+    id_coordinate INTEGER NOT NULL,
+    longitude FLOAT,
+    latitude FLOAT,
+    city VARCHAR(144),
+    region VARCHAR(144),
+    country VARCHAR(144),
+    name VARCHAR(144),
+    contact VARCHAR(144),
+    created_at DATETIME,
+    PRIMARY KEY (id_coordinate)
+);
+CREATE TABLE geo_catalogs (
+    id_geo_catalog INTEGER NOT NULL,
+    title VARCHAR(144),
+    description VARCHAR(3000),
+    img_source BLOB,
+    hashtag VARCHAR(40),
+    created_at DATETIME,
+    coordinate_id INTEGER NOT NULL,
+    PRIMARY KEY (id_geo_catalog),
+    FOREIGN KEY(coordinate_id) REFERENCES coordinates (id_coordinate)
+);
+"""
+
+IMAGE = b"\x89PNG\r\n\x1a\nimagem"
+
+
+def run_model(database_path: str, code: str, **env) -> subprocess.CompletedProcess:
+    """ Executa o código em outro processo, com a base em database_path (a
+        configuração é lida na importação do model).
+    """
+    env = {**os.environ, "GEOVISIO_DATABASE_PATH": database_path,
+           "GEOVISIO_BLOB_PATH": os.path.join(database_path, "blobs"), **env}
+    return subprocess.run([sys.executable, "-c", "from model import *; " + code],
+                          cwd=PROJECT_PATH, env=env, capture_output=True, text=True)
+
+
+def init_db(database_path: str, **env) -> subprocess.CompletedProcess:
+    return run_model(database_path, "init_db()", **env)
+
+
+def baseline_database(path) -> str:
+    database_path = str(path)
+    connection = sqlite3.connect(os.path.join(database_path, "db.sqlite3"))
+    connection.executescript(BASELINE_DDL)
+    connection.executemany(
+        "INSERT INTO coordinates VALUES (?, ?, ?, 'Salvador', 'Bahia', 'Brasil', ?, 'contato', "
+        "'2024-01-01 10:00:00')",
+        [(1, -38.5, -12.9, "farol"), (2, -38.6, -13.0, "praia"),
+         # a mesma posição da coordenada 1 (até a sexta casa): unida a ela
+         (3, -38.5000001, -12.9000001, "farol repetido")])
+    connection.executemany(
+        "INSERT INTO geo_catalogs VALUES (?, ?, 'descrição', ?, ?, '2024-01-01 10:00:00', ?)",
+        [(1, "catálogo 1", IMAGE, "#Farol", 1), (2, "catálogo 2", None, "#praia", 2),
+         (3, "catálogo 3", IMAGE, "#farol", 3)])
+    connection.commit()
+    connection.close()
+    return database_path
+
+
+def test_migrates_baseline_database(tmp_path):
+    database_path = baseline_database(tmp_path)
+    result = init_db(database_path)
+    assert result.returncode == 0, result.stderr
+
+    connection = sqlite3.connect(os.path.join(database_path, "db.sqlite3"))
+    assert connection.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+
+    # coordenadas repetidas unidas, com os catálogos e o contador
+    assert connection.execute(
+        "SELECT id_coordinate, catalog_count FROM coordinates ORDER BY id_coordinate").fetchall() == \
+        [(1, 2), (2, 1)]
+    assert connection.execute(
+        "SELECT coordinate_id FROM geo_catalogs WHERE id_geo_catalog = 3").fetchone() == (1,)
+
+    # imagens movidas para o blob store
+    columns = {row[1] for row in connection.execute("PRAGMA table_info(geo_catalogs)")}
+    assert "img_source" not in columns
+    digest = sha256(IMAGE).hexdigest()
+    assert connection.execute(
+        "SELECT img_hash, img_size FROM geo_catalogs WHERE id_geo_catalog = 1").fetchone() == \
+        (digest, len(IMAGE))
+    with open(os.path.join(database_path, "blobs", digest[:2], digest), "rb") as blob:
+        assert blob.read() == IMAGE
+
+    # dicionário de hashtags: "#Farol" e "#farol" são a mesma hashtag
+    assert connection.execute(
+        "SELECT count(DISTINCT hashtag_id) FROM geo_catalogs WHERE id_geo_catalog IN (1, 3)").fetchone() == (1,)
+    # entidades existentes no registro de alterações
+    assert connection.execute("SELECT count(*) FROM changes").fetchone() == (5,)
+    connection.close()
+
+    # uma nova execução não altera a base
+    result = init_db(database_path)
+    assert result.returncode == 0, result.stderr
+
+
+def test_replaces_outdated_triggers(tmp_path):
+    database_path = str(tmp_path)
+    assert init_db(database_path).returncode == 0
+
+    # trigger de uma versão anterior, que não acompanhava os dados da coordenada
+    connection = sqlite3.connect(os.path.join(database_path, "db.sqlite3"))
+    connection.executescript("""
+        DROP TRIGGER location_changes_coordinate_update;
+        CREATE TRIGGER location_changes_coordinate_update AFTER UPDATE OF latitude, longitude ON coordinates
+        BEGIN
+            INSERT INTO location_changes (latitude, longitude) VALUES (new.latitude, new.longitude);
+        END;
+        PRAGMA user_version = 1;
+    """)
+    connection.close()
+
+    result = init_db(database_path)
+    assert result.returncode == 0, result.stderr
+    connection = sqlite3.connect(os.path.join(database_path, "db.sqlite3"))
+    connection.execute("INSERT INTO coordinates (id_coordinate, latitude, longitude, name) VALUES (1, 1.5, 2.5, 'a')")
+    before = connection.execute("SELECT count(*) FROM location_changes").fetchone()[0]
+    connection.execute("UPDATE coordinates SET name = 'b' WHERE id_coordinate = 1")
+    assert connection.execute("SELECT count(*) FROM location_changes").fetchone()[0] > before
+    assert connection.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    connection.close()
+
+
+def test_precision_change_requires_rekey(tmp_path):
+    database_path = str(tmp_path)
+    assert init_db(database_path).returncode == 0
+    connection = sqlite3.connect(os.path.join(database_path, "db.sqlite3"))
+    connection.executemany("INSERT INTO coordinates (latitude, longitude, name) VALUES (?, ?, ?)",
+                           [(-12.0001, -38.0001, "a"), (-12.0002, -38.0002, "b")])
+    connection.commit()
+    connection.close()
+
+    # os workers recusam a base enquanto a precisão difere
+    result = run_model(database_path, "print(schema_error())", GEOVISIO_COORDINATE_PRECISION="3")
+    assert "--rekey" in result.stdout
+
+    # sem --rekey, nada é alterado
+    result = init_db(database_path, GEOVISIO_COORDINATE_PRECISION="3")
+    assert result.returncode != 0 and "--rekey" in result.stderr
+    connection = sqlite3.connect(os.path.join(database_path, "db.sqlite3"))
+    assert connection.execute("SELECT count(*) FROM coordinates").fetchone() == (2,)
+    connection.close()
+
+    result = run_model(database_path, "init_db(rekey=True); print(schema_error())",
+                       GEOVISIO_COORDINATE_PRECISION="3")
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "None"
+    connection = sqlite3.connect(os.path.join(database_path, "db.sqlite3"))
+    assert connection.execute("SELECT count(*) FROM coordinates").fetchone() == (1,)
+    connection.close()
+
+
+def test_moves_images_in_batches(tmp_path):
+    database_path = baseline_database(tmp_path)
+    result = run_model(database_path, "import model.migrations as migrations; "
+                                      "migrations.MOVE_IMAGES_BATCH_SIZE = 1; init_db()")
+    assert result.returncode == 0, result.stderr
+
+    connection = sqlite3.connect(os.path.join(database_path, "db.sqlite3"))
+    assert connection.execute(
+        "SELECT id_geo_catalog FROM geo_catalogs WHERE img_hash IS NOT NULL ORDER BY 1").fetchall() == [(1,), (3,)]
+    connection.close()
+
+
+def test_old_sqlite_cannot_move_images(tmp_path):
+    database_path = baseline_database(tmp_path)
+    result = run_model(database_path, "import model.migrations as migrations; "
+                                      "migrations.sqlite_version = lambda connection: (3, 34, 1); init_db()")
+    assert result.returncode != 0 and "3.35.0" in result.stderr
+
+    # a migração é desfeita: as imagens continuam na base
+    connection = sqlite3.connect(os.path.join(database_path, "db.sqlite3"))
+    columns = {row[1] for row in connection.execute("PRAGMA table_info(geo_catalogs)")}
+    assert "img_source" in columns and "img_hash" not in columns
+    connection.close()
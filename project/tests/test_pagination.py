@@ -0,0 +1,51 @@
+import json
+
+from conftest import add_coordinate, add_geo_catalog
+
+NDJSON = {"Accept": "application/x-ndjson"}
+
+
+def add_catalogs(client, hashtag: str, count: int):
+    for index in range(count):
+        add_geo_catalog(client, -16.0 - index / 16, -44.0, hashtag=hashtag, title="pagina %d" % index)
+
+
+def test_geo_catalogs_keyset_pages(client):
+    add_catalogs(client, "#paginacao", 5)
+    titles, after = [], None
+    while True:
+        query = {"hashtag": "#paginacao", "limit": 2, **({"after": after} if after else {})}
+        result = client.get("/geo_catalogs", query_string=query).get_json()
+        assert len(result["geo_catalogs"]) <= 2
+        titles += [catalog["title"] for catalog in result["geo_catalogs"]]
+        after = result["next"]
+        if after is None:
+            break
+    assert titles == ["pagina %d" % index for index in range(5)]
+
+
+def test_cursor_from_another_search_is_rejected(client):
+    add_catalogs(client, "#cursor", 2)
+    result = client.get("/geo_catalogs", query_string={"hashtag": "#cursor", "limit": 1}).get_json()
+    response = client.get("/geo_catalogs", query_string={
+        "hashtag": "#cursor", "limit": 1, "q": "pagina", "after": result["next"]})
+    assert response.status_code == 400
+
+
+def test_geo_catalogs_ndjson(client):
+    add_catalogs(client, "#ndjson", 3)
+    response = client.get("/geo_catalogs", query_string={"hashtag": "#ndjson", "limit": 2}, headers=NDJSON)
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line["title"] for line in lines[:2]] == ["pagina 0", "pagina 1"]
+    next_page = client.get("/geo_catalogs", query_string={
+        "hashtag": "#ndjson", "limit": 2, "after": lines[2]["next"]}, headers=NDJSON)
+    assert [json.loads(line)["title"] for line in next_page.get_data(as_text=True).splitlines()] == ["pagina 2"]
+
+
+def test_coordinates_ndjson_without_limit(client):
+    for index in range(3):
+        add_coordinate(client, -16.5, -44.5 - index / 16, name="linhas")
+    response = client.get("/coordinates", query_string={"name": "linhas"}, headers=NDJSON)
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line["longitude"] for line in lines] == [-44.5, -44.5625, -44.625]
@@ -0,0 +1,38 @@
+from conftest import add_coordinate, add_geo_catalog
+
+
+def search(client, q: str, path: str = "/geo_catalogs", key: str = "geo_catalogs", **query):
+    response = client.get(path, query_string={"q": q, **query})
+    assert response.status_code == 200
+    return [item.get("title", item.get("name")) for item in response.get_json()[key]]
+
+
+def test_ranked_by_relevance(client):
+    add_geo_catalog(client, -19.0, -47.0, title="barco", hashtag="#mar",
+                    description="uma jangada entre muitas outras embarcações ancoradas no porto da vila")
+    add_geo_catalog(client, -19.0, -47.125, title="jangada", hashtag="#jangada", description="jangada de pesca")
+    assert search(client, "jangada") == ["jangada", "barco"]
+
+
+def test_prefix_diacritics_and_all_words(client):
+    add_geo_catalog(client, -19.125, -47.0, title="maré cheia", description="pescaria noturna")
+    add_geo_catalog(client, -19.125, -47.125, title="maré baixa", description="caminhada")
+    assert sorted(search(client, "mare")) == ["maré baixa", "maré cheia"]
+    assert search(client, "mar pescar") == ["maré cheia"]
+
+
+def test_user_operators_are_plain_words(client):
+    assert search(client, 'jangada OR "') == []
+    assert search(client, "NEAR(jangada*") == []
+
+
+def test_deleted_catalog_leaves_index(client):
+    add_geo_catalog(client, -19.25, -47.0, title="efêmero")
+    [catalog] = client.get("/geo_catalogs", query_string={"q": "efemero", "fields": "id"}).get_json()["geo_catalogs"]
+    assert client.delete("/geo_catalog", query_string={"id": catalog["id"]}).status_code == 200
+    assert search(client, "efemero") == []
+
+
+def test_coordinates_by_city_prefix(client):
+    add_coordinate(client, -19.375, -47.0, name="mirante", city="Itaparica")
+    assert search(client, "itapa", "/coordinates", "coordinates", fields="name") == ["mirante"]
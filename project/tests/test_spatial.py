@@ -0,0 +1,28 @@
+from sqlalchemy import select
+
+from model import Session
+from model.coordinate import Coordinate
+from model.spatial import nearest_ids
+from conftest import add_coordinate
+
+
+# distâncias aproximadas ao ponto (-20, -50): 0,5 km, 20 km, 500 km e 3000 km
+POSITIONS = [(-20.0045, -50.0), (-20.18, -50.0), (-24.5, -50.0), (-47.0, -50.0)]
+
+
+def test_nearest_without_radius_grows_search(client):
+    ids = [add_coordinate(client, latitude, longitude, name="proximidade").get_json()["id"]
+           for latitude, longitude in POSITIONS]
+    session = Session()
+    try:
+        candidates = select(Coordinate.id).where(Coordinate.id.in_(ids))
+        for count in (1, 3, 10):
+            nearest = session.execute(nearest_ids(session, candidates, "-20,-50", count)).scalars().all()
+            assert nearest == ids[:count]
+    finally:
+        Session.remove()
+
+    # busca pelo sqlite (name não é atendido pelo índice em memória)
+    response = client.get("/coordinates", query_string={"near": "-20,-50", "nearest": 2, "name": "proximidade"})
+    assert [(coordinate["latitude"], coordinate["longitude"])
+            for coordinate in response.get_json()["coordinates"]] == POSITIONS[:2]
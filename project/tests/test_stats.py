@@ -0,0 +1,69 @@
+from sqlalchemy import event
+
+from conftest import add_coordinate, add_geo_catalog
+from model import engine
+
+
+def test_add_geo_catalog_does_not_load_catalogs(client):
+    for title in ("primeiro", "segundo"):
+        assert add_geo_catalog(client, -8.5, -35.5, title=title).status_code == 200
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        response = add_geo_catalog(client, -8.5, -35.5, title="terceiro")
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    assert response.status_code == 200
+    coordinate = response.get_json()
+    # apenas o catálogo adicionado é retornado; o total vem do contador
+    assert coordinate["total_catalogs"] == 3
+    assert [catalog["title"] for catalog in coordinate["geo_catalogs"]] == ["terceiro"]
+    assert not [statement for statement in statements
+                if statement.lstrip().startswith("SELECT") and "FROM geo_catalogs" in statement]
+
+
+def test_upsert_coordinate_keeps_count(client):
+    add_geo_catalog(client, -8.75, -35.5, title="mantido")
+    response = add_coordinate(client, -8.75, -35.5, upsert=True, name="renomeado")
+    assert response.status_code == 200
+    coordinate = response.get_json()
+    assert (coordinate["name"], coordinate["total_catalogs"], coordinate["geo_catalogs"]) == ("renomeado", 1, [])
+
+
+def test_hashtags_with_counts(client):
+    for hashtag in ("#Colheita", "#colheita", "#colheitá"):
+        add_geo_catalog(client, -9.0, -36.0, hashtag=hashtag)
+    add_geo_catalog(client, -9.0, -36.0, hashtag="#plantio")
+
+    hashtags = client.get("/hashtags", query_string={"with_counts": "true"}).get_json()["hashtags"]
+    counts = {item["hashtag"]: item["catalogs"] for item in hashtags}
+    # as variantes somam na hashtag registrada primeiro
+    assert counts["#Colheita"] == 3 and counts["#plantio"] == 1
+    assert "#colheita" not in counts
+    assert [item["catalogs"] for item in hashtags] == sorted(counts.values(), reverse=True)
+
+    names = client.get("/hashtags").get_json()["hashtags"]
+    assert names == [item["hashtag"] for item in hashtags]
+    assert client.get("/hashtags", query_string={"top": 2}).get_json()["hashtags"] == names[:2]
+
+
+def test_regions_with_counts(client):
+    add_coordinate(client, -9.25, -36.0, region="Agreste")
+    add_geo_catalog(client, -9.5, -36.0, region="Agreste")
+    add_geo_catalog(client, -9.5, -36.0, region="Agreste")
+
+    regions = client.get("/regions", query_string={"with_counts": "true"}).get_json()["regions"]
+    [agreste] = [item for item in regions if item["region"] == "Agreste"]
+    assert agreste == {"region": "Agreste", "coordinates": 2, "catalogs": 2}
+
+    # a remoção de um catálogo é descontada
+    catalog_id = int(add_geo_catalog(client, -9.5, -36.0, region="Agreste").get_json()["geo_catalogs"][0]["img_url"].split("/")[2])
+    assert client.delete("/geo_catalog", query_string={"id": catalog_id}).status_code == 200
+    regions = client.get("/regions", query_string={"with_counts": "true", "top": 100}).get_json()["regions"]
+    [agreste] = [item for item in regions if item["region"] == "Agreste"]
+    assert agreste == {"region": "Agreste", "coordinates": 2, "catalogs": 2}
@@ -0,0 +1,61 @@
+from datetime import datetime
+
+from sqlalchemy import update
+
+from conftest import add_geo_catalog
+from model import Coordinate, GeoCatalog, writer
+
+
+def set_created_at(hashtag: str, dates):
+    """ Grava as datas de criação dos catálogos da hashtag (em ordem de id) e das
+        suas coordenadas, pelo escritor (o que invalida os caches).
+    """
+    def change(session):
+        ids = session.query(GeoCatalog.id, GeoCatalog.coordinate_id).filter(
+            GeoCatalog.hashtag == hashtag).order_by(GeoCatalog.id).all()
+        for (catalog_id, coordinate_id), date in zip(ids, dates):
+            session.execute(update(GeoCatalog).where(GeoCatalog.id == catalog_id).values(created_at=date))
+            session.execute(update(Coordinate).where(Coordinate.id == coordinate_id).values(created_at=date))
+    writer.submit(change)
+
+
+def test_timeline_buckets(client):
+    for latitude in (-10.0, -10.125, -10.25, -10.375):
+        add_geo_catalog(client, latitude, -37.0, hashtag="#histograma")
+    set_created_at("#histograma", [datetime(2001, 3, 4, 10, 15), datetime(2001, 3, 4, 10, 45),
+                                   datetime(2001, 3, 4, 13, 5), datetime(2001, 3, 6, 8, 0)])
+    window = {"hashtag": "#histograma", "since": "2001-03-01T00:00:00", "until": "2001-04-01T00:00:00"}
+
+    result = client.get("/stats/timeline", query_string=window).get_json()
+    assert result == {"bucket": "day", "entity": "geo_catalog", "timeline": [
+        {"start": "2001-03-04 00:00:00", "count": 3}, {"start": "2001-03-06 00:00:00", "count": 1}]}
+
+    result = client.get("/stats/timeline", query_string={**window, "bucket": "hour", "until": "2001-03-05T00:00:00"})
+    assert result.get_json()["timeline"] == [
+        {"start": "2001-03-04 10:00:00", "count": 2}, {"start": "2001-03-04 13:00:00", "count": 1}]
+
+    result = client.get("/stats/timeline", query_string={**window, "entity": "coordinate"}).get_json()
+    assert [bucket["count"] for bucket in result["timeline"]] == [3, 1]
+
+
+def test_timeline_rejects_empty_window(client):
+    response = client.get("/stats/timeline", query_string={"since": "2001-03-02T00:00:00",
+                                                          "until": "2001-03-01T00:00:00"})
+    assert response.status_code == 422
+
+
+def test_listings_since_until(client):
+    for latitude in (-10.5, -10.625, -10.75):
+        add_geo_catalog(client, latitude, -37.0, hashtag="#janela", title="em %s" % latitude)
+    set_created_at("#janela", [datetime(2002, 1, 1), datetime(2002, 1, 2), datetime(2002, 1, 3)])
+    # since inclusive, until exclusive
+    window = {"since": "2002-01-02T00:00:00", "until": "2002-01-03T00:00:00"}
+
+    catalogs = client.get("/geo_catalogs", query_string={"hashtag": "#janela", **window}).get_json()["geo_catalogs"]
+    assert [catalog["title"] for catalog in catalogs] == ["em -10.625"]
+
+    coordinates = client.get("/coordinates", query_string={"hashtag": "#janela", **window}).get_json()["coordinates"]
+    assert [coordinate["latitude"] for coordinate in coordinates] == [-10.625]
+
+    catalogs = client.get("/geo_catalogs", query_string={"hashtag": "#janela", "since": window["since"]}).get_json()
+    assert len(catalogs["geo_catalogs"]) == 2
@@ -0,0 +1,79 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.orm import sessionmaker
+
+from model import engine
+from model.coordinate import Coordinate
+from model.writer import WriteCoordinator
+
+
+def coordinate_writer(**kwargs) -> WriteCoordinator:
+    # janela longa: as operações enviadas juntas entram no mesmo lote
+    return WriteCoordinator(sessionmaker(bind=engine, expire_on_commit=False),
+                            max_batch=kwargs.get("max_batch", 16), max_delay=kwargs.get("max_delay", 0.3))
+
+
+def insert_coordinate(name: str, fail: bool = False):
+    def operation(session):
+        session.execute(insert(Coordinate.__table__).values(latitude=-20.5, longitude=-48.0 - len(name) / 64,
+                                                            name=name))
+        if fail:
+            raise ValueError(name)
+        return name
+    return operation
+
+
+def names(prefix: str):
+    with engine.connect() as connection:
+        return sorted(connection.execute(select(Coordinate.name).where(Coordinate.name.startswith(prefix))).scalars())
+
+
+def submit_together(writer, operations):
+    """ Envia as operações de threads diferentes ao mesmo tempo e retorna resultado ou erro de cada uma.
+    """
+    barrier = threading.Barrier(len(operations))
+
+    def run(operation):
+        barrier.wait()
+        try:
+            return writer.submit(operation)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(len(operations)) as executor:
+        return list(executor.map(run, operations))
+
+
+def test_failed_operation_is_isolated_in_its_savepoint(app):
+    writer = coordinate_writer()
+    commits = []
+    writer.after_commit_hooks.append(lambda: commits.append(1))
+
+    results = submit_together(writer, [insert_coordinate("lote-a"), insert_coordinate("lote-bb", fail=True),
+                                       insert_coordinate("lote-ccc")])
+    assert results[0] == "lote-a" and results[2] == "lote-ccc"
+    assert isinstance(results[1], ValueError)
+    assert names("lote-") == ["lote-a", "lote-ccc"]
+    # as três operações foram confirmadas em uma única transação
+    assert commits == [1]
+
+
+def test_commit_failure_reaches_every_operation(app):
+    writer = coordinate_writer()
+
+    def failing_hook(session):
+        raise RuntimeError("commit recusado")
+
+    writer.before_commit_hooks.append(failing_hook)
+    results = submit_together(writer, [insert_coordinate("recusado-a"), insert_coordinate("recusado-bb")])
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert names("recusado-") == []
+
+
+def test_nested_submit_is_rejected(app):
+    writer = coordinate_writer(max_delay=0)
+    with pytest.raises(RuntimeError, match="aninhada"):
+        writer.submit(lambda session: writer.submit(insert_coordinate("aninhada")))